@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import json
+import math
+
+from starlette.types import Send
+
+
+ZEROCOPY_SEND_EXTENSION = "http.response.zerocopysend"
+
+
+async def send_error(*, send: Send, status_code: int, detail: str, retry_after: float) -> None:
+    body = json.dumps({"detail": detail}, ensure_ascii=False).encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"retry-after", str(math.ceil(retry_after)).encode("ascii")),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.asgi import ZEROCOPY_SEND_EXTENSION
+from app.core.constants import BANDWIDTH_BURST_SECONDS, BANDWIDTH_SLICE_BYTES
+from app.core.rate_limit import TrustedProxies
+
+
+@dataclass(frozen=True)
+class BandwidthLimits:
+    global_bytes_per_second: int
+    per_share_bytes_per_second: int
+    per_client_bytes_per_second: int
+
+
+class AsyncTokenBucket:
+    def __init__(self, *, rate_bytes_per_second: int) -> None:
+        self._rate = 0
+        self._burst = 0.0
+        self._tokens = 0.0
+        self._updated_at = time.monotonic()
+        self.set_rate(rate_bytes_per_second)
+
+    @property
+    def limited(self) -> bool:
+        return self._rate > 0
+
+    def set_rate(self, rate_bytes_per_second: int) -> None:
+        self._rate = rate_bytes_per_second
+        self._burst = max(rate_bytes_per_second * BANDWIDTH_BURST_SECONDS, BANDWIDTH_SLICE_BYTES)
+        self._tokens = self._burst
+
+    async def consume(self, amount: int) -> None:
+        if self._rate <= 0:
+            return
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+        # Take the tokens up front and sleep off the debt; later callers queue behind it,
+        # so concurrent streams interleave slice by slice and share the rate evenly.
+        self._tokens -= amount
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self._rate)
+
+
+class _KeyedBuckets:
+    def __init__(self, *, rate_bytes_per_second: int) -> None:
+        self._rate = rate_bytes_per_second
+        self._buckets: dict[str, tuple[AsyncTokenBucket, int]] = {}
+
+    def set_rate(self, rate_bytes_per_second: int) -> None:
+        self._rate = rate_bytes_per_second
+        for bucket, _ in self._buckets.values():
+            bucket.set_rate(rate_bytes_per_second)
+
+    @contextmanager
+    def hold(self, key: str) -> Iterator[AsyncTokenBucket]:
+        entry = self._buckets.get(key)
+        if entry is None:
+            entry = (AsyncTokenBucket(rate_bytes_per_second=self._rate), 0)
+        bucket, refs = entry
+        self._buckets[key] = (bucket, refs + 1)
+        try:
+            yield bucket
+        finally:
+            bucket, refs = self._buckets[key]
+            if refs <= 1:
+                del self._buckets[key]
+            else:
+                self._buckets[key] = (bucket, refs - 1)
+
+
+class ShapedStream:
+    def __init__(self, *, buckets: list[AsyncTokenBucket]) -> None:
+        self._buckets = buckets
+
+    @property
+    def limited(self) -> bool:
+        return any(bucket.limited for bucket in self._buckets)
+
+    async def consume(self, amount: int) -> None:
+        for bucket in self._buckets:
+            await bucket.consume(amount)
+
+
+class BandwidthShaper:
+    def __init__(self, *, limits: BandwidthLimits) -> None:
+        self._limits = limits
+        self._global = AsyncTokenBucket(rate_bytes_per_second=limits.global_bytes_per_second)
+        self._shares = _KeyedBuckets(rate_bytes_per_second=limits.per_share_bytes_per_second)
+        self._clients = _KeyedBuckets(rate_bytes_per_second=limits.per_client_bytes_per_second)
+        self._active_streams = 0
+
+    @property
+    def limits(self) -> BandwidthLimits:
+        return self._limits
+
+    @property
+    def active_streams(self) -> int:
+        return self._active_streams
+
+    def update(self, limits: BandwidthLimits) -> None:
+        self._limits = limits
+        self._global.set_rate(limits.global_bytes_per_second)
+        self._shares.set_rate(limits.per_share_bytes_per_second)
+        self._clients.set_rate(limits.per_client_bytes_per_second)
+
+    def connection_rate(self, *, is_share: bool) -> int:
+        rates = [self._limits.per_client_bytes_per_second]
+        if is_share:
+            rates.append(self._limits.per_share_bytes_per_second)
+        return min((rate for rate in rates if rate > 0), default=0)
+
+    @contextmanager
+    def stream(self, *, client: str, share_code: str | None) -> Iterator[ShapedStream]:
+        with self._clients.hold(client) as client_bucket:
+            self._active_streams += 1
+            try:
+                if share_code is None:
+                    yield ShapedStream(buckets=[client_bucket, self._global])
+                else:
+                    with self._shares.hold(share_code) as share_bucket:
+                        yield ShapedStream(buckets=[client_bucket, share_bucket, self._global])
+            finally:
+                self._active_streams -= 1
+
+
+@dataclass(frozen=True)
+class BandwidthRoute:
+    method: str
+    path: re.Pattern[str]
+
+
+class BandwidthMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        routes: list[BandwidthRoute],
+        shaper: BandwidthShaper,
+        trusted_proxies: TrustedProxies,
+    ) -> None:
+        self._app = app
+        self._routes = routes
+        self._shaper = shaper
+        self._trusted_proxies = trusted_proxies
+
+    def _match(self, scope: Scope) -> re.Match[str] | None:
+        for route in self._routes:
+            if route.method != scope["method"]:
+                continue
+            match = route.path.match(scope["path"])
+            if match is not None:
+                return match
+        return None
+
+    def _client_ip(self, scope: Scope) -> str:
+        client = scope.get("client")
+        peer = client[0] if client else ""
+        forwarded_for = None
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                forwarded_for = value.decode("latin-1")
+                break
+        return self._trusted_proxies.client_ip(peer=peer, forwarded_for=forwarded_for)
+
+    def _offload_limit(self, *, message: Message, is_share: bool) -> Message:
+        # Offloaded bodies never pass through us; hand nginx the per-connection cap instead.
+        headers = message.get("headers", [])
+        if not any(name.lower() == b"x-accel-redirect" for name, _ in headers):
+            return message
+        rate = self._shaper.connection_rate(is_share=is_share)
+        if rate <= 0:
+            return message
+        return {**message, "headers": [*headers, (b"x-accel-limit-rate", str(rate).encode("ascii"))]}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        match = self._match(scope) if scope["type"] == "http" else None
+        if match is None:
+            await self._app(scope, receive, send)
+            return
+
+        share_code = match.groupdict().get("share_code")
+        with self._shaper.stream(client=self._client_ip(scope), share_code=share_code) as stream:
+
+            async def shaped_send(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    await send(self._offload_limit(message=message, is_share=share_code is not None))
+                elif not stream.limited:
+                    await send(message)
+                elif message["type"] == "http.response.body":
+                    await _send_body_slices(send=send, stream=stream, message=message)
+                elif message["type"] == ZEROCOPY_SEND_EXTENSION:
+                    await _send_zerocopy_slices(send=send, stream=stream, message=message)
+                else:
+                    await send(message)
+
+            await self._app(scope, receive, shaped_send)
+
+
+async def _send_body_slices(*, send: Send, stream: ShapedStream, message: Message) -> None:
+    body = message.get("body", b"")
+    more_body = message.get("more_body", False)
+    if not body:
+        await send(message)
+        return
+    for offset in range(0, len(body), BANDWIDTH_SLICE_BYTES):
+        piece = body[offset : offset + BANDWIDTH_SLICE_BYTES]
+        await stream.consume(len(piece))
+        last = offset + BANDWIDTH_SLICE_BYTES >= len(body)
+        await send({"type": "http.response.body", "body": piece, "more_body": more_body or not last})
+
+
+async def _send_zerocopy_slices(*, send: Send, stream: ShapedStream, message: Message) -> None:
+    start = message.get("offset", 0)
+    count = message.get("count")
+    if count is None:
+        await send(message)
+        return
+    more_body = message.get("more_body", False)
+    for offset in range(start, start + count, BANDWIDTH_SLICE_BYTES):
+        length = min(BANDWIDTH_SLICE_BYTES, start + count - offset)
+        await stream.consume(length)
+        last = offset + length >= start + count
+        await send({**message, "offset": offset, "count": length, "more_body": more_body or not last})
@@ -9,8 +9,66 @@ SECONDS_PER_DAY = SECONDS_PER_HOUR * 24
 DEFAULT_MAX_UPLOAD_BYTES = BYTES_PER_GIBIBYTE
 DEFAULT_ADMIN_TOKEN_EXPIRES_SECONDS = SECONDS_PER_DAY
 DEFAULT_DOWNLOAD_TOKEN_EXPIRES_SECONDS = SECONDS_PER_MINUTE * 5
+DEFAULT_UPLOAD_CHUNK_BYTES = BYTES_PER_MEBIBYTE * 8
+MAX_UPLOAD_CHUNK_BYTES = BYTES_PER_MEBIBYTE * 64
+DEFAULT_UPLOAD_SESSION_EXPIRES_SECONDS = SECONDS_PER_DAY
+DEFAULT_STORAGE_CACHE_MAX_BYTES = BYTES_PER_GIBIBYTE * 10
+STORAGE_CACHE_MAX_FILLS = 4
+STORAGE_CACHE_MAX_PENDING_SIZES = 1024
+DEFAULT_S3_PART_SIZE_BYTES = BYTES_PER_MEBIBYTE * 8
+S3_MIN_PART_SIZE_BYTES = BYTES_PER_MEBIBYTE * 5
+S3_MAX_PARTS = 10000
+DEFAULT_S3_MAX_CONCURRENCY = 4
+DEFAULT_S3_PRESIGN_EXPIRES_SECONDS = SECONDS_PER_MINUTE * 5
 
 FILE_IO_CHUNK_BYTES = BYTES_PER_MEBIBYTE
+DOWNLOAD_READAHEAD_BYTES = BYTES_PER_MEBIBYTE * 8
+MULTIPART_FIELD_MAX_BYTES = BYTES_PER_KIBIBYTE * 16
+MULTIPART_OVERHEAD_BYTES = BYTES_PER_KIBIBYTE * 64
+
+DEFAULT_MAINTENANCE_INTERVAL_SECONDS = SECONDS_PER_MINUTE
+MAINTENANCE_JITTER_RATIO = 0.2
+MAINTENANCE_LOCK_SUFFIX = ".maintenance.lock"
+
+DEFAULT_SHARE_CACHE_MAX_ENTRIES = 10000
+DEFAULT_SHARE_CACHE_TTL_SECONDS = 10
+
+DEFAULT_PASSWORD_HASH_ROUNDS = 12
+DEFAULT_PASSWORD_HASH_WORKERS = 2
+DEFAULT_PASSWORD_HASH_MAX_PENDING = 16
+DEFAULT_PASSWORD_VERIFY_CACHE_TTL_SECONDS = SECONDS_PER_MINUTE * 5
+PASSWORD_VERIFY_CACHE_MAX_ENTRIES = 10000
+PASSWORD_HASHER_RETRY_AFTER_SECONDS = 1
+
+RATE_LIMIT_MAX_KEYS = 100_000
+
+DEFAULT_MAX_CONCURRENT_UPLOADS = 32
+DEFAULT_MAX_CONCURRENT_DOWNLOADS = 128
+DEFAULT_TRANSFER_QUEUE_SIZE = 16
+DEFAULT_TRANSFER_QUEUE_TIMEOUT_SECONDS = 5
+TRANSFER_RETRY_AFTER_SECONDS = 5
+
+BANDWIDTH_SLICE_BYTES = BYTES_PER_KIBIBYTE * 64
+BANDWIDTH_BURST_SECONDS = 0.5
+
+METRICS_FLUSH_INTERVAL_SECONDS = 5
+
+DEFAULT_PROFILING_SLOW_REQUEST_MS = 1000
+PROFILING_SAMPLE_INTERVAL_SECONDS = 0.005
+PROFILING_MAX_STACK_DEPTH = 64
+PROFILING_TOP_STACKS = 20
+
+DEFAULT_TRACING_SAMPLE_RATE = 0.01
+TRACING_MAX_QUEUED_TRACES = 1024
+TRACING_MAX_STATEMENT_CHARS = 500
+TRACING_SERVICE_NAME = "file-transfer"
+DEFAULT_TRACING_MAX_FILE_BYTES = BYTES_PER_MEBIBYTE * 64
+DEFAULT_TRACING_MAX_TOTAL_BYTES = BYTES_PER_MEBIBYTE * 1024
+
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_MMAP_SIZE_BYTES = BYTES_PER_MEBIBYTE * 256
+SQLITE_CACHE_SIZE_KIB = BYTES_PER_KIBIBYTE * 64
+SQLITE_WRITER_POOL_TIMEOUT_SECONDS = 30
 
 UUID_STR_LENGTH = 36
 FILENAME_MAX_LENGTH = 255
@@ -18,6 +76,12 @@ FILE_PATH_MAX_LENGTH = 500
 MIME_TYPE_MAX_LENGTH = 100
 REMARK_MAX_LENGTH = 500
 PASSWORD_HASH_MAX_LENGTH = 255
+SHA256_HEX_LENGTH = 64
+COUNTER_NAME_MAX_LENGTH = 64
+
+FILES_ACTIVE_COUNTER = "files_active"
+SEARCH_INDEX_TABLE = "files_fts"
+SEARCH_MIN_KEYWORD_CHARS = 3
 
 SHARE_CODE_LENGTH = 16
 SHARE_CODE_MAX_RETRIES = 10
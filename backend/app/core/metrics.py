@@ -0,0 +1,343 @@
+from __future__ import annotations
+
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from typing import Any
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.asgi import ZEROCOPY_SEND_EXTENSION
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+LabelValues = tuple[str, ...]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, *, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> list[list[Any]]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name=name, documentation=documentation, labelnames=labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list[list[Any]]:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(
+        self,
+        *,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        collect: Callable[[], Iterable[tuple[LabelValues, float]]],
+    ) -> None:
+        super().__init__(name=name, documentation=documentation, labelnames=labelnames)
+        self._collect = collect
+
+    def samples(self) -> list[list[Any]]:
+        return [[list(key), value] for key, value in self._collect()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        *,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...],
+    ) -> None:
+        super().__init__(name=name, documentation=documentation, labelnames=labelnames)
+        self.buckets = buckets
+        # Per label set: [count per bucket (+Inf last), sum].
+        self._values: dict[LabelValues, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = ([0] * (len(self.buckets) + 1), [0.0])
+                self._values[key] = entry
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def samples(self) -> list[list[Any]]:
+        with self._lock:
+            return [
+                [list(key), [list(counts), total[0]]]
+                for key, (counts, total) in self._values.items()
+            ]
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics[metric.name] = metric
+
+    def unregister(self, name: str) -> None:
+        self._metrics.pop(name, None)
+
+    def counter(
+        self,
+        *,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+    ) -> Counter:
+        metric = Counter(name=name, documentation=documentation, labelnames=labelnames)
+        self.register(metric)
+        return metric
+
+    def histogram(
+        self,
+        *,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...],
+    ) -> Histogram:
+        metric = Histogram(
+            name=name,
+            documentation=documentation,
+            labelnames=labelnames,
+            buckets=buckets,
+        )
+        self.register(metric)
+        return metric
+
+    def snapshot(self) -> dict[str, Any]:
+        metrics = {}
+        for metric in list(self._metrics.values()):
+            entry: dict[str, Any] = {
+                "kind": metric.kind,
+                "documentation": metric.documentation,
+                "labelnames": list(metric.labelnames),
+                "samples": metric.samples(),
+            }
+            if isinstance(metric, Histogram):
+                entry["buckets"] = list(metric.buckets)
+            metrics[metric.name] = entry
+        return {"pid": os.getpid(), "time": time.time(), "metrics": metrics}
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    name="http_request_duration_seconds",
+    documentation="HTTP request latency by route, until the response body is fully sent.",
+    labelnames=("method", "route", "status"),
+    buckets=LATENCY_BUCKETS,
+)
+UPLOAD_BYTES = REGISTRY.counter(
+    name="upload_bytes_total",
+    documentation="Bytes of file content written to storage by uploads.",
+    labelnames=("backend",),
+)
+DOWNLOAD_BYTES = REGISTRY.counter(
+    name="download_bytes_total",
+    documentation="Bytes of file content sent by download responses.",
+    labelnames=("route",),
+)
+SHARE_OUTCOMES = REGISTRY.counter(
+    name="share_outcomes_total",
+    documentation="Outcomes of public share requests.",
+    labelnames=("endpoint", "outcome"),
+)
+DB_QUERY_DURATION = REGISTRY.histogram(
+    name="db_query_duration_seconds",
+    documentation="SQL statement execution time by engine and statement kind.",
+    labelnames=("engine", "statement"),
+    buckets=QUERY_BUCKETS,
+)
+
+
+def _merge_samples(
+    *,
+    kind: str,
+    merged: dict[LabelValues, Any],
+    samples: list[list[Any]],
+) -> None:
+    for labels, value in samples:
+        key = tuple(labels)
+        if kind != "histogram":
+            merged[key] = merged.get(key, 0) + value
+            continue
+        counts, total = value
+        current = merged.get(key)
+        if current is None:
+            merged[key] = [list(counts), total]
+            continue
+        current[0] = [a + b for a, b in zip(current[0], counts)]
+        current[1] += total
+
+
+def process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def merge_snapshots(snapshots: Iterable[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    merged: dict[str, dict[str, Any]] = {}
+    for snapshot in snapshots:
+        # Counters of exited workers stay in the totals; their gauges no longer describe anything.
+        alive = snapshot["pid"] == os.getpid() or process_alive(snapshot["pid"])
+        for name, metric in snapshot["metrics"].items():
+            if metric["kind"] == "gauge" and not alive:
+                continue
+            entry = merged.setdefault(name, {**metric, "samples": {}})
+            _merge_samples(kind=metric["kind"], merged=entry["samples"], samples=metric["samples"])
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def render(merged: dict[str, dict[str, Any]]) -> str:
+    lines: list[str] = []
+    for name in sorted(merged):
+        metric = merged[name]
+        labelnames = metric["labelnames"]
+        lines.append(f"# HELP {name} {metric['documentation']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for labels, value in sorted(metric["samples"].items()):
+            if metric["kind"] != "histogram":
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip([*metric["buckets"], math.inf], counts):
+                cumulative += count
+                bucket_labels = _format_labels([*labelnames, "le"], [*labels, _format_value(bound)])
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labelnames, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsStore:
+    def __init__(self, *, registry: MetricsRegistry, snapshot_dir: str) -> None:
+        self._registry = registry
+        self._dir = Path(snapshot_dir).expanduser().resolve() if snapshot_dir else None
+
+    def flush(self) -> None:
+        if self._dir is None:
+            return
+        self._dir.mkdir(parents=True, exist_ok=True)
+        path = self._dir / f"{os.getpid()}.json"
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self._registry.snapshot()), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def _snapshots(self) -> Iterable[dict[str, Any]]:
+        own = self._registry.snapshot()
+        yield own
+        if self._dir is None or not self._dir.is_dir():
+            return
+        for path in self._dir.glob("*.json"):
+            if path.stem == str(own["pid"]):
+                continue
+            try:
+                yield json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+
+    def render(self) -> str:
+        return render(merge_snapshots(self._snapshots()))
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp, *, download_routes: Iterable[str]) -> None:
+        self._app = app
+        self._download_routes = frozenset(download_routes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self._app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status_code = 500
+        sent_bytes = 0
+
+        async def measured_send(message: Message) -> None:
+            nonlocal status_code, sent_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                sent_bytes += len(message.get("body", b""))
+            elif message["type"] == ZEROCOPY_SEND_EXTENSION:
+                sent_bytes += message.get("count") or 0
+            await send(message)
+
+        try:
+            await self._app(scope, receive, measured_send)
+        finally:
+            # The router stores the matched route on the shared scope; templates bound cardinality.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - started_at,
+                method=scope["method"],
+                route=route,
+                status=str(status_code),
+            )
+            if route in self._download_routes and sent_bytes:
+                DOWNLOAD_BYTES.inc(sent_bytes, route=route)
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from types import FrameType
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import tracing
+
+
+logger = logging.getLogger("app.profiling")
+
+_current: ContextVar[RequestProfile | None] = ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    def __init__(self, *, sampled: bool) -> None:
+        self.sampled = sampled
+        self.started_at = time.perf_counter()
+        self._thread_id = threading.get_ident()
+        # Other threads only while inside timed() for this request, counted per thread so
+        # nested sections work; pool threads go back to serving other requests afterwards.
+        self._active: Counter[int] = Counter()
+        self._samples: Counter[str] = Counter()
+        self._timings: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def enter(self) -> None:
+        if self.sampled:
+            with self._lock:
+                self._active[threading.get_ident()] += 1
+
+    def leave(self) -> None:
+        if self.sampled:
+            with self._lock:
+                thread_id = threading.get_ident()
+                self._active[thread_id] -= 1
+                if self._active[thread_id] <= 0:
+                    del self._active[thread_id]
+
+    def add(self, category: str, seconds: float) -> None:
+        with self._lock:
+            timing = self._timings.setdefault(category, [0.0, 0])
+            timing[0] += seconds
+            timing[1] += 1
+
+    def thread_ids(self) -> list[int]:
+        with self._lock:
+            return list({self._thread_id, *self._active})
+
+    def add_sample(self, stack: str) -> None:
+        with self._lock:
+            self._samples[stack] += 1
+
+    def top_stacks(self, limit: int) -> list[tuple[str, int]]:
+        with self._lock:
+            return self._samples.most_common(limit)
+
+    def sample_count(self) -> int:
+        with self._lock:
+            return sum(self._samples.values())
+
+    def breakdown(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {
+                category: {"ms": round(seconds * 1000, 3), "count": int(count)}
+                for category, (seconds, count) in self._timings.items()
+            }
+
+
+def active() -> bool:
+    return _current.get() is not None
+
+
+def record(category: str, seconds: float) -> None:
+    profile = _current.get()
+    if profile is not None:
+        profile.add(category, seconds)
+
+
+@contextmanager
+def timed(category: str) -> Iterator[None]:
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    profile.enter()
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.leave()
+        profile.add(category, time.perf_counter() - started_at)
+
+
+def _fold(frame: FrameType | None, *, max_depth: int) -> str:
+    names = []
+    while frame is not None and len(names) < max_depth:
+        code = frame.f_code
+        names.append(f"{code.co_filename}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    def __init__(self, *, interval_seconds: float, max_depth: int) -> None:
+        self._interval_seconds = interval_seconds
+        self._max_depth = max_depth
+        self._profiles: set[RequestProfile] = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                profiles = list(self._profiles)
+                if not profiles:
+                    self._wakeup.clear()
+                    continue
+            frames = sys._current_frames()
+            for profile in profiles:
+                for thread_id in profile.thread_ids():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        profile.add_sample(_fold(frame, max_depth=self._max_depth))
+            time.sleep(self._interval_seconds)
+
+    @contextmanager
+    def sampling(self, profile: RequestProfile) -> Iterator[None]:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+            self._profiles.add(profile)
+            self._wakeup.set()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._profiles.discard(profile)
+
+
+@dataclass
+class ProfilingControl:
+    enabled: bool
+    slow_request_ms: int
+    sample_rate: float
+
+
+class ProfilingMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        control: ProfilingControl,
+        sampler: StackSampler,
+        top_stacks: int,
+    ) -> None:
+        self._app = app
+        self._control = control
+        self._sampler = sampler
+        self._top_stacks = top_stacks
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self._app(scope, receive, send)
+            return
+
+        control = self._control
+        # Always installed so the admin API can switch it on; off, it costs one attribute check.
+        if not control.enabled:
+            await self._app(scope, receive, send)
+            return
+
+        profile = RequestProfile(sampled=random.random() < control.sample_rate)
+        status_code = 500
+        send_seconds = 0.0
+
+        async def timed_send(message: Message) -> None:
+            nonlocal status_code, send_seconds
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            started_at = time.perf_counter()
+            await send(message)
+            send_seconds += time.perf_counter() - started_at
+
+        token = _current.set(profile)
+        try:
+            if profile.sampled:
+                with self._sampler.sampling(profile):
+                    await self._app(scope, receive, timed_send)
+            else:
+                await self._app(scope, receive, timed_send)
+        finally:
+            _current.reset(token)
+            profile.add("send", send_seconds)
+            total_ms = (time.perf_counter() - profile.started_at) * 1000
+            if profile.sampled or total_ms >= control.slow_request_ms:
+                self._log(scope=scope, profile=profile, status_code=status_code, total_ms=total_ms)
+
+    def _log(
+        self,
+        *,
+        scope: Scope,
+        profile: RequestProfile,
+        status_code: int,
+        total_ms: float,
+    ) -> None:
+        slow = total_ms >= self._control.slow_request_ms
+        entry: dict[str, object] = {
+            "event": "slow_request" if slow else "sampled_request",
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": getattr(scope.get("route"), "path", None),
+            "status": status_code,
+            "total_ms": round(total_ms, 3),
+            "breakdown": profile.breakdown(),
+        }
+        trace_id = tracing.current_trace_id()
+        if trace_id is not None:
+            entry["trace_id"] = trace_id
+        if profile.sampled:
+            entry["samples"] = profile.sample_count()
+            entry["stacks"] = [
+                {"stack": stack, "count": count}
+                for stack, count in profile.top_stacks(self._top_stacks)
+            ]
+        logger.warning(json.dumps(entry, ensure_ascii=False))
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import ipaddress
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.asgi import send_error
+
+
+_RULE_PATTERN = re.compile(r"^\s*(\d+)\s*/\s*(\d+(?:\.\d+)?)\s*$")
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    capacity: int
+    period_seconds: float
+
+
+def parse_rule(value: str) -> RateLimitRule | None:
+    if not value.strip():
+        return None
+    match = _RULE_PATTERN.match(value)
+    if match is None:
+        raise ValueError(f"Invalid rate limit rule: {value!r}, expected '<count>/<seconds>'")
+    capacity, period_seconds = int(match.group(1)), float(match.group(2))
+    if capacity <= 0 or period_seconds <= 0:
+        raise ValueError(f"Invalid rate limit rule: {value!r}, count and seconds must be positive")
+    return RateLimitRule(capacity=capacity, period_seconds=period_seconds)
+
+
+class TokenBucketLimiter:
+    def __init__(self, *, rule: RateLimitRule, max_keys: int) -> None:
+        self._capacity = float(rule.capacity)
+        self._rate = rule.capacity / rule.period_seconds
+        # A bucket untouched for a full period has refilled, so dropping it loses nothing.
+        self._idle_seconds = rule.period_seconds
+        self._max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, *, now: float) -> None:
+        while self._buckets:
+            key, (_, updated_at) = next(iter(self._buckets.items()))
+            if now - updated_at < self._idle_seconds and len(self._buckets) <= self._max_keys:
+                return
+            del self._buckets[key]
+
+    def acquire(self, key: str) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (self._capacity, now))
+            tokens = min(self._capacity, tokens + (now - updated_at) * self._rate)
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / self._rate
+            self._buckets[key] = (tokens, now)
+            self._evict(now=now)
+            return retry_after
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._buckets)
+
+
+@dataclass(frozen=True)
+class RateLimitRoute:
+    method: str
+    path: re.Pattern[str]
+    per_client: TokenBucketLimiter | None
+    per_share: TokenBucketLimiter | None
+
+
+class TrustedProxies:
+    def __init__(self, networks: Iterable[str]) -> None:
+        self._networks = [ipaddress.ip_network(value, strict=False) for value in networks]
+
+    def is_trusted(self, host: str) -> bool:
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return False
+        return any(address in network for network in self._networks)
+
+    def client_ip(self, *, peer: str, forwarded_for: str | None) -> str:
+        # Walk X-Forwarded-For right to left, skipping our own proxies, so clients cannot spoof it.
+        if not forwarded_for or not self.is_trusted(peer):
+            return peer
+        for hop in reversed([value.strip() for value in forwarded_for.split(",")]):
+            if hop and not self.is_trusted(hop):
+                return hop
+        return peer
+
+
+class RateLimitMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        routes: list[RateLimitRoute],
+        trusted_proxies: TrustedProxies,
+    ) -> None:
+        self._app = app
+        self._routes = routes
+        self._trusted_proxies = trusted_proxies
+
+    def _retry_after(self, scope: Scope) -> float:
+        method = scope["method"]
+        path = scope["path"]
+        for route in self._routes:
+            if route.method != method:
+                continue
+            match = route.path.match(path)
+            if match is None:
+                continue
+            if route.per_client is not None:
+                retry_after = route.per_client.acquire(self._client_ip(scope))
+                if retry_after > 0:
+                    return retry_after
+            if route.per_share is not None:
+                retry_after = route.per_share.acquire(match.group("share_code"))
+                if retry_after > 0:
+                    return retry_after
+            return 0.0
+        return 0.0
+
+    def _client_ip(self, scope: Scope) -> str:
+        client = scope.get("client")
+        peer = client[0] if client else ""
+        forwarded_for = None
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                forwarded_for = value.decode("latin-1")
+                break
+        return self._trusted_proxies.client_ip(peer=peer, forwarded_for=forwarded_for)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self._app(scope, receive, send)
+            return
+
+        retry_after = self._retry_after(scope)
+        if retry_after <= 0:
+            await self._app(scope, receive, send)
+            return
+
+        await send_error(
+            send=send,
+            status_code=429,
+            detail="请求过于频繁，请稍后重试",
+            retry_after=retry_after,
+        )
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+from collections.abc import Callable
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    def __init__(
+        self,
+        *,
+        name: str,
+        func: Callable[[], object],
+        interval_seconds: float,
+        jitter_ratio: float,
+        lock_path: str | None,
+    ) -> None:
+        self._name = name
+        self._func = func
+        self._interval_seconds = interval_seconds
+        self._jitter_ratio = jitter_ratio
+        self._lock_path = Path(lock_path).expanduser().resolve() if lock_path else None
+        self._lock_fd: int | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _next_delay(self) -> float:
+        jitter = self._interval_seconds * self._jitter_ratio
+        return max(0.0, self._interval_seconds + random.uniform(-jitter, jitter))
+
+    def _is_leader(self) -> bool:
+        # Every worker runs a scheduler; the one holding the lock until it exits does the work.
+        if self._lock_path is None or self._lock_fd is not None or fcntl is None:
+            return True
+        self._lock_path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def _release(self) -> None:
+        if self._lock_fd is None:
+            return
+        os.close(self._lock_fd)
+        self._lock_fd = None
+
+    def run_once(self) -> bool:
+        if not self._is_leader():
+            return False
+        try:
+            self._func()
+        except Exception:
+            logger.exception("Periodic task failed: %s", self._name)
+        return True
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.wait(self._next_delay()):
+                self.run_once()
+        finally:
+            self._release()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
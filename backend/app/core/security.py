@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+import asyncio
+import contextvars
 import secrets
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from typing import Any
@@ -8,13 +12,19 @@ from typing import Any
 import bcrypt
 import jwt
 
+from app.core import tracing
 from app.core.constants import ADMIN_TOKEN_TYPE, DOWNLOAD_TOKEN_TYPE
+from app.core.profiling import timed
 
 
 class InvalidTokenError(Exception):
     pass
 
 
+class PasswordHasherBusyError(Exception):
+    pass
+
+
 @dataclass(frozen=True)
 class TokenPayload:
     typ: str
@@ -27,14 +37,51 @@ def verify_admin_password(*, expected: str, provided: str) -> bool:
     return secrets.compare_digest(expected, provided)
 
 
-def hash_password(*, password: str) -> str:
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode("utf-8"), salt)
+@tracing.traced("bcrypt.hash")
+def hash_password(*, password: str, rounds: int) -> str:
+    salt = bcrypt.gensalt(rounds=rounds)
+    with timed("bcrypt"):
+        hashed = bcrypt.hashpw(password.encode("utf-8"), salt)
     return hashed.decode("utf-8")
 
 
+@tracing.traced("bcrypt.verify")
 def verify_password(*, password: str, password_hash: str) -> bool:
-    return bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
+    with timed("bcrypt"):
+        return bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
+
+
+class PasswordHasher:
+    def __init__(self, *, rounds: int, max_workers: int, max_pending: int) -> None:
+        self._rounds = rounds
+        # bcrypt releases the GIL, so threads give real parallelism without pickling overhead.
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="password-hasher",
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+    def _submit(self, fn: Any, /, **kwargs: Any) -> Future[Any]:
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusyError()
+        try:
+            # Carry the caller's context so request profiling sees work done on hasher threads.
+            future = self._executor.submit(contextvars.copy_context().run, fn, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash(self, *, password: str) -> str:
+        return self._submit(hash_password, password=password, rounds=self._rounds).result()
+
+    async def verify(self, *, password: str, password_hash: str) -> bool:
+        future = self._submit(verify_password, password=password, password_hash=password_hash)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
 
 
 def create_token(
@@ -54,12 +101,14 @@ def create_token(
         "iat": now,
         **(extra or {}),
     }
-    return jwt.encode(payload, secret, algorithm="HS256")
+    with timed("jwt"):
+        return jwt.encode(payload, secret, algorithm="HS256")
 
 
 def decode_token(*, secret: str, token: str) -> TokenPayload:
     try:
-        raw = jwt.decode(token, secret, algorithms=["HS256"])
+        with timed("jwt"):
+            raw = jwt.decode(token, secret, algorithms=["HS256"])
     except jwt.PyJWTError as exc:  # pragma: no cover
         raise InvalidTokenError(str(exc)) from exc
 
@@ -1,15 +1,40 @@
 from __future__ import annotations
 
 from functools import lru_cache
+from typing import Literal
 
-from pydantic import Field, SecretStr
+from pydantic import Field, SecretStr, field_validator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from app.core.constants import (
     DEFAULT_ADMIN_TOKEN_EXPIRES_SECONDS,
     DEFAULT_DOWNLOAD_TOKEN_EXPIRES_SECONDS,
+    DEFAULT_MAINTENANCE_INTERVAL_SECONDS,
+    DEFAULT_MAX_CONCURRENT_DOWNLOADS,
+    DEFAULT_MAX_CONCURRENT_UPLOADS,
     DEFAULT_MAX_UPLOAD_BYTES,
+    DEFAULT_PASSWORD_HASH_MAX_PENDING,
+    DEFAULT_PASSWORD_HASH_ROUNDS,
+    DEFAULT_PASSWORD_HASH_WORKERS,
+    DEFAULT_PASSWORD_VERIFY_CACHE_TTL_SECONDS,
+    DEFAULT_PROFILING_SLOW_REQUEST_MS,
+    DEFAULT_S3_MAX_CONCURRENCY,
+    DEFAULT_S3_PART_SIZE_BYTES,
+    DEFAULT_S3_PRESIGN_EXPIRES_SECONDS,
+    DEFAULT_SHARE_CACHE_MAX_ENTRIES,
+    DEFAULT_SHARE_CACHE_TTL_SECONDS,
+    DEFAULT_STORAGE_CACHE_MAX_BYTES,
+    DEFAULT_TRACING_MAX_FILE_BYTES,
+    DEFAULT_TRACING_MAX_TOTAL_BYTES,
+    DEFAULT_TRACING_SAMPLE_RATE,
+    DEFAULT_TRANSFER_QUEUE_SIZE,
+    DEFAULT_TRANSFER_QUEUE_TIMEOUT_SECONDS,
+    DEFAULT_UPLOAD_CHUNK_BYTES,
+    DEFAULT_UPLOAD_SESSION_EXPIRES_SECONDS,
+    MAX_UPLOAD_CHUNK_BYTES,
+    S3_MIN_PART_SIZE_BYTES,
 )
+from app.core.rate_limit import TrustedProxies, parse_rule
 
 
 class Settings(BaseSettings):
@@ -28,8 +53,87 @@ class Settings(BaseSettings):
     cors_origins: str = Field(default="")
 
     db_path: str = Field(default="./data/app.db")
+    storage_backend: Literal["local", "s3"] = Field(default="local")
     storage_dir: str = Field(default="../uploads")
+    storage_dedup: bool = Field(default=False)
+    storage_shard_depth: int = Field(default=2, ge=0, le=4)
+    storage_cache_dir: str = Field(default="")
+    storage_cache_max_bytes: int = Field(default=DEFAULT_STORAGE_CACHE_MAX_BYTES, gt=0)
     max_upload_bytes: int = Field(default=DEFAULT_MAX_UPLOAD_BYTES, gt=0)
+    upload_chunk_bytes: int = Field(
+        default=DEFAULT_UPLOAD_CHUNK_BYTES,
+        gt=0,
+        le=MAX_UPLOAD_CHUNK_BYTES,
+    )
+    upload_session_expires_seconds: int = Field(
+        default=DEFAULT_UPLOAD_SESSION_EXPIRES_SECONDS,
+        gt=0,
+    )
+
+    s3_bucket: str = Field(default="")
+    s3_prefix: str = Field(default="")
+    s3_endpoint_url: str = Field(default="")
+    s3_region: str = Field(default="")
+    s3_access_key_id: str = Field(default="")
+    s3_secret_access_key: SecretStr = Field(default=SecretStr(""))
+    s3_part_size_bytes: int = Field(default=DEFAULT_S3_PART_SIZE_BYTES, ge=S3_MIN_PART_SIZE_BYTES)
+    s3_max_concurrency: int = Field(default=DEFAULT_S3_MAX_CONCURRENCY, gt=0)
+    s3_download_mode: Literal["stream", "redirect"] = Field(default="stream")
+    s3_presign_expires_seconds: int = Field(
+        default=DEFAULT_S3_PRESIGN_EXPIRES_SECONDS,
+        gt=0,
+    )
+
+    download_offload: Literal["none", "x-accel-redirect", "x-sendfile"] = Field(default="none")
+    download_offload_prefix: str = Field(default="/_protected/")
+
+    maintenance_interval_seconds: int = Field(default=DEFAULT_MAINTENANCE_INTERVAL_SECONDS, ge=0)
+
+    share_cache_max_entries: int = Field(default=DEFAULT_SHARE_CACHE_MAX_ENTRIES, ge=0)
+    share_cache_ttl_seconds: float = Field(default=DEFAULT_SHARE_CACHE_TTL_SECONDS, gt=0)
+
+    password_hash_rounds: int = Field(default=DEFAULT_PASSWORD_HASH_ROUNDS, ge=4, le=31)
+    password_hash_workers: int = Field(default=DEFAULT_PASSWORD_HASH_WORKERS, gt=0)
+    password_hash_max_pending: int = Field(default=DEFAULT_PASSWORD_HASH_MAX_PENDING, ge=0)
+    password_verify_cache_ttl_seconds: int = Field(
+        default=DEFAULT_PASSWORD_VERIFY_CACHE_TTL_SECONDS,
+        ge=0,
+    )
+
+    trusted_proxies: str = Field(default="127.0.0.1,::1")
+    rate_limit_share_info_per_client: str = Field(default="120/60")
+    rate_limit_share_info_per_share: str = Field(default="600/60")
+    rate_limit_share_verify_per_client: str = Field(default="10/60")
+    rate_limit_share_verify_per_share: str = Field(default="30/60")
+    rate_limit_share_download_per_client: str = Field(default="30/60")
+    rate_limit_share_download_per_share: str = Field(default="120/60")
+
+    max_concurrent_uploads: int = Field(default=DEFAULT_MAX_CONCURRENT_UPLOADS, ge=0)
+    max_concurrent_downloads: int = Field(default=DEFAULT_MAX_CONCURRENT_DOWNLOADS, ge=0)
+    upload_queue_size: int = Field(default=DEFAULT_TRANSFER_QUEUE_SIZE, ge=0)
+    download_queue_size: int = Field(default=DEFAULT_TRANSFER_QUEUE_SIZE, ge=0)
+    transfer_queue_timeout_seconds: float = Field(
+        default=DEFAULT_TRANSFER_QUEUE_TIMEOUT_SECONDS,
+        gt=0,
+    )
+
+    bandwidth_global_bytes_per_second: int = Field(default=0, ge=0)
+    bandwidth_per_share_bytes_per_second: int = Field(default=0, ge=0)
+    bandwidth_per_client_bytes_per_second: int = Field(default=0, ge=0)
+
+    metrics_enabled: bool = Field(default=True)
+    metrics_dir: str = Field(default="")
+
+    profiling_enabled: bool = Field(default=False)
+    profiling_slow_request_ms: int = Field(default=DEFAULT_PROFILING_SLOW_REQUEST_MS, ge=0)
+    profiling_sample_rate: float = Field(default=0.0, ge=0, le=1)
+
+    tracing_enabled: bool = Field(default=False)
+    tracing_sample_rate: float = Field(default=DEFAULT_TRACING_SAMPLE_RATE, ge=0, le=1)
+    tracing_exporter: Literal["jsonl", "otlp"] = Field(default="jsonl")
+    tracing_dir: str = Field(default="./data/traces")
+    tracing_max_file_bytes: int = Field(default=DEFAULT_TRACING_MAX_FILE_BYTES, gt=0)
+    tracing_max_total_bytes: int = Field(default=DEFAULT_TRACING_MAX_TOTAL_BYTES, gt=0)
 
     admin_token_expires_seconds: int = Field(
         default=DEFAULT_ADMIN_TOKEN_EXPIRES_SECONDS,
@@ -40,6 +144,41 @@ class Settings(BaseSettings):
         gt=0,
     )
 
+    @field_validator(
+        "rate_limit_share_info_per_client",
+        "rate_limit_share_info_per_share",
+        "rate_limit_share_verify_per_client",
+        "rate_limit_share_verify_per_share",
+        "rate_limit_share_download_per_client",
+        "rate_limit_share_download_per_share",
+    )
+    @classmethod
+    def _check_rate_limit_rule(cls, value: str) -> str:
+        parse_rule(value)
+        return value
+
+    @field_validator("trusted_proxies")
+    @classmethod
+    def _check_trusted_proxies(cls, value: str) -> str:
+        TrustedProxies(v.strip() for v in value.split(",") if v.strip())
+        return value
+
+    @model_validator(mode="after")
+    def _check_storage(self) -> Settings:
+        if self.storage_cache_dir and self.download_offload == "x-accel-redirect":
+            raise ValueError("APP_STORAGE_CACHE_DIR cannot be combined with x-accel-redirect offload")
+        if self.storage_backend != "s3":
+            return self
+        if not self.s3_bucket:
+            raise ValueError("APP_S3_BUCKET is required when APP_STORAGE_BACKEND=s3")
+        if self.storage_dedup:
+            raise ValueError("APP_STORAGE_DEDUP is not supported with APP_STORAGE_BACKEND=s3")
+        if self.upload_chunk_bytes < S3_MIN_PART_SIZE_BYTES:
+            raise ValueError(
+                f"APP_UPLOAD_CHUNK_BYTES must be at least {S3_MIN_PART_SIZE_BYTES} for S3"
+            )
+        return self
+
 
 @lru_cache(maxsize=1)
 def get_settings() -> Settings:
@@ -0,0 +1,464 @@
+from __future__ import annotations
+
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Protocol, TypeVar
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.asgi import ZEROCOPY_SEND_EXTENSION
+from app.core.rate_limit import TrustedProxies
+
+
+logger = logging.getLogger("app.tracing")
+
+_current: ContextVar[Span | None] = ContextVar("trace_span", default=None)
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_INVALID_TRACE_ID = "0" * 32
+_INVALID_SPAN_ID = "0" * 16
+_ROOT_SPAN_NAME = "http.request"
+
+AttributeValue = str | int | float | bool
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class _Trace:
+    def __init__(self, *, trace_id: str, processor: SpanProcessor) -> None:
+        self.trace_id = trace_id
+        self.processor = processor
+        self.root: Span | None = None
+        self.spans: list[Span] = []
+        self.lock = threading.Lock()
+
+
+class Span:
+    __slots__ = (
+        "_trace",
+        "span_id",
+        "parent_id",
+        "name",
+        "attributes",
+        "status",
+        "start_time_ns",
+        "end_time_ns",
+        "_started_at",
+    )
+
+    def __init__(
+        self,
+        *,
+        trace: _Trace,
+        name: str,
+        parent_id: str | None,
+        attributes: dict[str, AttributeValue],
+    ) -> None:
+        self._trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.status = "ok"
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns = 0
+        self._started_at = time.perf_counter_ns()
+
+    @property
+    def trace_id(self) -> str:
+        return self._trace.trace_id
+
+    def child(self, name: str, attributes: dict[str, AttributeValue]) -> Span:
+        return Span(trace=self._trace, name=name, parent_id=self.span_id, attributes=attributes)
+
+    def set(self, **attributes: AttributeValue) -> None:
+        self.attributes.update(attributes)
+
+    def record_error(self, exc: BaseException) -> None:
+        self.status = "error"
+        self.attributes["error.type"] = type(exc).__name__
+
+    def end(self) -> None:
+        if self.end_time_ns:
+            return
+        self.end_time_ns = self.start_time_ns + time.perf_counter_ns() - self._started_at
+        trace = self._trace
+        with trace.lock:
+            trace.spans.append(self)
+            if self is not trace.root:
+                return
+            # Spans still open when the request ends (e.g. abandoned streams) are not exported.
+            spans, trace.spans = trace.spans, []
+        trace.processor.submit(spans)
+
+
+def current_trace_id() -> str | None:
+    span = _current.get()
+    return span.trace_id if span is not None else None
+
+
+def annotate(**attributes: AttributeValue) -> None:
+    span = _current.get()
+    if span is not None:
+        span.set(**attributes)
+
+
+def start_span(name: str, **attributes: AttributeValue) -> Span | None:
+    # Unlike span(), the new span does not become current; callers end it themselves.
+    parent = _current.get()
+    if parent is None:
+        return None
+    return parent.child(name, attributes)
+
+
+@contextmanager
+def span(name: str, **attributes: AttributeValue) -> Iterator[Span | None]:
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.child(name, attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as exc:
+        child.record_error(exc)
+        raise
+    finally:
+        _current.reset(token)
+        child.end()
+
+
+def traced(name: str) -> Callable[[F], F]:
+    def decorate(func: F) -> F:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                if _current.get() is None:
+                    return await func(*args, **kwargs)
+                with span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+class SpanExporter(Protocol):
+    def export(self, spans: list[Span]) -> None: ...
+
+    def shutdown(self) -> None: ...
+
+
+class _FileExporter:
+    def __init__(
+        self,
+        *,
+        directory: str,
+        suffix: str,
+        max_file_bytes: int,
+        max_total_bytes: int,
+    ) -> None:
+        self._dir = Path(directory).expanduser().resolve()
+        self._suffix = suffix
+        self._max_file_bytes = max_file_bytes
+        self._max_total_bytes = max_total_bytes
+        self._file: Any = None
+
+    def _prune(self) -> None:
+        # Oldest first, across workers and restarts, leaving room for the file about to open.
+        files = []
+        for path in self._dir.glob(f"*{self._suffix}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files) + self._max_file_bytes
+        for _, size, path in sorted(files):
+            if total <= self._max_total_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def _open(self) -> None:
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._prune()
+        # One file per worker, so concurrent workers never interleave lines; a new one is
+        # started whenever the current file reaches max_file_bytes.
+        path = self._dir / f"{os.getpid()}.{time.time_ns()}{self._suffix}"
+        self._file = path.open("a", encoding="utf-8")
+
+    def _write(self, lines: list[str]) -> None:
+        if self._file is None:
+            self._open()
+        self._file.write("".join(line + "\n" for line in lines))
+        self._file.flush()
+        if self._file.tell() >= self._max_file_bytes:
+            self._file.close()
+            self._file = None
+
+    def shutdown(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class JsonlSpanExporter(_FileExporter):
+    def __init__(self, *, directory: str, max_file_bytes: int, max_total_bytes: int) -> None:
+        super().__init__(
+            directory=directory,
+            suffix=".spans.jsonl",
+            max_file_bytes=max_file_bytes,
+            max_total_bytes=max_total_bytes,
+        )
+
+    def export(self, spans: list[Span]) -> None:
+        pid = os.getpid()
+        self._write(
+            [
+                json.dumps(
+                    {
+                        "trace_id": span.trace_id,
+                        "span_id": span.span_id,
+                        "parent_id": span.parent_id,
+                        "name": span.name,
+                        "start_time_ns": span.start_time_ns,
+                        "duration_ms": round((span.end_time_ns - span.start_time_ns) / 1e6, 3),
+                        "status": span.status,
+                        "attributes": span.attributes,
+                        "pid": pid,
+                    },
+                    ensure_ascii=False,
+                )
+                for span in spans
+            ]
+        )
+
+
+def _otlp_value(value: AttributeValue) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict[str, AttributeValue]) -> list[dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+class OtlpFileSpanExporter(_FileExporter):
+    # Each line is an OTLP/JSON ExportTraceServiceRequest, as written by the OpenTelemetry
+    # file exporter, so the collector's otlpjsonfile receiver can ingest it.
+    def __init__(
+        self,
+        *,
+        directory: str,
+        service_name: str,
+        max_file_bytes: int,
+        max_total_bytes: int,
+    ) -> None:
+        super().__init__(
+            directory=directory,
+            suffix=".otlp.jsonl",
+            max_file_bytes=max_file_bytes,
+            max_total_bytes=max_total_bytes,
+        )
+        self._service_name = service_name
+
+    def export(self, spans: list[Span]) -> None:
+        resource = {"service.name": self._service_name, "process.pid": os.getpid()}
+        otlp_spans = [
+            {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "parentSpanId": span.parent_id or "",
+                "name": span.name,
+                "kind": 2 if span.name == _ROOT_SPAN_NAME else 1,
+                "startTimeUnixNano": str(span.start_time_ns),
+                "endTimeUnixNano": str(span.end_time_ns),
+                "attributes": _otlp_attributes(span.attributes),
+                "status": {"code": 2 if span.status == "error" else 1},
+            }
+            for span in spans
+        ]
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": _otlp_attributes(resource)},
+                    "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": otlp_spans}],
+                }
+            ]
+        }
+        self._write([json.dumps(request, ensure_ascii=False)])
+
+
+class SpanProcessor:
+    def __init__(self, *, exporter: SpanExporter, max_queued_traces: int) -> None:
+        self._exporter = exporter
+        # Exporting does file I/O, so finished traces are handed to a background thread.
+        self._queue: queue.Queue[list[Span] | None] = queue.Queue(maxsize=max_queued_traces)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+        self.dropped = 0
+
+    def submit(self, spans: list[Span]) -> None:
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            spans = self._queue.get()
+            if spans is None:
+                return
+            batch = list(spans)
+            while True:
+                try:
+                    more = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    self._export(batch)
+                    return
+                batch.extend(more)
+            self._export(batch)
+
+    def _export(self, spans: list[Span]) -> None:
+        try:
+            self._exporter.export(spans)
+        except Exception:
+            logger.exception("failed to export %d spans", len(spans))
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+        self._exporter.shutdown()
+
+
+def parse_traceparent(value: str) -> tuple[str, str, bool] | None:
+    match = _TRACEPARENT.match(value.strip().lower())
+    if match is None:
+        return None
+    trace_id, span_id, flags = match.groups()
+    if trace_id == _INVALID_TRACE_ID or span_id == _INVALID_SPAN_ID:
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & 1)
+
+
+def format_traceparent(span: Span) -> str:
+    return f"00-{span.trace_id}-{span.span_id}-01"
+
+
+class TracingMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        processor: SpanProcessor,
+        sample_rate: float,
+        trusted_proxies: TrustedProxies,
+    ) -> None:
+        self._app = app
+        self._processor = processor
+        self._sample_rate = sample_rate
+        self._trusted_proxies = trusted_proxies
+
+    def _parent(self, scope: Scope) -> tuple[str, str, bool] | None:
+        # Anyone else could force every request to be traced by sending a sampled flag.
+        client = scope.get("client")
+        if not client or not self._trusted_proxies.is_trusted(client[0]):
+            return None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                return parse_traceparent(value.decode("latin-1"))
+        return None
+
+    def _start_root(self, scope: Scope) -> Span | None:
+        parent = self._parent(scope)
+        # Follow the caller's decision so a trace is either complete or absent across services.
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id, sampled = "", None, random.random() < self._sample_rate
+        if not sampled:
+            return None
+        trace = _Trace(trace_id=trace_id or os.urandom(16).hex(), processor=self._processor)
+        root = Span(
+            trace=trace,
+            name=_ROOT_SPAN_NAME,
+            parent_id=parent_id,
+            attributes={"http.method": scope["method"], "http.target": scope["path"]},
+        )
+        trace.root = root
+        return root
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self._app(scope, receive, send)
+            return
+
+        root = self._start_root(scope)
+        if root is None:
+            await self._app(scope, receive, send)
+            return
+
+        status_code = 500
+        sent_bytes = 0
+        traceparent = format_traceparent(root).encode("latin-1")
+
+        async def traced_send(message: Message) -> None:
+            nonlocal status_code, sent_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"traceparent", traceparent)]
+            elif message["type"] == "http.response.body":
+                sent_bytes += len(message.get("body", b""))
+            elif message["type"] == ZEROCOPY_SEND_EXTENSION:
+                sent_bytes += message.get("count") or 0
+            await send(message)
+
+        token = _current.set(root)
+        try:
+            await self._app(scope, receive, traced_send)
+        except BaseException as exc:
+            root.record_error(exc)
+            raise
+        finally:
+            _current.reset(token)
+            root.set(
+                **{
+                    "http.route": getattr(scope.get("route"), "path", "unmatched"),
+                    "http.status_code": status_code,
+                    "http.response.bytes": sent_bytes,
+                }
+            )
+            if status_code >= 500:
+                root.status = "error"
+            root.end()
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import re
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.asgi import send_error
+
+
+class TransferLimitExceededError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class TransferLimiterStats:
+    active: int
+    queued: int
+    max_active: int
+    max_queued: int
+    admitted: int
+    shed: int
+
+
+class TransferLimiter:
+    def __init__(self, *, max_active: int, max_queued: int, queue_timeout_seconds: float) -> None:
+        self._max_active = max_active
+        self._max_queued = max_queued
+        self._queue_timeout_seconds = queue_timeout_seconds
+        self._semaphore = asyncio.Semaphore(max_active)
+        self._active = 0
+        self._queued = 0
+        self._admitted = 0
+        self._shed = 0
+
+    async def _acquire(self) -> None:
+        if self._semaphore.locked() and self._queued >= self._max_queued:
+            self._shed += 1
+            raise TransferLimitExceededError()
+        self._queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self._queue_timeout_seconds)
+        except TimeoutError:
+            self._shed += 1
+            raise TransferLimitExceededError() from None
+        finally:
+            self._queued -= 1
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self._acquire()
+        self._active += 1
+        self._admitted += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._semaphore.release()
+
+    def stats(self) -> TransferLimiterStats:
+        return TransferLimiterStats(
+            active=self._active,
+            queued=self._queued,
+            max_active=self._max_active,
+            max_queued=self._max_queued,
+            admitted=self._admitted,
+            shed=self._shed,
+        )
+
+
+@dataclass(frozen=True)
+class TransferLimiters:
+    uploads: TransferLimiter | None
+    downloads: TransferLimiter | None
+
+
+@dataclass(frozen=True)
+class TransferRoute:
+    method: str
+    path: re.Pattern[str]
+    limiter: TransferLimiter
+
+
+class TransferLimitMiddleware:
+    def __init__(self, app: ASGIApp, *, routes: list[TransferRoute], retry_after: float) -> None:
+        self._app = app
+        self._routes = routes
+        self._retry_after = retry_after
+
+    def _match(self, scope: Scope) -> TransferLimiter | None:
+        for route in self._routes:
+            if route.method == scope["method"] and route.path.match(scope["path"]):
+                return route.limiter
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limiter = self._match(scope) if scope["type"] == "http" else None
+        if limiter is None:
+            await self._app(scope, receive, send)
+            return
+
+        # The slot is held until the response body has been fully sent, not just the handler.
+        try:
+            async with limiter.slot():
+                await self._app(scope, receive, send)
+        except TransferLimitExceededError:
+            await send_error(
+                send=send,
+                status_code=503,
+                detail="服务繁忙，请稍后重试",
+                retry_after=self._retry_after,
+            )
@@ -1 +1 @@
-__all__ = ["base", "session"]
+__all__ = ["base", "schema", "session"]
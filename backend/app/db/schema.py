@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import sqlite3
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateColumn
+
+from app.core.constants import FILES_ACTIVE_COUNTER, SEARCH_INDEX_TABLE
+from app.db.base import Base
+
+
+# Keeps counters.files_active equal to the number of undeleted files on every write path.
+_TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_files_count_insert AFTER INSERT ON files
+    WHEN NEW.is_deleted = 0
+    BEGIN
+        UPDATE counters SET value = value + 1 WHERE name = '{FILES_ACTIVE_COUNTER}';
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_files_count_update AFTER UPDATE OF is_deleted ON files
+    WHEN OLD.is_deleted != NEW.is_deleted
+    BEGIN
+        UPDATE counters
+        SET value = value + CASE WHEN NEW.is_deleted = 0 THEN 1 ELSE -1 END
+        WHERE name = '{FILES_ACTIVE_COUNTER}';
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_files_count_delete AFTER DELETE ON files
+    WHEN OLD.is_deleted = 0
+    BEGIN
+        UPDATE counters SET value = value - 1 WHERE name = '{FILES_ACTIVE_COUNTER}';
+    END
+    """,
+)
+
+# Trigram FTS mirror of the searchable columns of undeleted files, keyed by files.rowid.
+_SEARCH_INDEX_DDL = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_INDEX_TABLE}
+    USING fts5(original_name, remark, tokenize='trigram')
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_files_search_insert AFTER INSERT ON files
+    WHEN NEW.is_deleted = 0
+    BEGIN
+        INSERT INTO {SEARCH_INDEX_TABLE} (rowid, original_name, remark)
+        VALUES (NEW.rowid, NEW.original_name, NEW.remark);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_files_search_update
+    AFTER UPDATE OF original_name, remark, is_deleted ON files
+    BEGIN
+        DELETE FROM {SEARCH_INDEX_TABLE} WHERE rowid = OLD.rowid;
+        INSERT INTO {SEARCH_INDEX_TABLE} (rowid, original_name, remark)
+        SELECT NEW.rowid, NEW.original_name, NEW.remark WHERE NEW.is_deleted = 0;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_files_search_delete AFTER DELETE ON files
+    BEGIN
+        DELETE FROM {SEARCH_INDEX_TABLE} WHERE rowid = OLD.rowid;
+    END
+    """,
+)
+
+
+def supports_search_index(*, conn: Connection) -> bool:
+    # The trigram tokenizer shipped with SQLite 3.34.
+    if sqlite3.sqlite_version_info < (3, 34, 0):
+        return False
+    options = {row[0] for row in conn.exec_driver_sql("PRAGMA compile_options")}
+    return "ENABLE_FTS5" in options
+
+
+def has_search_index(*, conn: Connection) -> bool:
+    row = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (SEARCH_INDEX_TABLE,),
+    ).first()
+    return row is not None
+
+
+def rebuild_search_index(*, conn: Connection) -> int:
+    conn.execute(text(f"DELETE FROM {SEARCH_INDEX_TABLE}"))
+    result = conn.execute(
+        text(
+            f"INSERT INTO {SEARCH_INDEX_TABLE} (rowid, original_name, remark) "
+            "SELECT rowid, original_name, remark FROM files WHERE is_deleted = 0"
+        )
+    )
+    return result.rowcount
+
+
+def upgrade_schema(*, engine: Engine) -> None:
+    Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+        conn.execute(
+            text(
+                "INSERT OR IGNORE INTO counters (name, value) "
+                "SELECT :name, COUNT(*) FROM files WHERE is_deleted = 0"
+            ),
+            {"name": FILES_ACTIVE_COUNTER},
+        )
+        for trigger in _TRIGGERS:
+            conn.execute(text(trigger))
+
+        if supports_search_index(conn=conn):
+            created = not has_search_index(conn=conn)
+            for ddl in _SEARCH_INDEX_DDL:
+                conn.execute(text(ddl))
+            # Files that predate the index would otherwise never match a keyword search.
+            if created:
+                rebuild_search_index(conn=conn)
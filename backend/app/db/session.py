@@ -1,19 +1,58 @@
 from __future__ import annotations
 
+import time
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.engine import Engine
-from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.orm import Session, SessionTransaction, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+
+from app.core.constants import (
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_CACHE_SIZE_KIB,
+    SQLITE_MMAP_SIZE_BYTES,
+    SQLITE_WRITER_POOL_TIMEOUT_SECONDS,
+    TRACING_MAX_STATEMENT_CHARS,
+)
+from app.core import profiling, tracing
+from app.core.metrics import DB_QUERY_DURATION
+
+
+_STATEMENT_KINDS = frozenset({"select", "insert", "update", "delete", "with", "pragma"})
 
 
 @dataclass(frozen=True)
 class Database:
     engine: Engine
+    reader_engine: Engine
     sessionmaker: sessionmaker[Session]
 
 
+class RoutingSession(Session):
+    def __init__(self, *, reader: Engine, writer: Engine, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._reader = reader
+        self._writer = writer
+        self._writing = False
+
+    def get_bind(self, mapper: Any = None, clause: Any = None, **kwargs: Any) -> Engine:
+        # Once a transaction writes it stays on the writer so it reads its own changes.
+        if self._writing or self._flushing or isinstance(clause, (UpdateBase, TextClause)):
+            self._writing = True
+            return self._writer
+        return self._reader
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _release_writer(session: RoutingSession, transaction: SessionTransaction) -> None:
+    if transaction.parent is None:
+        session._writing = False
+
+
 def _ensure_parent_dir(*, file_path: str) -> None:
     Path(file_path).expanduser().resolve().parent.mkdir(parents=True, exist_ok=True)
 
@@ -23,12 +62,81 @@ def _build_sqlite_url(*, db_path: str) -> str:
     return f"sqlite+pysqlite:///{abs_path}"
 
 
+def _install_pragmas(*, engine: Engine, query_only: bool) -> None:
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection: Any, _: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+            if query_only:
+                cursor.execute("PRAGMA query_only=ON")
+            else:
+                cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE_BYTES}")
+            cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KIB}")
+        finally:
+            cursor.close()
+
+
+def _install_metrics(*, engine: Engine, name: str) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn: Any, cursor: Any, statement: str, *_: Any) -> None:
+        span = tracing.start_span(
+            "db.query",
+            **{"db.engine": name, "db.statement": statement[:TRACING_MAX_STATEMENT_CHARS]},
+        )
+        conn.info.setdefault("query_started_at", []).append((time.perf_counter(), span))
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn: Any, cursor: Any, statement: str, *_: Any) -> None:
+        started_at, span = conn.info["query_started_at"].pop()
+        elapsed = time.perf_counter() - started_at
+        words = statement.split(None, 1)
+        kind = words[0].lower() if words else "other"
+        profiling.record("db", elapsed)
+        if span is not None:
+            span.set(**{"db.rowcount": cursor.rowcount})
+            span.end()
+        DB_QUERY_DURATION.observe(
+            elapsed,
+            engine=name,
+            statement=kind if kind in _STATEMENT_KINDS else "other",
+        )
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(context: Any) -> None:
+        started = context.connection.info.get("query_started_at") if context.connection else None
+        if not started:
+            return
+        _, span = started.pop()
+        if span is not None:
+            span.record_error(context.original_exception)
+            span.end()
+
+
 def create_sqlite_database(*, db_path: str) -> Database:
     _ensure_parent_dir(file_path=db_path)
-    engine = create_engine(
-        _build_sqlite_url(db_path=db_path),
-        connect_args={"check_same_thread": False},
-        pool_pre_ping=True,
+    url = _build_sqlite_url(db_path=db_path)
+    connect_args = {"check_same_thread": False}
+
+    writer = create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=SQLITE_WRITER_POOL_TIMEOUT_SECONDS,
+    )
+    reader = create_engine(url, connect_args=connect_args)
+    _install_pragmas(engine=writer, query_only=False)
+    _install_pragmas(engine=reader, query_only=True)
+    _install_metrics(engine=writer, name="writer")
+    _install_metrics(engine=reader, name="reader")
+
+    maker = sessionmaker(
+        class_=RoutingSession,
+        expire_on_commit=False,
+        reader=reader,
+        writer=writer,
     )
-    maker = sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
-    return Database(engine=engine, sessionmaker=maker)
+    return Database(engine=writer, reader_engine=reader, sessionmaker=maker)
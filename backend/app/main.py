@@ -1,24 +1,316 @@
 from __future__ import annotations
 
+import re
+from collections.abc import Iterator
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.core.settings import get_settings
-from app.db.base import Base
-from app.db.session import create_sqlite_database
-from app.models import File, ShareDownloadToken, ShareLink  # noqa: F401
-from app.routers import auth, files, share
+from app.core.constants import (
+    MAINTENANCE_JITTER_RATIO,
+    MAINTENANCE_LOCK_SUFFIX,
+    METRICS_FLUSH_INTERVAL_SECONDS,
+    PASSWORD_VERIFY_CACHE_MAX_ENTRIES,
+    PROFILING_MAX_STACK_DEPTH,
+    PROFILING_SAMPLE_INTERVAL_SECONDS,
+    PROFILING_TOP_STACKS,
+    TRACING_MAX_QUEUED_TRACES,
+    TRACING_SERVICE_NAME,
+    RATE_LIMIT_MAX_KEYS,
+    TRANSFER_RETRY_AFTER_SECONDS,
+)
+from app.core.bandwidth import (
+    BandwidthLimits,
+    BandwidthMiddleware,
+    BandwidthRoute,
+    BandwidthShaper,
+)
+from app.core.metrics import REGISTRY, Gauge, LabelValues, MetricsMiddleware, MetricsStore
+from app.core.profiling import ProfilingControl, ProfilingMiddleware, StackSampler
+from app.core.rate_limit import (
+    RateLimitMiddleware,
+    RateLimitRoute,
+    TokenBucketLimiter,
+    TrustedProxies,
+    parse_rule,
+)
+from app.core.scheduler import PeriodicTask
+from app.core.security import PasswordHasher
+from app.core.settings import Settings, get_settings
+from app.core.tracing import (
+    JsonlSpanExporter,
+    OtlpFileSpanExporter,
+    SpanExporter,
+    SpanProcessor,
+    TracingMiddleware,
+)
+from app.core.transfer_limit import (
+    TransferLimiter,
+    TransferLimiters,
+    TransferLimitMiddleware,
+    TransferRoute,
+)
+from app.db.schema import upgrade_schema
+from app.db.session import Database, create_sqlite_database
+from app.models import Blob, Counter, File, ShareDownloadToken, ShareLink, UploadSession  # noqa: F401
+from app.routers import admin, auth, files, metrics, share, uploads
+from app.services import maintenance_service
+from app.services.shares_service import ShareCache, VerifiedPasswordCache
+from app.storage import Storage
+from app.storage.cache import CachingStorage
 from app.storage.local import LocalStorage
+from app.storage.s3 import S3Storage, create_s3_client
+from app.storage.timed import TimedStorage
 
 
 def _split_csv(value: str) -> list[str]:
     return [v.strip() for v in value.split(",") if v.strip()]
 
 
+def _create_backend_storage(settings: Settings) -> Storage:
+    if settings.storage_backend == "s3":
+        return S3Storage(
+            client=create_s3_client(
+                endpoint_url=settings.s3_endpoint_url,
+                region=settings.s3_region,
+                access_key_id=settings.s3_access_key_id,
+                secret_access_key=settings.s3_secret_access_key.get_secret_value(),
+            ),
+            bucket=settings.s3_bucket,
+            prefix=settings.s3_prefix,
+            part_size=settings.s3_part_size_bytes,
+            max_concurrency=settings.s3_max_concurrency,
+            presign_expires_seconds=(
+                settings.s3_presign_expires_seconds
+                if settings.s3_download_mode == "redirect"
+                else None
+            ),
+        )
+
+    return LocalStorage(
+        root_dir=settings.storage_dir,
+        content_addressed=settings.storage_dedup,
+        shard_depth=settings.storage_shard_depth,
+    )
+
+
+def _create_storage(settings: Settings) -> Storage:
+    # Always wrapped, as profiling can be switched on at runtime; idle it reads one ContextVar.
+    storage = TimedStorage(backend=_create_backend_storage(settings))
+    if not settings.storage_cache_dir:
+        return storage
+    return CachingStorage(
+        backend=storage,
+        cache_dir=settings.storage_cache_dir,
+        max_bytes=settings.storage_cache_max_bytes,
+    )
+
+
+def _create_maintenance_task(
+    *,
+    settings: Settings,
+    database: Database,
+    storage: Storage,
+    share_cache: ShareCache,
+) -> PeriodicTask | None:
+    if settings.maintenance_interval_seconds == 0:
+        return None
+
+    def _run() -> None:
+        with database.sessionmaker() as db:
+            maintenance_service.run_maintenance(
+                db=db,
+                storage=storage,
+                share_cache=share_cache,
+                download_token_expires_seconds=settings.download_token_expires_seconds,
+            )
+
+    return PeriodicTask(
+        name="maintenance",
+        func=_run,
+        interval_seconds=settings.maintenance_interval_seconds,
+        jitter_ratio=MAINTENANCE_JITTER_RATIO,
+        lock_path=f"{settings.db_path}{MAINTENANCE_LOCK_SUFFIX}",
+    )
+
+
+def _create_limiter(value: str) -> TokenBucketLimiter | None:
+    rule = parse_rule(value)
+    if rule is None:
+        return None
+    return TokenBucketLimiter(rule=rule, max_keys=RATE_LIMIT_MAX_KEYS)
+
+
+def _create_rate_limit_routes(settings: Settings) -> list[RateLimitRoute]:
+    share_path = r"^/api/share/(?P<share_code>[^/]+)"
+    return [
+        RateLimitRoute(
+            method="GET",
+            path=re.compile(share_path + "$"),
+            per_client=_create_limiter(settings.rate_limit_share_info_per_client),
+            per_share=_create_limiter(settings.rate_limit_share_info_per_share),
+        ),
+        RateLimitRoute(
+            method="POST",
+            path=re.compile(share_path + "/verify$"),
+            per_client=_create_limiter(settings.rate_limit_share_verify_per_client),
+            per_share=_create_limiter(settings.rate_limit_share_verify_per_share),
+        ),
+        RateLimitRoute(
+            method="GET",
+            path=re.compile(share_path + "/download$"),
+            per_client=_create_limiter(settings.rate_limit_share_download_per_client),
+            per_share=_create_limiter(settings.rate_limit_share_download_per_share),
+        ),
+    ]
+
+
+def _create_transfer_limiter(
+    *,
+    max_active: int,
+    max_queued: int,
+    settings: Settings,
+) -> TransferLimiter | None:
+    if max_active == 0:
+        return None
+    return TransferLimiter(
+        max_active=max_active,
+        max_queued=max_queued,
+        queue_timeout_seconds=settings.transfer_queue_timeout_seconds,
+    )
+
+
+def _create_transfer_routes(limiters: TransferLimiters) -> list[TransferRoute]:
+    routes: list[TransferRoute] = []
+    if limiters.uploads is not None:
+        upload_path = re.compile(r"^/api/files/upload$")
+        routes += [
+            TransferRoute(method="POST", path=upload_path, limiter=limiters.uploads),
+            TransferRoute(method="PUT", path=upload_path, limiter=limiters.uploads),
+            TransferRoute(
+                method="PUT",
+                path=re.compile(r"^/api/files/uploads/[^/]+/chunks/[^/]+$"),
+                limiter=limiters.uploads,
+            ),
+        ]
+    if limiters.downloads is not None:
+        routes += [
+            TransferRoute(
+                method="GET",
+                path=re.compile(r"^/api/files/[^/]+/download$"),
+                limiter=limiters.downloads,
+            ),
+            TransferRoute(
+                method="GET",
+                path=re.compile(r"^/api/share/[^/]+/download$"),
+                limiter=limiters.downloads,
+            ),
+        ]
+    return routes
+
+
+def _create_bandwidth_routes() -> list[BandwidthRoute]:
+    return [
+        BandwidthRoute(method="GET", path=re.compile(r"^/api/files/[^/]+/download$")),
+        BandwidthRoute(method="GET", path=re.compile(r"^/api/share/(?P<share_code>[^/]+)/download$")),
+    ]
+
+
+def _register_gauges(*, limiters: TransferLimiters, shaper: BandwidthShaper) -> None:
+    def _transfers() -> Iterator[tuple[LabelValues, float]]:
+        for direction, limiter in (("upload", limiters.uploads), ("download", limiters.downloads)):
+            if limiter is None:
+                continue
+            stats = limiter.stats()
+            yield (direction, "active"), stats.active
+            yield (direction, "queued"), stats.queued
+
+    REGISTRY.register(
+        Gauge(
+            name="transfers",
+            documentation="Transfers admitted or waiting for a slot.",
+            labelnames=("direction", "state"),
+            collect=_transfers,
+        )
+    )
+    REGISTRY.register(
+        Gauge(
+            name="download_streams_active",
+            documentation="Download responses currently sending a body.",
+            collect=lambda: [((), shaper.active_streams)],
+        )
+    )
+
+
+def _create_metrics_flush_task(*, settings: Settings, store: MetricsStore) -> PeriodicTask | None:
+    if not settings.metrics_enabled or not settings.metrics_dir:
+        return None
+    # Every worker publishes its own snapshot, so no leader lock.
+    return PeriodicTask(
+        name="metrics-flush",
+        func=store.flush,
+        interval_seconds=METRICS_FLUSH_INTERVAL_SECONDS,
+        jitter_ratio=0,
+        lock_path=None,
+    )
+
+
+def _create_span_exporter(settings: Settings) -> SpanExporter:
+    if settings.tracing_exporter == "otlp":
+        return OtlpFileSpanExporter(
+            directory=settings.tracing_dir,
+            service_name=TRACING_SERVICE_NAME,
+            max_file_bytes=settings.tracing_max_file_bytes,
+            max_total_bytes=settings.tracing_max_total_bytes,
+        )
+    return JsonlSpanExporter(
+        directory=settings.tracing_dir,
+        max_file_bytes=settings.tracing_max_file_bytes,
+        max_total_bytes=settings.tracing_max_total_bytes,
+    )
+
+
 def create_app() -> FastAPI:
     settings = get_settings()
     app = FastAPI(title="file-transfer")
+    trusted_proxies = TrustedProxies(_split_csv(settings.trusted_proxies))
+
+    app.state.bandwidth = BandwidthShaper(
+        limits=BandwidthLimits(
+            global_bytes_per_second=settings.bandwidth_global_bytes_per_second,
+            per_share_bytes_per_second=settings.bandwidth_per_share_bytes_per_second,
+            per_client_bytes_per_second=settings.bandwidth_per_client_bytes_per_second,
+        )
+    )
+    app.add_middleware(
+        BandwidthMiddleware,
+        routes=_create_bandwidth_routes(),
+        shaper=app.state.bandwidth,
+        trusted_proxies=trusted_proxies,
+    )
 
+    app.state.transfer_limiters = TransferLimiters(
+        uploads=_create_transfer_limiter(
+            max_active=settings.max_concurrent_uploads,
+            max_queued=settings.upload_queue_size,
+            settings=settings,
+        ),
+        downloads=_create_transfer_limiter(
+            max_active=settings.max_concurrent_downloads,
+            max_queued=settings.download_queue_size,
+            settings=settings,
+        ),
+    )
+    app.add_middleware(
+        TransferLimitMiddleware,
+        routes=_create_transfer_routes(app.state.transfer_limiters),
+        retry_after=TRANSFER_RETRY_AFTER_SECONDS,
+    )
+    app.add_middleware(
+        RateLimitMiddleware,
+        routes=_create_rate_limit_routes(settings),
+        trusted_proxies=trusted_proxies,
+    )
     if settings.cors_origins:
         app.add_middleware(
             CORSMiddleware,
@@ -28,16 +320,103 @@ def create_app() -> FastAPI:
             allow_headers=["*"],
         )
 
+    app.state.profiling = ProfilingControl(
+        enabled=settings.profiling_enabled,
+        slow_request_ms=settings.profiling_slow_request_ms,
+        sample_rate=settings.profiling_sample_rate,
+    )
+    app.add_middleware(
+        ProfilingMiddleware,
+        control=app.state.profiling,
+        sampler=StackSampler(
+            interval_seconds=PROFILING_SAMPLE_INTERVAL_SECONDS,
+            max_depth=PROFILING_MAX_STACK_DEPTH,
+        ),
+        top_stacks=PROFILING_TOP_STACKS,
+    )
+
+    app.state.metrics = MetricsStore(registry=REGISTRY, snapshot_dir=settings.metrics_dir)
+    if settings.metrics_enabled:
+        _register_gauges(limiters=app.state.transfer_limiters, shaper=app.state.bandwidth)
+        app.add_middleware(
+            MetricsMiddleware,
+            download_routes=["/api/files/{file_id}/download", "/api/share/{share_code}/download"],
+        )
+
+    app.state.tracing = None
+    if settings.tracing_enabled:
+        app.state.tracing = SpanProcessor(
+            exporter=_create_span_exporter(settings),
+            max_queued_traces=TRACING_MAX_QUEUED_TRACES,
+        )
+        app.add_middleware(
+            TracingMiddleware,
+            processor=app.state.tracing,
+            sample_rate=settings.tracing_sample_rate,
+            trusted_proxies=trusted_proxies,
+        )
+
     @app.on_event("startup")
     def _startup() -> None:
         database = create_sqlite_database(db_path=settings.db_path)
-        Base.metadata.create_all(bind=database.engine)
+        upgrade_schema(engine=database.engine)
         app.state.database = database
-        app.state.storage = LocalStorage(root_dir=settings.storage_dir)
+        app.state.storage = _create_storage(settings)
+        app.state.share_cache = ShareCache(
+            max_entries=settings.share_cache_max_entries,
+            ttl_seconds=settings.share_cache_ttl_seconds,
+        )
+        app.state.password_hasher = PasswordHasher(
+            rounds=settings.password_hash_rounds,
+            max_workers=settings.password_hash_workers,
+            max_pending=settings.password_hash_max_pending,
+        )
+        app.state.verified_passwords = VerifiedPasswordCache(
+            max_entries=(
+                PASSWORD_VERIFY_CACHE_MAX_ENTRIES if settings.password_verify_cache_ttl_seconds else 0
+            ),
+            ttl_seconds=settings.password_verify_cache_ttl_seconds,
+        )
+        app.state.maintenance = _create_maintenance_task(
+            settings=settings,
+            database=database,
+            storage=app.state.storage,
+            share_cache=app.state.share_cache,
+        )
+        if app.state.maintenance is not None:
+            app.state.maintenance.start()
+        app.state.metrics_flush = _create_metrics_flush_task(
+            settings=settings,
+            store=app.state.metrics,
+        )
+        if app.state.metrics_flush is not None:
+            app.state.metrics_flush.start()
+
+    @app.on_event("shutdown")
+    def _shutdown() -> None:
+        maintenance: PeriodicTask | None = getattr(app.state, "maintenance", None)
+        if maintenance is not None:
+            maintenance.stop()
+        password_hasher: PasswordHasher | None = getattr(app.state, "password_hasher", None)
+        if password_hasher is not None:
+            password_hasher.shutdown()
+        metrics_flush: PeriodicTask | None = getattr(app.state, "metrics_flush", None)
+        if metrics_flush is not None:
+            metrics_flush.stop()
+            app.state.metrics.flush()
+        if app.state.tracing is not None:
+            app.state.tracing.shutdown()
+        storage: Storage | None = getattr(app.state, "storage", None)
+        if isinstance(storage, CachingStorage):
+            storage.shutdown()
 
     app.include_router(auth.router, prefix="/api", tags=["auth"])
+    app.include_router(uploads.router, prefix="/api", tags=["uploads"])
     app.include_router(files.router, prefix="/api", tags=["files"])
     app.include_router(share.router, prefix="/api", tags=["share"])
+    app.include_router(admin.router, prefix="/api", tags=["admin"])
+    if settings.metrics_enabled:
+        app.include_router(metrics.router, tags=["metrics"])
     return app
 
 
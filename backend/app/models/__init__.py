@@ -1,5 +1,8 @@
+from app.models.blob import Blob
+from app.models.counter import Counter
 from app.models.file import File
 from app.models.share_download_token import ShareDownloadToken
 from app.models.share_link import ShareLink
+from app.models.upload_session import UploadSession
 
-__all__ = ["File", "ShareDownloadToken", "ShareLink"]
+__all__ = ["Blob", "Counter", "File", "ShareDownloadToken", "ShareLink", "UploadSession"]
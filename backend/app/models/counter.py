@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+from sqlalchemy import BigInteger, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.constants import COUNTER_NAME_MAX_LENGTH
+from app.db.base import Base
+
+
+class Counter(Base):
+    __tablename__ = "counters"
+
+    name: Mapped[str] = mapped_column(String(COUNTER_NAME_MAX_LENGTH), primary_key=True)
+    value: Mapped[int] = mapped_column(BigInteger, default=0)
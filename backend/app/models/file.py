@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime, timezone
 
-from sqlalchemy import BigInteger, Boolean, DateTime, String
+from sqlalchemy import BigInteger, Boolean, DateTime, Index, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.constants import (
@@ -10,6 +10,7 @@ from app.core.constants import (
     FILENAME_MAX_LENGTH,
     MIME_TYPE_MAX_LENGTH,
     REMARK_MAX_LENGTH,
+    SHA256_HEX_LENGTH,
     UUID_STR_LENGTH,
 )
 from app.db.base import Base
@@ -21,6 +22,7 @@ def _utc_now() -> datetime:
 
 class File(Base):
     __tablename__ = "files"
+    __table_args__ = (Index("ix_files_listing", "is_deleted", "created_at", "id"),)
 
     id: Mapped[str] = mapped_column(String(UUID_STR_LENGTH), primary_key=True)
     original_name: Mapped[str] = mapped_column(String(FILENAME_MAX_LENGTH))
@@ -28,6 +30,7 @@ class File(Base):
     file_path: Mapped[str] = mapped_column(String(FILE_PATH_MAX_LENGTH))
     file_size: Mapped[int] = mapped_column(BigInteger)
     mime_type: Mapped[str] = mapped_column(String(MIME_TYPE_MAX_LENGTH))
+    sha256: Mapped[str | None] = mapped_column(String(SHA256_HEX_LENGTH), nullable=True)
     remark: Mapped[str | None] = mapped_column(String(REMARK_MAX_LENGTH), nullable=True)
     is_deleted: Mapped[bool] = mapped_column(Boolean, default=False, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utc_now)
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from sqlalchemy import BigInteger, DateTime, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.constants import (
+    FILENAME_MAX_LENGTH,
+    MIME_TYPE_MAX_LENGTH,
+    REMARK_MAX_LENGTH,
+    UUID_STR_LENGTH,
+)
+from app.db.base import Base
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class UploadSession(Base):
+    __tablename__ = "upload_sessions"
+
+    id: Mapped[str] = mapped_column(String(UUID_STR_LENGTH), primary_key=True)
+    original_name: Mapped[str] = mapped_column(String(FILENAME_MAX_LENGTH))
+    mime_type: Mapped[str] = mapped_column(String(MIME_TYPE_MAX_LENGTH))
+    remark: Mapped[str | None] = mapped_column(String(REMARK_MAX_LENGTH), nullable=True)
+    total_size: Mapped[int] = mapped_column(BigInteger)
+    chunk_size: Mapped[int] = mapped_column(Integer)
+    expire_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utc_now)
@@ -1 +1 @@
-__all__ = ["auth", "deps", "files", "share"]
+__all__ = ["admin", "auth", "deps", "downloads", "files", "metrics", "responses", "share", "streaming", "uploads"]
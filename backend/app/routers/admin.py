@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, HTTPException, status
+
+from app.core.bandwidth import BandwidthLimits, BandwidthShaper
+from app.core.profiling import ProfilingControl
+from app.core.transfer_limit import TransferLimiter
+from app.routers.deps import (
+    AdminDep,
+    BandwidthDep,
+    ProfilingDep,
+    ShareCacheDep,
+    StorageDep,
+    TransferLimitersDep,
+)
+from app.schemas.admin import (
+    BandwidthLimitsRequest,
+    BandwidthResponse,
+    ProfilingRequest,
+    ProfilingResponse,
+    ShareCacheStatsResponse,
+    StorageCacheStatsResponse,
+    TransferLimiterStatsResponse,
+    TransferStatsResponse,
+)
+from app.storage import CachingStorage
+
+
+router = APIRouter()
+
+
+@router.get("/admin/storage/cache", response_model=StorageCacheStatsResponse)
+def get_storage_cache_stats(_: AdminDep, storage: StorageDep) -> StorageCacheStatsResponse:
+    if not isinstance(storage, CachingStorage):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="未启用存储缓存")
+
+    stats = storage.stats()
+    lookups = stats.hits + stats.misses
+    return StorageCacheStatsResponse(
+        hits=stats.hits,
+        misses=stats.misses,
+        hit_ratio=stats.hits / lookups if lookups else 0.0,
+        fills=stats.fills,
+        fill_errors=stats.fill_errors,
+        evictions=stats.evictions,
+        entries=stats.entries,
+        size_bytes=stats.size_bytes,
+        max_bytes=stats.max_bytes,
+    )
+
+
+@router.get("/admin/share-cache", response_model=ShareCacheStatsResponse)
+def get_share_cache_stats(_: AdminDep, share_cache: ShareCacheDep) -> ShareCacheStatsResponse:
+    stats = share_cache.stats()
+    lookups = stats.hits + stats.misses
+    return ShareCacheStatsResponse(
+        hits=stats.hits,
+        misses=stats.misses,
+        hit_ratio=stats.hits / lookups if lookups else 0.0,
+        entries=stats.entries,
+        max_entries=stats.max_entries,
+        ttl_seconds=stats.ttl_seconds,
+    )
+
+
+def _transfer_limiter_stats(limiter: TransferLimiter | None) -> TransferLimiterStatsResponse | None:
+    if limiter is None:
+        return None
+    stats = limiter.stats()
+    return TransferLimiterStatsResponse(
+        active=stats.active,
+        queued=stats.queued,
+        max_active=stats.max_active,
+        max_queued=stats.max_queued,
+        admitted=stats.admitted,
+        shed=stats.shed,
+    )
+
+
+@router.get("/admin/transfers", response_model=TransferStatsResponse)
+def get_transfer_stats(_: AdminDep, limiters: TransferLimitersDep) -> TransferStatsResponse:
+    return TransferStatsResponse(
+        uploads=_transfer_limiter_stats(limiters.uploads),
+        downloads=_transfer_limiter_stats(limiters.downloads),
+    )
+
+
+def _bandwidth_response(shaper: BandwidthShaper) -> BandwidthResponse:
+    limits = shaper.limits
+    return BandwidthResponse(
+        global_bytes_per_second=limits.global_bytes_per_second,
+        per_share_bytes_per_second=limits.per_share_bytes_per_second,
+        per_client_bytes_per_second=limits.per_client_bytes_per_second,
+        active_streams=shaper.active_streams,
+    )
+
+
+@router.get("/admin/bandwidth", response_model=BandwidthResponse)
+async def get_bandwidth(_: AdminDep, shaper: BandwidthDep) -> BandwidthResponse:
+    return _bandwidth_response(shaper)
+
+
+@router.put("/admin/bandwidth", response_model=BandwidthResponse)
+async def update_bandwidth(
+    _: AdminDep,
+    shaper: BandwidthDep,
+    body: BandwidthLimitsRequest,
+) -> BandwidthResponse:
+    # The shaper lives on the event loop, so it is only touched from async handlers.
+    shaper.update(
+        BandwidthLimits(
+            global_bytes_per_second=body.global_bytes_per_second,
+            per_share_bytes_per_second=body.per_share_bytes_per_second,
+            per_client_bytes_per_second=body.per_client_bytes_per_second,
+        )
+    )
+    return _bandwidth_response(shaper)
+
+
+def _profiling_response(control: ProfilingControl) -> ProfilingResponse:
+    return ProfilingResponse(
+        enabled=control.enabled,
+        slow_request_ms=control.slow_request_ms,
+        sample_rate=control.sample_rate,
+    )
+
+
+@router.get("/admin/profiling", response_model=ProfilingResponse)
+async def get_profiling(_: AdminDep, control: ProfilingDep) -> ProfilingResponse:
+    return _profiling_response(control)
+
+
+@router.put("/admin/profiling", response_model=ProfilingResponse)
+async def update_profiling(
+    _: AdminDep,
+    control: ProfilingDep,
+    body: ProfilingRequest,
+) -> ProfilingResponse:
+    control.slow_request_ms = body.slow_request_ms
+    control.sample_rate = body.sample_rate
+    control.enabled = body.enabled
+    return _profiling_response(control)
@@ -6,9 +6,19 @@ from typing import Annotated
 from fastapi import Depends, Header, HTTPException, Request, status
 from sqlalchemy.orm import Session
 
-from app.core.security import InvalidTokenError, assert_admin_token, decode_token
+from app.core.bandwidth import BandwidthShaper
+from app.core.constants import PASSWORD_HASHER_RETRY_AFTER_SECONDS
+from app.core.profiling import ProfilingControl
+from app.core.security import (
+    InvalidTokenError,
+    PasswordHasher,
+    assert_admin_token,
+    decode_token,
+)
 from app.core.settings import Settings, get_settings
+from app.core.transfer_limit import TransferLimiters
 from app.db.session import Database
+from app.services.shares_service import ShareCache, VerifiedPasswordCache
 from app.storage import Storage
 
 
@@ -35,6 +45,56 @@ def storage_dep(request: Request) -> Storage:
 StorageDep = Annotated[Storage, Depends(storage_dep)]
 
 
+def share_cache_dep(request: Request) -> ShareCache:
+    return request.app.state.share_cache
+
+
+ShareCacheDep = Annotated[ShareCache, Depends(share_cache_dep)]
+
+
+def password_hasher_dep(request: Request) -> PasswordHasher:
+    return request.app.state.password_hasher
+
+
+PasswordHasherDep = Annotated[PasswordHasher, Depends(password_hasher_dep)]
+
+
+def verified_passwords_dep(request: Request) -> VerifiedPasswordCache:
+    return request.app.state.verified_passwords
+
+
+VerifiedPasswordsDep = Annotated[VerifiedPasswordCache, Depends(verified_passwords_dep)]
+
+
+def transfer_limiters_dep(request: Request) -> TransferLimiters:
+    return request.app.state.transfer_limiters
+
+
+TransferLimitersDep = Annotated[TransferLimiters, Depends(transfer_limiters_dep)]
+
+
+def bandwidth_dep(request: Request) -> BandwidthShaper:
+    return request.app.state.bandwidth
+
+
+BandwidthDep = Annotated[BandwidthShaper, Depends(bandwidth_dep)]
+
+
+def profiling_dep(request: Request) -> ProfilingControl:
+    return request.app.state.profiling
+
+
+ProfilingDep = Annotated[ProfilingControl, Depends(profiling_dep)]
+
+
+def password_hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="服务繁忙，请稍后重试",
+        headers={"retry-after": str(PASSWORD_HASHER_RETRY_AFTER_SECONDS)},
+    )
+
+
 def require_admin(
     *,
     settings: SettingsDep,
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import base64
+from urllib.parse import quote
+
+from fastapi import Request, Response, status
+from fastapi.responses import RedirectResponse
+
+from app.core.settings import Settings
+from app.models import File
+from app.routers.responses import RangedStreamResponse, ZeroCopyFileResponse, content_disposition
+from app.storage import Storage, StoredObject
+
+
+def _etag_matches(*, if_none_match: str | None, etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or any(value.removeprefix("W/") == etag for value in candidates)
+
+
+def _digest_headers(*, sha256: str) -> dict[str, str]:
+    encoded = base64.b64encode(bytes.fromhex(sha256)).decode("ascii")
+    return {
+        "etag": f'"{sha256}"',
+        "digest": f"sha-256={encoded}",
+        "repr-digest": f"sha-256=:{encoded}:",
+    }
+
+
+def _offload_response(
+    *,
+    settings: Settings,
+    file: File,
+    local_path: str,
+    headers: dict[str, str],
+) -> Response:
+    if settings.download_offload == "x-accel-redirect":
+        prefix = settings.download_offload_prefix.strip("/")
+        headers["x-accel-redirect"] = f"/{prefix}/{quote(file.file_path)}"
+    else:
+        headers["x-sendfile"] = local_path
+
+    headers["content-disposition"] = content_disposition(filename=file.original_name)
+    return Response(media_type=file.mime_type or "application/octet-stream", headers=headers)
+
+
+def build_download_response(
+    *,
+    request: Request,
+    settings: Settings,
+    storage: Storage,
+    file: File,
+    stored: StoredObject,
+) -> Response:
+    headers = _digest_headers(sha256=file.sha256) if file.sha256 else {}
+    media_type = file.mime_type or "application/octet-stream"
+
+    etag = headers.get("etag")
+    if etag is not None and _etag_matches(
+        if_none_match=request.headers.get("if-none-match"),
+        etag=etag,
+    ):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if stored.local_path is not None:
+        if settings.download_offload != "none":
+            return _offload_response(
+                settings=settings,
+                file=file,
+                local_path=stored.local_path,
+                headers=headers,
+            )
+        return ZeroCopyFileResponse(
+            path=stored.local_path,
+            filename=file.original_name,
+            media_type=media_type,
+            headers=headers,
+        )
+
+    url = storage.presigned_url(
+        relative_path=stored.relative_path,
+        content_disposition=content_disposition(filename=file.original_name),
+        mime_type=media_type,
+    )
+    if url is not None:
+        return RedirectResponse(url=url, status_code=status.HTTP_302_FOUND)
+
+    return RangedStreamResponse(
+        open_range=lambda start, end: storage.open_range(
+            relative_path=stored.relative_path,
+            start=start,
+            end=end,
+        ),
+        size_bytes=stored.size_bytes,
+        filename=file.original_name,
+        media_type=media_type,
+        headers=headers,
+    )
@@ -1,24 +1,39 @@
 from __future__ import annotations
 
-from pathlib import Path
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from starlette.concurrency import run_in_threadpool
 
-from fastapi import APIRouter, File, Form, HTTPException, Query, UploadFile, status
-from fastapi.responses import FileResponse
-
-from app.core.constants import BYTES_PER_MEBIBYTE
-from app.core.security import InvalidTokenError, assert_download_token, decode_token
-from app.routers.deps import AdminDep, DbDep, SettingsDep, StorageDep
+from app.core.constants import BYTES_PER_MEBIBYTE, MULTIPART_OVERHEAD_BYTES
+from app.core.security import (
+    InvalidTokenError,
+    PasswordHasherBusyError,
+    assert_download_token,
+    decode_token,
+)
+from app.core.settings import Settings
+from app.models import File
+from app.routers import downloads, streaming
+from app.routers.deps import (
+    AdminDep,
+    DbDep,
+    PasswordHasherDep,
+    SettingsDep,
+    ShareCacheDep,
+    StorageDep,
+    password_hasher_busy,
+)
 from app.schemas.files import (
     FileDownloadTokenResponse,
     FileItem,
     FileListResponse,
+    InstantUploadRequest,
     ShareSummary,
     UploadResponse,
 )
 from app.schemas.share import CreateShareRequest, CreateShareResponse
 from app.services import files_service, shares_service
-from app.services.errors import FileNotFoundError
-from app.storage import FileTooLargeError
+from app.services.errors import FileContentNotFoundError, FileNotFoundError, InvalidCursorError
+from app.storage import FileTooLargeError, StorageFileNotFoundError
 
 
 router = APIRouter()
@@ -31,37 +46,118 @@ def _build_share_url(*, base: str, share_code: str) -> str:
     return f"{base.rstrip('/')}{path}"
 
 
+def _to_413(*, settings: Settings) -> HTTPException:
+    limit_mb = settings.max_upload_bytes // BYTES_PER_MEBIBYTE
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"文件超过最大限制 {limit_mb}MB",
+    )
+
+
+def _to_upload_response(*, file: File) -> UploadResponse:
+    return UploadResponse(
+        file_id=file.id,
+        filename=file.original_name,
+        size=file.file_size,
+    )
+
+
 @router.post("/files/upload", response_model=UploadResponse)
-def upload_file(
+async def upload_file(
     _: AdminDep,
     db: DbDep,
     storage: StorageDep,
     settings: SettingsDep,
-    file: UploadFile = File(...),
-    remark: str | None = Form(default=None),
+    request: Request,
 ) -> UploadResponse:
+    too_large = _to_413(settings=settings)
+    streaming.reject_oversized_request(
+        request=request,
+        max_bytes=settings.max_upload_bytes + MULTIPART_OVERHEAD_BYTES,
+        detail=too_large.detail,
+    )
+
     try:
-        created = files_service.upload_file(
-            db=db,
+        form = await streaming.stream_multipart_to_storage(
+            request=request,
             storage=storage,
-            source=file.file,
-            original_filename=file.filename or "unnamed",
-            mime_type=file.content_type or "application/octet-stream",
-            remark=remark,
-            max_upload_bytes=settings.max_upload_bytes,
+            max_bytes=settings.max_upload_bytes,
         )
     except FileTooLargeError:
-        limit_mb = settings.max_upload_bytes // BYTES_PER_MEBIBYTE
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"文件超过最大限制 {limit_mb}MB",
+        raise too_large
+
+    created = await run_in_threadpool(
+        files_service.create_file_record,
+        db=db,
+        storage=storage,
+        stored=form.stored,
+        original_name=files_service.safe_filename(form.filename),
+        mime_type=form.content_type or "application/octet-stream",
+        remark=form.fields.get("remark"),
+    )
+    return _to_upload_response(file=created)
+
+
+@router.put("/files/upload", response_model=UploadResponse)
+async def upload_file_raw(
+    _: AdminDep,
+    db: DbDep,
+    storage: StorageDep,
+    settings: SettingsDep,
+    request: Request,
+    filename: str = Query(min_length=1),
+    remark: str | None = Query(default=None),
+) -> UploadResponse:
+    too_large = _to_413(settings=settings)
+    streaming.reject_oversized_request(
+        request=request,
+        max_bytes=settings.max_upload_bytes,
+        detail=too_large.detail,
+    )
+
+    safe_name = files_service.safe_filename(filename)
+    try:
+        stored = await streaming.stream_body_to_storage(
+            request=request,
+            storage=storage,
+            original_filename=safe_name,
+            max_bytes=settings.max_upload_bytes,
         )
+    except FileTooLargeError:
+        raise too_large
 
-    return UploadResponse(
-        file_id=created.id,
-        filename=created.original_name,
-        size=created.file_size,
+    created = await run_in_threadpool(
+        files_service.create_file_record,
+        db=db,
+        storage=storage,
+        stored=stored,
+        original_name=safe_name,
+        mime_type=request.headers.get("content-type") or "application/octet-stream",
+        remark=remark,
     )
+    return _to_upload_response(file=created)
+
+
+@router.post("/files/instant-upload", response_model=UploadResponse)
+def instant_upload(
+    _: AdminDep,
+    db: DbDep,
+    storage: StorageDep,
+    body: InstantUploadRequest,
+) -> UploadResponse:
+    try:
+        created = files_service.instant_upload(
+            db=db,
+            storage=storage,
+            sha256=body.sha256,
+            size_bytes=body.size,
+            original_filename=body.filename,
+            mime_type=body.mime_type or "application/octet-stream",
+            remark=body.remark,
+        )
+    except FileContentNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="文件内容不存在，请上传")
+    return _to_upload_response(file=created)
 
 
 @router.get("/files", response_model=FileListResponse)
@@ -72,11 +168,23 @@ def list_files(
     page: int = Query(default=1, gt=0),
     size: int = Query(default=20, gt=0),
     keyword: str | None = Query(default=None),
+    cursor: str | None = Query(default=None),
+    include_total: bool | None = Query(default=None),
 ) -> FileListResponse:
-    total, items = files_service.list_files(db=db, page=page, size=size, keyword=keyword)
+    try:
+        result = files_service.list_files(
+            db=db,
+            page=page,
+            size=size,
+            keyword=keyword,
+            cursor=cursor,
+            include_total=include_total if include_total is not None else cursor is None,
+        )
+    except InvalidCursorError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="分页游标无效")
 
     out: list[FileItem] = []
-    for item in items:
+    for item in result.items:
         share = item.active_share
         share_out = None
         if share is not None:
@@ -104,13 +212,24 @@ def list_files(
             )
         )
 
-    return FileListResponse(total=total, list=out)
+    return FileListResponse(total=result.total, list=out, next_cursor=result.next_cursor)
 
 
 @router.delete("/files/{file_id}")
-def delete_file(_: AdminDep, db: DbDep, storage: StorageDep, file_id: str) -> dict[str, bool]:
+def delete_file(
+    _: AdminDep,
+    db: DbDep,
+    share_cache: ShareCacheDep,
+    storage: StorageDep,
+    file_id: str,
+) -> dict[str, bool]:
     try:
-        files_service.delete_file(db=db, storage=storage, file_id=file_id)
+        files_service.delete_file(
+            db=db,
+            storage=storage,
+            share_cache=share_cache,
+            file_id=file_id,
+        )
     except FileNotFoundError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="文件不存在")
     return {"success": True}
@@ -120,6 +239,8 @@ def delete_file(_: AdminDep, db: DbDep, storage: StorageDep, file_id: str) -> di
 def create_share_link(
     _: AdminDep,
     db: DbDep,
+    share_cache: ShareCacheDep,
+    password_hasher: PasswordHasherDep,
     settings: SettingsDep,
     file_id: str,
     body: CreateShareRequest,
@@ -127,6 +248,8 @@ def create_share_link(
     try:
         link = shares_service.create_share_link(
             db=db,
+            cache=share_cache,
+            hasher=password_hasher,
             file_id=file_id,
             params=shares_service.ShareCreateParams(
                 password=body.password,
@@ -136,6 +259,8 @@ def create_share_link(
         )
     except FileNotFoundError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="文件不存在")
+    except PasswordHasherBusyError:
+        raise password_hasher_busy()
 
     return CreateShareResponse(
         share_code=link.share_code,
@@ -169,12 +294,13 @@ def create_download_token(
 
 @router.get("/files/{file_id}/download")
 def download_file(
+    request: Request,
     db: DbDep,
     storage: StorageDep,
     settings: SettingsDep,
     file_id: str,
     token: str = Query(min_length=1),
-) -> FileResponse:
+) -> Response:
     try:
         payload = decode_token(secret=settings.jwt_secret.get_secret_value(), token=token)
         assert_download_token(payload=payload)
@@ -189,12 +315,15 @@ def download_file(
     except FileNotFoundError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="文件不存在")
 
-    abs_path = storage.resolve_path(relative_path=file.file_path)
-    if not Path(abs_path).exists():
+    try:
+        stored = storage.stat(relative_path=file.file_path)
+    except StorageFileNotFoundError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="文件不存在")
 
-    return FileResponse(
-        path=abs_path,
-        filename=file.original_name,
-        media_type=file.mime_type or "application/octet-stream",
+    return downloads.build_download_response(
+        request=request,
+        settings=settings,
+        storage=storage,
+        file=file,
+        stored=stored,
     )
@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Request
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.core.metrics import MetricsStore
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics(request: Request) -> PlainTextResponse:
+    store: MetricsStore = request.app.state.metrics
+    body = await run_in_threadpool(store.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import os
+import re
+from collections.abc import Callable, Iterator, Mapping
+from typing import BinaryIO
+from urllib.parse import quote
+
+import anyio
+from starlette.concurrency import iterate_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse, PlainTextResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from app.core.asgi import ZEROCOPY_SEND_EXTENSION
+from app.core.constants import DOWNLOAD_READAHEAD_BYTES, FILE_IO_CHUNK_BYTES
+
+
+_SINGLE_RANGE_PATTERN = re.compile(r"^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$", re.IGNORECASE)
+
+
+class RangeNotSatisfiableError(Exception):
+    pass
+
+
+def content_disposition(*, filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def parse_single_range(*, http_range: str, file_size: int) -> tuple[int, int] | None:
+    match = _SINGLE_RANGE_PATTERN.match(http_range)
+    if match is None:
+        # Multiple or malformed ranges: serving the full representation is always allowed.
+        return None
+
+    first, last = match.groups()
+    if first == "" and last == "":
+        return None
+    if first == "":
+        suffix_length = int(last)
+        if suffix_length == 0:
+            raise RangeNotSatisfiableError(file_size)
+        return max(file_size - suffix_length, 0), file_size
+
+    start = int(first)
+    end = min(int(last) + 1, file_size) if last else file_size
+    if start >= file_size:
+        raise RangeNotSatisfiableError(file_size)
+    if start >= end:
+        return None
+    return start, end
+
+
+def _advise(*, fd: int, offset: int, length: int, advice_name: str) -> None:
+    advice = getattr(os, advice_name, None)
+    if advice is None or not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        os.posix_fadvise(fd, offset, length, advice)
+    except OSError:
+        pass
+
+
+def _select_range(
+    *,
+    scope: Scope,
+    response_headers: MutableHeaders,
+    file_size: int,
+) -> tuple[int, int, int]:
+    request_headers = Headers(scope=scope)
+    http_range = request_headers.get("range")
+    if_range = request_headers.get("if-range")
+    if http_range is None or (
+        if_range is not None
+        and if_range not in (response_headers.get("etag"), response_headers.get("last-modified"))
+    ):
+        return 200, 0, file_size
+
+    byte_range = parse_single_range(http_range=http_range, file_size=file_size)
+    if byte_range is None:
+        return 200, 0, file_size
+
+    start, end = byte_range
+    response_headers["content-range"] = f"bytes {start}-{end - 1}/{file_size}"
+    response_headers["content-length"] = str(end - start)
+    return 206, start, end
+
+
+def _range_not_satisfiable(*, file_size: int) -> PlainTextResponse:
+    return PlainTextResponse(status_code=416, headers={"content-range": f"bytes */{file_size}"})
+
+
+class ZeroCopyFileResponse(FileResponse):
+    chunk_size = FILE_IO_CHUNK_BYTES
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        stat_result = self.stat_result
+        if stat_result is None:
+            try:
+                stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+            except FileNotFoundError:
+                raise RuntimeError(f"File at path {self.path} does not exist.")
+            self.set_stat_headers(stat_result)
+
+        file_size = stat_result.st_size
+        try:
+            status_code, start, end = _select_range(
+                scope=scope,
+                response_headers=self.headers,
+                file_size=file_size,
+            )
+        except RangeNotSatisfiableError:
+            return await _range_not_satisfiable(file_size=file_size)(scope, receive, send)
+
+        await send({"type": "http.response.start", "status": status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD" or start == end:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        else:
+            file = await anyio.to_thread.run_sync(open, self.path, "rb")
+            try:
+                if ZEROCOPY_SEND_EXTENSION in scope.get("extensions", {}):
+                    await self._send_zerocopy(send=send, file=file, start=start, end=end)
+                else:
+                    await self._send_chunks(send=send, file=file, start=start, end=end)
+            finally:
+                file.close()
+
+        if self.background is not None:
+            await self.background()
+
+    async def _send_zerocopy(self, *, send: Send, file: BinaryIO, start: int, end: int) -> None:
+        fd = file.fileno()
+        _advise(fd=fd, offset=start, length=end - start, advice_name="POSIX_FADV_SEQUENTIAL")
+        _advise(fd=fd, offset=start, length=DOWNLOAD_READAHEAD_BYTES, advice_name="POSIX_FADV_WILLNEED")
+        await send(
+            {
+                "type": ZEROCOPY_SEND_EXTENSION,
+                "file": file,
+                "offset": start,
+                "count": end - start,
+                "more_body": False,
+            }
+        )
+
+    async def _send_chunks(self, *, send: Send, file: BinaryIO, start: int, end: int) -> None:
+        fd = file.fileno()
+        _advise(fd=fd, offset=start, length=end - start, advice_name="POSIX_FADV_SEQUENTIAL")
+
+        offset = start
+        while offset < end:
+            _advise(
+                fd=fd,
+                offset=offset + self.chunk_size,
+                length=DOWNLOAD_READAHEAD_BYTES,
+                advice_name="POSIX_FADV_WILLNEED",
+            )
+            # pread hands back a fresh bytes object; a reused readinto buffer is not safe here
+            # because the server's transport may keep a reference to a sent chunk until flushed.
+            chunk = await anyio.to_thread.run_sync(
+                os.pread,
+                fd,
+                min(self.chunk_size, end - offset),
+                offset,
+            )
+            offset += len(chunk)
+            more_body = bool(chunk) and offset < end
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+            if not more_body:
+                break
+
+
+class RangedStreamResponse(Response):
+    def __init__(
+        self,
+        *,
+        open_range: Callable[[int, int], Iterator[bytes]],
+        size_bytes: int,
+        filename: str,
+        media_type: str,
+        headers: Mapping[str, str] | None = None,
+    ) -> None:
+        self.open_range = open_range
+        self.size_bytes = size_bytes
+        self.status_code = 200
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+        self.headers.setdefault("accept-ranges", "bytes")
+        self.headers.setdefault("content-length", str(size_bytes))
+        self.headers.setdefault("content-disposition", content_disposition(filename=filename))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            status_code, start, end = _select_range(
+                scope=scope,
+                response_headers=self.headers,
+                file_size=self.size_bytes,
+            )
+        except RangeNotSatisfiableError:
+            return await _range_not_satisfiable(file_size=self.size_bytes)(scope, receive, send)
+
+        await send({"type": "http.response.start", "status": status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD" or start == end:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        chunks = await anyio.to_thread.run_sync(self.open_range, start, end)
+        try:
+            async for chunk in iterate_in_threadpool(chunks):
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                await anyio.to_thread.run_sync(close)
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
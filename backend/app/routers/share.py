@@ -1,72 +1,125 @@
 from __future__ import annotations
 
-from pathlib import Path
-
-from fastapi import APIRouter, HTTPException, Query, status
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from starlette.concurrency import run_in_threadpool
 
+from app.core import tracing
+from app.core.metrics import SHARE_OUTCOMES
 from app.core.security import (
     InvalidTokenError,
+    PasswordHasherBusyError,
     assert_download_token,
     decode_token,
 )
-from app.models import File
-from app.routers.deps import DbDep, SettingsDep, StorageDep
+from app.routers import downloads
+from app.routers.deps import (
+    DbDep,
+    PasswordHasherDep,
+    SettingsDep,
+    ShareCacheDep,
+    StorageDep,
+    VerifiedPasswordsDep,
+    password_hasher_busy,
+)
 from app.schemas.share import ShareInfoResponse, VerifyShareRequest, VerifyShareResponse
 from app.services import shares_service
 from app.services.errors import (
+    ServiceError,
     ShareDownloadLimitReachedError,
     ShareLinkExpiredError,
     ShareLinkInactiveError,
     ShareLinkNotFoundError,
     SharePasswordInvalidError,
 )
+from app.storage import StorageFileNotFoundError
 
 
 router = APIRouter()
 
 
+_SHARE_OUTCOMES: dict[type[ServiceError], str] = {
+    ShareLinkNotFoundError: "not_found",
+    ShareLinkInactiveError: "inactive",
+    ShareLinkExpiredError: "expired",
+    ShareDownloadLimitReachedError: "limit_reached",
+    SharePasswordInvalidError: "password_invalid",
+}
+
+
+def _record_outcome(*, endpoint: str, outcome: str) -> None:
+    SHARE_OUTCOMES.inc(endpoint=endpoint, outcome=outcome)
+
+
+def _record_error(*, endpoint: str, error: ServiceError) -> None:
+    _record_outcome(endpoint=endpoint, outcome=_SHARE_OUTCOMES.get(type(error), "error"))
+
+
 def _to_410() -> HTTPException:
     return HTTPException(status_code=status.HTTP_410_GONE, detail="链接已失效")
 
 
 @router.get("/share/{share_code}", response_model=ShareInfoResponse)
-def get_share_info(db: DbDep, share_code: str) -> ShareInfoResponse:
+def get_share_info(db: DbDep, share_cache: ShareCacheDep, share_code: str) -> ShareInfoResponse:
+    tracing.annotate(**{"share.code": share_code})
     try:
-        link = shares_service.require_active_share_link(db=db, share_code=share_code)
-    except (ShareLinkExpiredError, ShareLinkInactiveError, ShareDownloadLimitReachedError):
+        share = shares_service.require_active_share(
+            db=db,
+            cache=share_cache,
+            share_code=share_code,
+        )
+    except (ShareLinkExpiredError, ShareLinkInactiveError, ShareDownloadLimitReachedError) as exc:
+        _record_error(endpoint="info", error=exc)
         raise _to_410()
-    except ShareLinkNotFoundError:
+    except ShareLinkNotFoundError as exc:
+        _record_error(endpoint="info", error=exc)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="链接不存在")
 
-    file = db.get(File, link.file_id)
-    if file is None or file.is_deleted:
-        raise _to_410()
-
+    _record_outcome(endpoint="info", outcome="ok")
     return ShareInfoResponse(
-        filename=file.original_name,
-        size=file.file_size,
-        need_password=link.password_hash is not None,
+        filename=share.filename,
+        size=share.file_size,
+        need_password=share.password_hash is not None,
     )
 
 
 @router.post("/share/{share_code}/verify", response_model=VerifyShareResponse)
-def verify_share(
+async def verify_share(
     db: DbDep,
+    share_cache: ShareCacheDep,
+    password_hasher: PasswordHasherDep,
+    verified_passwords: VerifiedPasswordsDep,
     settings: SettingsDep,
     share_code: str,
     body: VerifyShareRequest,
 ) -> VerifyShareResponse:
+    # Async so bcrypt waits on the hasher pool instead of holding a request threadpool slot.
+    tracing.annotate(**{"share.code": share_code})
     try:
-        link = shares_service.require_active_share_link(db=db, share_code=share_code)
-        shares_service.verify_share_password_or_raise(link=link, password=body.password)
-    except SharePasswordInvalidError:
+        share = await run_in_threadpool(
+            shares_service.require_active_share,
+            db=db,
+            cache=share_cache,
+            share_code=share_code,
+        )
+        await shares_service.verify_share_password_or_raise(
+            share=share,
+            password=body.password,
+            hasher=password_hasher,
+            verified=verified_passwords,
+        )
+    except PasswordHasherBusyError:
+        raise password_hasher_busy()
+    except SharePasswordInvalidError as exc:
+        _record_error(endpoint="verify", error=exc)
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="提取码错误")
-    except (ShareLinkExpiredError, ShareLinkInactiveError, ShareDownloadLimitReachedError):
+    except (ShareLinkExpiredError, ShareLinkInactiveError, ShareDownloadLimitReachedError) as exc:
+        _record_error(endpoint="verify", error=exc)
         raise _to_410()
-    except ShareLinkNotFoundError:
+    except ShareLinkNotFoundError as exc:
+        _record_error(endpoint="verify", error=exc)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="链接不存在")
 
+    _record_outcome(endpoint="verify", outcome="ok")
     token = shares_service.create_download_token(
         jwt_secret=settings.jwt_secret.get_secret_value(),
         share_code=share_code,
@@ -77,12 +130,15 @@ def verify_share(
 
 @router.get("/share/{share_code}/download")
 def download(
+    request: Request,
     db: DbDep,
+    share_cache: ShareCacheDep,
     storage: StorageDep,
     settings: SettingsDep,
     share_code: str,
     token: str = Query(min_length=1),
-) -> FileResponse:
+) -> Response:
+    tracing.annotate(**{"share.code": share_code})
     try:
         payload = decode_token(secret=settings.jwt_secret.get_secret_value(), token=token)
         assert_download_token(payload=payload)
@@ -97,30 +153,30 @@ def download(
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="下载凭证无效")
 
     try:
-        link = shares_service.require_active_share_link(db=db, share_code=share_code)
-    except (ShareLinkExpiredError, ShareLinkInactiveError, ShareDownloadLimitReachedError):
-        try:
-            link = shares_service.get_share_link(db=db, share_code=share_code)
-        except ShareLinkNotFoundError:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="链接不存在")
-
-        if not shares_service.is_download_token_used(db=db, share_id=link.id, token_jti=token_jti):
-            raise _to_410()
-    except ShareLinkNotFoundError:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="链接不存在")
-
-    file = db.get(File, link.file_id)
-    if file is None or file.is_deleted:
+        share_download = shares_service.get_share_download(db=db, share_code=share_code)
+        stored = storage.stat(relative_path=share_download.file.file_path)
+        shares_service.register_share_download(
+            db=db,
+            cache=share_cache,
+            download=share_download,
+            token_jti=token_jti,
+        )
+    except (ShareLinkExpiredError, ShareLinkInactiveError, ShareDownloadLimitReachedError) as exc:
+        _record_error(endpoint="download", error=exc)
         raise _to_410()
-
-    abs_path = storage.resolve_path(relative_path=file.file_path)
-    if not Path(abs_path).exists():
+    except ShareLinkNotFoundError as exc:
+        _record_error(endpoint="download", error=exc)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="链接不存在")
+    except StorageFileNotFoundError:
+        _record_outcome(endpoint="download", outcome="file_missing")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="文件不存在")
 
-    shares_service.increase_download_count(db=db, share_id=link.id, token_jti=token_jti)
-
-    return FileResponse(
-        path=abs_path,
-        filename=file.original_name,
-        media_type=file.mime_type or "application/octet-stream",
+    _record_outcome(endpoint="download", outcome="ok")
+    tracing.annotate(**{"file.size": stored.size_bytes})
+    return downloads.build_download_response(
+        request=request,
+        settings=settings,
+        storage=storage,
+        file=share_download.file,
+        stored=stored,
     )
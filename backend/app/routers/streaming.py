@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from fastapi import HTTPException, Request, status
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+from app.core.constants import FILE_IO_CHUNK_BYTES, MULTIPART_FIELD_MAX_BYTES
+from app.services import files_service
+from app.storage import Storage, StoredFile, StorageWriter
+
+
+@dataclass(frozen=True)
+class MultipartUpload:
+    stored: StoredFile
+    filename: str
+    content_type: str | None
+    fields: dict[str, str]
+
+
+class _FieldTooLargeError(Exception):
+    pass
+
+
+class _MultipartCollector:
+    def __init__(self, *, boundary: bytes, file_field: str) -> None:
+        self.fields: dict[str, str] = {}
+        self.filename: str | None = None
+        self.content_type: str | None = None
+        self.file_data = bytearray()
+
+        self._file_field = file_field
+        self._headers: dict[bytes, bytes] = {}
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+        self._part_name: str | None = None
+        self._part_is_file = False
+        self._field_data = bytearray()
+        self._parser = MultipartParser(
+            boundary,
+            callbacks={
+                "on_part_begin": self._on_part_begin,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+            },
+        )
+
+    def feed(self, data: bytes) -> None:
+        self._parser.write(data)
+
+    def finalize(self) -> None:
+        self._parser.finalize()
+
+    def take_file_data(self) -> bytes:
+        data = bytes(self.file_data)
+        self.file_data.clear()
+        return data
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+        self._part_name = None
+        self._part_is_file = False
+        self._field_data.clear()
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[bytes(self._header_field).lower()] = bytes(self._header_value)
+        self._header_field.clear()
+        self._header_value.clear()
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name")
+        if name is None:
+            return
+        self._part_name = name.decode("utf-8", "replace")
+
+        filename = options.get(b"filename")
+        if self._part_name == self._file_field and filename is not None and self.filename is None:
+            self._part_is_file = True
+            self.filename = filename.decode("utf-8", "replace")
+            content_type = self._headers.get(b"content-type")
+            self.content_type = content_type.decode("latin-1") if content_type else None
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._part_is_file:
+            self.file_data += data[start:end]
+        elif self._part_name is not None:
+            self._field_data += data[start:end]
+            if len(self._field_data) > MULTIPART_FIELD_MAX_BYTES:
+                raise _FieldTooLargeError(self._part_name)
+
+    def _on_part_end(self) -> None:
+        if self._part_name is not None and not self._part_is_file:
+            self.fields[self._part_name] = self._field_data.decode("utf-8", "replace")
+
+
+def _bad_request(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def reject_oversized_request(*, request: Request, max_bytes: int, detail: str) -> None:
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+
+
+async def read_bounded_body(*, request: Request, max_bytes: int, detail: str) -> bytes:
+    # Content-Length is optional with chunked encoding, so the limit is enforced while reading.
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+    return bytes(body)
+
+
+async def stream_body_to_storage(
+    *,
+    request: Request,
+    storage: Storage,
+    original_filename: str,
+    max_bytes: int,
+) -> StoredFile:
+    writer = await run_in_threadpool(
+        storage.open_writer,
+        original_filename=original_filename,
+        max_bytes=max_bytes,
+    )
+    try:
+        buffer = bytearray()
+        async for chunk in request.stream():
+            buffer += chunk
+            if len(buffer) >= FILE_IO_CHUNK_BYTES:
+                await run_in_threadpool(writer.write, bytes(buffer))
+                buffer.clear()
+        if buffer:
+            await run_in_threadpool(writer.write, bytes(buffer))
+        return await run_in_threadpool(writer.commit)
+    except BaseException:
+        writer.abort()
+        raise
+
+
+async def stream_multipart_to_storage(
+    *,
+    request: Request,
+    storage: Storage,
+    max_bytes: int,
+    file_field: str = "file",
+) -> MultipartUpload:
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise _bad_request("请求格式错误")
+
+    collector = _MultipartCollector(boundary=boundary, file_field=file_field)
+    writer: StorageWriter | None = None
+    try:
+        async for chunk in request.stream():
+            collector.feed(chunk)
+            if writer is None and collector.filename is not None:
+                writer = await run_in_threadpool(
+                    storage.open_writer,
+                    original_filename=files_service.safe_filename(collector.filename),
+                    max_bytes=max_bytes,
+                )
+            if writer is not None and len(collector.file_data) >= FILE_IO_CHUNK_BYTES:
+                await run_in_threadpool(writer.write, collector.take_file_data())
+        collector.finalize()
+
+        if writer is None or collector.filename is None:
+            raise _bad_request("缺少上传文件")
+        if collector.file_data:
+            await run_in_threadpool(writer.write, collector.take_file_data())
+        stored = await run_in_threadpool(writer.commit)
+    except (MultipartParseError, _FieldTooLargeError):
+        if writer is not None:
+            writer.abort()
+        raise _bad_request("请求格式错误")
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+
+    return MultipartUpload(
+        stored=stored,
+        filename=collector.filename,
+        content_type=collector.content_type,
+        fields=collector.fields,
+    )
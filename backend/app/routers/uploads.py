@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, HTTPException, Request, status
+from starlette.concurrency import run_in_threadpool
+
+from app.core.constants import BYTES_PER_MEBIBYTE
+from app.models import UploadSession
+from app.routers import streaming
+from app.routers.deps import AdminDep, DbDep, SettingsDep, StorageDep
+from app.schemas.files import (
+    CreateUploadSessionRequest,
+    UploadChunkResponse,
+    UploadResponse,
+    UploadSessionResponse,
+)
+from app.services import uploads_service
+from app.services.errors import UploadChunkInvalidError, UploadSessionNotFoundError
+from app.storage import FileTooLargeError, Storage, UploadIncompleteError
+
+
+router = APIRouter()
+
+
+def _to_404() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="上传会话不存在或已过期")
+
+
+def _to_session_response(*, storage: Storage, upload: UploadSession) -> UploadSessionResponse:
+    return UploadSessionResponse(
+        upload_id=upload.id,
+        filename=upload.original_name,
+        size=upload.total_size,
+        chunk_size=upload.chunk_size,
+        received_offsets=uploads_service.list_received_offsets(storage=storage, upload=upload),
+        expire_at=upload.expire_at,
+    )
+
+
+@router.post("/files/uploads", response_model=UploadSessionResponse)
+def create_upload_session(
+    _: AdminDep,
+    db: DbDep,
+    storage: StorageDep,
+    settings: SettingsDep,
+    body: CreateUploadSessionRequest,
+) -> UploadSessionResponse:
+    try:
+        upload = uploads_service.create_upload_session(
+            db=db,
+            storage=storage,
+            original_filename=body.filename,
+            total_size=body.size,
+            mime_type=body.mime_type or "application/octet-stream",
+            remark=body.remark,
+            chunk_size=settings.upload_chunk_bytes,
+            max_upload_bytes=settings.max_upload_bytes,
+            expires_in_seconds=settings.upload_session_expires_seconds,
+        )
+    except FileTooLargeError:
+        limit_mb = settings.max_upload_bytes // BYTES_PER_MEBIBYTE
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"文件超过最大限制 {limit_mb}MB",
+        )
+    return _to_session_response(storage=storage, upload=upload)
+
+
+@router.get("/files/uploads/{upload_id}", response_model=UploadSessionResponse)
+def get_upload_session(
+    _: AdminDep,
+    db: DbDep,
+    storage: StorageDep,
+    upload_id: str,
+) -> UploadSessionResponse:
+    try:
+        upload = uploads_service.require_upload_session(db=db, upload_id=upload_id)
+        return _to_session_response(storage=storage, upload=upload)
+    except UploadSessionNotFoundError:
+        raise _to_404()
+
+
+@router.put("/files/uploads/{upload_id}/chunks/{index}", response_model=UploadChunkResponse)
+async def upload_chunk(
+    _: AdminDep,
+    db: DbDep,
+    storage: StorageDep,
+    settings: SettingsDep,
+    request: Request,
+    upload_id: str,
+    index: int,
+) -> UploadChunkResponse:
+    streaming.reject_oversized_request(
+        request=request,
+        max_bytes=settings.upload_chunk_bytes,
+        detail="分片过大",
+    )
+
+    data = await streaming.read_bounded_body(
+        request=request,
+        max_bytes=settings.upload_chunk_bytes,
+        detail="分片过大",
+    )
+    try:
+        offset = await run_in_threadpool(
+            uploads_service.write_upload_chunk,
+            db=db,
+            storage=storage,
+            upload_id=upload_id,
+            index=index,
+            data=data,
+        )
+    except UploadChunkInvalidError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="分片无效")
+    except UploadSessionNotFoundError:
+        raise _to_404()
+    return UploadChunkResponse(index=index, offset=offset, size=len(data))
+
+
+@router.post("/files/uploads/{upload_id}/complete", response_model=UploadResponse)
+def complete_upload_session(
+    _: AdminDep,
+    db: DbDep,
+    storage: StorageDep,
+    upload_id: str,
+) -> UploadResponse:
+    try:
+        created = uploads_service.complete_upload_session(
+            db=db,
+            storage=storage,
+            upload_id=upload_id,
+        )
+    except UploadIncompleteError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="文件分片尚未上传完整")
+    except UploadSessionNotFoundError:
+        raise _to_404()
+
+    return UploadResponse(
+        file_id=created.id,
+        filename=created.original_name,
+        size=created.file_size,
+    )
+
+
+@router.delete("/files/uploads/{upload_id}")
+def abort_upload_session(
+    _: AdminDep,
+    db: DbDep,
+    storage: StorageDep,
+    upload_id: str,
+) -> dict[str, bool]:
+    try:
+        uploads_service.abort_upload_session(db=db, storage=storage, upload_id=upload_id)
+    except UploadSessionNotFoundError:
+        raise _to_404()
+    return {"success": True}
@@ -1 +1 @@
-__all__ = ["auth", "files", "share"]
+__all__ = ["admin", "auth", "files", "share"]
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from pydantic import BaseModel, Field
+
+
+class StorageCacheStatsResponse(BaseModel):
+    hits: int
+    misses: int
+    hit_ratio: float
+    fills: int
+    fill_errors: int
+    evictions: int
+    entries: int
+    size_bytes: int
+    max_bytes: int
+
+
+class ShareCacheStatsResponse(BaseModel):
+    hits: int
+    misses: int
+    hit_ratio: float
+    entries: int
+    max_entries: int
+    ttl_seconds: float
+
+
+class TransferLimiterStatsResponse(BaseModel):
+    active: int
+    queued: int
+    max_active: int
+    max_queued: int
+    admitted: int
+    shed: int
+
+
+class TransferStatsResponse(BaseModel):
+    uploads: TransferLimiterStatsResponse | None
+    downloads: TransferLimiterStatsResponse | None
+
+
+class BandwidthLimitsRequest(BaseModel):
+    global_bytes_per_second: int = Field(ge=0)
+    per_share_bytes_per_second: int = Field(ge=0)
+    per_client_bytes_per_second: int = Field(ge=0)
+
+
+class BandwidthResponse(BaseModel):
+    global_bytes_per_second: int
+    per_share_bytes_per_second: int
+    per_client_bytes_per_second: int
+    active_streams: int
+
+
+class ProfilingRequest(BaseModel):
+    enabled: bool
+    slow_request_ms: int = Field(ge=0)
+    sample_rate: float = Field(ge=0, le=1)
+
+
+class ProfilingResponse(BaseModel):
+    enabled: bool
+    slow_request_ms: int
+    sample_rate: float
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 
 
 class ShareSummary(BaseModel):
@@ -25,8 +25,9 @@ class FileItem(BaseModel):
 
 
 class FileListResponse(BaseModel):
-    total: int
+    total: int | None
     list: list[FileItem]
+    next_cursor: str | None = None
 
 
 class UploadResponse(BaseModel):
@@ -38,3 +39,38 @@ class UploadResponse(BaseModel):
 class FileDownloadTokenResponse(BaseModel):
     download_token: str
     expires_in: int
+
+
+class CreateUploadSessionRequest(BaseModel):
+    filename: str = Field(min_length=1)
+    size: int = Field(ge=0)
+    mime_type: str | None = Field(default=None)
+    remark: str | None = Field(default=None)
+
+
+class UploadSessionResponse(BaseModel):
+    upload_id: str
+    filename: str
+    size: int
+    chunk_size: int
+    received_offsets: list[int]
+    expire_at: datetime
+
+
+class UploadChunkResponse(BaseModel):
+    index: int
+    offset: int
+    size: int
+
+
+class InstantUploadRequest(BaseModel):
+    sha256: str = Field(pattern=r"^[0-9a-fA-F]{64}$")
+    size: int = Field(ge=0)
+    filename: str = Field(min_length=1)
+    mime_type: str | None = Field(default=None)
+    remark: str | None = Field(default=None)
+
+    @field_validator("sha256")
+    @classmethod
+    def _normalize_sha256(cls, value: str) -> str:
+        return value.lower()
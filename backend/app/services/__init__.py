@@ -1 +1 @@
-__all__ = ["errors", "files_service", "shares_service"]
+__all__ = ["errors", "files_service", "maintenance_service", "shares_service", "uploads_service"]
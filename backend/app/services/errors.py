@@ -28,3 +28,19 @@ class SharePasswordInvalidError(ServiceError):
 
 class ShareDownloadLimitReachedError(ServiceError):
     pass
+
+
+class UploadSessionNotFoundError(ServiceError):
+    pass
+
+
+class UploadChunkInvalidError(ServiceError):
+    pass
+
+
+class FileContentNotFoundError(ServiceError):
+    pass
+
+
+class InvalidCursorError(ServiceError):
+    pass
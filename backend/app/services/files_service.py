@@ -1,19 +1,46 @@
 from __future__ import annotations
 
+import base64
 import os
 from dataclasses import dataclass
 from datetime import datetime, timezone
+from functools import lru_cache
 from typing import BinaryIO
 from uuid import uuid4
 
-from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy import (
+    ColumnElement,
+    Subquery,
+    and_,
+    column,
+    func,
+    literal_column,
+    or_,
+    select,
+    table,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
 
-from app.core.constants import DOWNLOAD_TOKEN_TYPE
+from app.core.constants import (
+    DOWNLOAD_TOKEN_TYPE,
+    FILES_ACTIVE_COUNTER,
+    SEARCH_INDEX_TABLE,
+    SEARCH_MIN_KEYWORD_CHARS,
+)
 from app.core.security import create_token
-from app.models import File, ShareLink
-from app.services.errors import FileNotFoundError
-from app.storage import Storage, StorageFileNotFoundError
+from app.db.schema import has_search_index
+from app.models import Blob, Counter, File, ShareLink
+from app.services import shares_service
+from app.services.errors import FileContentNotFoundError, FileNotFoundError, InvalidCursorError
+from app.storage import Storage, StoredFile, StorageFileNotFoundError
+
+
+_SEARCH_INDEX = table(SEARCH_INDEX_TABLE, column("rowid"), column("rank"))
+_FILES_ROWID = literal_column("files.rowid")
 
 
 @dataclass(frozen=True)
@@ -22,10 +49,21 @@ class FileWithShare:
     active_share: ShareLink | None
 
 
+@dataclass(frozen=True)
+class FilePage:
+    total: int | None
+    items: list[FileWithShare]
+    next_cursor: str | None
+
+
 def _utc_now() -> datetime:
     return datetime.now(timezone.utc)
 
 
+def safe_filename(original_filename: str) -> str:
+    return os.path.basename(original_filename) or "unnamed"
+
+
 def require_file(*, db: Session, file_id: str) -> File:
     file = db.get(File, file_id)
     if file is None or file.is_deleted:
@@ -42,7 +80,7 @@ def create_file_download_token(*, jwt_secret: str, file_id: str, expires_in_seco
     )
 
 
-def deactivate_invalid_shares(*, db: Session) -> None:
+def deactivate_invalid_shares(*, db: Session, share_cache: shares_service.ShareCache) -> int:
     now = _utc_now()
     stmt = (
         update(ShareLink)
@@ -57,9 +95,12 @@ def deactivate_invalid_shares(*, db: Session) -> None:
             )
         )
         .values(is_active=False)
+        .returning(ShareLink.share_code)
     )
-    db.execute(stmt)
+    share_codes = db.scalars(stmt).all()
     db.commit()
+    shares_service.invalidate_shares(cache=share_cache, share_codes=share_codes)
+    return len(share_codes)
 
 
 def upload_file(
@@ -72,73 +113,237 @@ def upload_file(
     remark: str | None,
     max_upload_bytes: int,
 ) -> File:
-    safe_name = os.path.basename(original_filename)
+    safe_name = safe_filename(original_filename)
     stored = storage.save(
         source=source,
         original_filename=safe_name,
         max_bytes=max_upload_bytes,
     )
+    return create_file_record(
+        db=db,
+        storage=storage,
+        stored=stored,
+        original_name=safe_name,
+        mime_type=mime_type,
+        remark=remark,
+    )
+
+
+def create_file_record(
+    *,
+    db: Session,
+    storage: Storage,
+    stored: StoredFile,
+    original_name: str,
+    mime_type: str,
+    remark: str | None,
+) -> File:
+    relative_path = stored.relative_path
+    if stored.content_addressed and stored.sha256 is not None:
+        relative_path = _add_blob_reference(db=db, stored=stored)
 
     file = File(
         id=str(uuid4()),
-        original_name=safe_name,
+        original_name=original_name,
         stored_name=stored.stored_name,
-        file_path=stored.relative_path,
+        file_path=relative_path,
         file_size=stored.size_bytes,
         mime_type=mime_type,
+        sha256=stored.sha256,
         remark=remark,
     )
     db.add(file)
     db.commit()
     db.refresh(file)
+
+    if relative_path != stored.relative_path:
+        # The content was already stored under a live blob, so this upload's copy is surplus.
+        try:
+            storage.delete(relative_path=stored.relative_path)
+        except StorageFileNotFoundError:
+            pass
     return file
 
 
+def _add_blob_reference(*, db: Session, stored: StoredFile) -> str:
+    stmt = sqlite_insert(Blob).values(
+        sha256=stored.sha256,
+        size_bytes=stored.size_bytes,
+        relative_path=stored.relative_path,
+        ref_count=1,
+        created_at=_utc_now(),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Blob.sha256],
+        set_={"ref_count": Blob.ref_count + 1},
+    )
+    return db.execute(stmt.returning(Blob.relative_path)).scalar_one()
+
+
+def _release_blob_reference(*, db: Session, relative_path: str) -> Blob | None:
+    stmt = (
+        update(Blob)
+        .where(Blob.relative_path == relative_path)
+        .values(ref_count=Blob.ref_count - 1)
+        .returning(Blob)
+    )
+    return db.scalars(stmt).one_or_none()
+
+
+def instant_upload(
+    *,
+    db: Session,
+    storage: Storage,
+    sha256: str,
+    size_bytes: int,
+    original_filename: str,
+    mime_type: str,
+    remark: str | None,
+) -> File:
+    stmt = (
+        update(Blob)
+        .where(and_(Blob.sha256 == sha256, Blob.size_bytes == size_bytes, Blob.ref_count > 0))
+        .values(ref_count=Blob.ref_count + 1)
+        .returning(Blob.relative_path)
+    )
+    relative_path = db.scalar(stmt)
+    if relative_path is None:
+        db.rollback()
+        raise FileContentNotFoundError(sha256)
+
+    return create_file_record(
+        db=db,
+        storage=storage,
+        stored=StoredFile(
+            stored_name=sha256,
+            relative_path=relative_path,
+            size_bytes=size_bytes,
+            sha256=sha256,
+        ),
+        original_name=safe_filename(original_filename),
+        mime_type=mime_type,
+        remark=remark,
+    )
+
+
+def encode_cursor(*, file: File) -> str:
+    raw = f"{file.created_at.isoformat()}|{file.id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, file_id = raw.split("|", maxsplit=1)
+        return datetime.fromisoformat(created_at), file_id
+    except ValueError as exc:
+        raise InvalidCursorError(cursor) from exc
+
+
+@lru_cache(maxsize=None)
+def _search_index_ready(engine: Engine) -> bool:
+    with engine.connect() as conn:
+        return has_search_index(conn=conn)
+
+
+def _search_matches(*, db: Session, keyword: str) -> Subquery | None:
+    # Trigrams cannot match shorter keywords; those, and builds without FTS5, fall back to LIKE.
+    if len(keyword) < SEARCH_MIN_KEYWORD_CHARS or not _search_index_ready(db.get_bind()):
+        return None
+    phrase = '"' + keyword.replace('"', '""') + '"'
+    return (
+        select(_SEARCH_INDEX.c.rowid, _SEARCH_INDEX.c.rank)
+        .where(literal_column(SEARCH_INDEX_TABLE).op("MATCH")(phrase))
+        .subquery()
+    )
+
+
 def list_files(
     *,
     db: Session,
     page: int,
     size: int,
     keyword: str | None,
-) -> tuple[int, list[FileWithShare]]:
-    deactivate_invalid_shares(db=db)
-
-    file_filters = [File.is_deleted.is_(False)]
-    if keyword:
+    cursor: str | None = None,
+    include_total: bool = True,
+) -> FilePage:
+    file_filters: list[ColumnElement[bool]] = [File.is_deleted.is_(False)]
+    matches = _search_matches(db=db, keyword=keyword) if keyword else None
+    if keyword and matches is None:
         like = f"%{keyword}%"
         file_filters.append(or_(File.original_name.like(like), File.remark.like(like)))
 
-    total = db.scalar(select(func.count()).select_from(File).where(and_(*file_filters)))
-    offset = (page - 1) * size
+    stmt = select(File, ShareLink)
+    ranked = False
+    order_by = [File.created_at.desc(), File.id.desc()]
+    if matches is not None:
+        # The index drives both queries so MATCH runs once; probing it per files row is quadratic.
+        stmt = stmt.select_from(matches).join(File, matches.c.rowid == _FILES_ROWID)
+        # Cursors are keyed on (created_at, id), so only page mode can order by relevance.
+        ranked = cursor is None
+        if ranked:
+            order_by.insert(0, matches.c.rank)
+    stmt = stmt.outerjoin(
+        ShareLink,
+        and_(ShareLink.file_id == File.id, shares_service.share_is_valid(now=_utc_now())),
+    )
 
-    stmt = (
-        select(File, ShareLink)
-        .outerjoin(
-            ShareLink,
-            and_(ShareLink.file_id == File.id, ShareLink.is_active.is_(True)),
+    total = None
+    if include_total and keyword:
+        count_filters = file_filters
+        if matches is not None:
+            count_filters = [*file_filters, _FILES_ROWID.in_(select(matches.c.rowid))]
+        total = int(db.scalar(select(func.count()).where(and_(*count_filters))) or 0)
+    elif include_total:
+        total = int(
+            db.scalar(select(Counter.value).where(Counter.name == FILES_ACTIVE_COUNTER)) or 0
         )
-        .where(and_(*file_filters))
-        .order_by(File.created_at.desc())
-        .offset(offset)
-        .limit(size)
-    )
+
+    stmt = stmt.where(and_(*file_filters)).order_by(*order_by).limit(size)
+    if cursor is not None:
+        stmt = stmt.where(tuple_(File.created_at, File.id) < tuple_(*_decode_cursor(cursor)))
+    else:
+        stmt = stmt.offset((page - 1) * size)
+
     rows = db.execute(stmt).all()
     items = [FileWithShare(file=row[0], active_share=row[1]) for row in rows]
-    return (int(total or 0), items)
+    # A (created_at, id) cursor cannot resume a page ordered by rank; callers keep using page.
+    next_cursor = None
+    if len(items) == size and not ranked:
+        next_cursor = encode_cursor(file=items[-1].file)
+    return FilePage(total=total, items=items, next_cursor=next_cursor)
 
 
-def delete_file(*, db: Session, storage: Storage, file_id: str) -> None:
+def delete_file(
+    *,
+    db: Session,
+    storage: Storage,
+    share_cache: shares_service.ShareCache,
+    file_id: str,
+) -> None:
     file = require_file(db=db, file_id=file_id)
 
-    try:
-        storage.delete(relative_path=file.file_path)
-    except StorageFileNotFoundError as exc:
-        raise FileNotFoundError(str(exc)) from exc
+    blob = _release_blob_reference(db=db, relative_path=file.file_path)
+    if blob is None:
+        try:
+            storage.delete(relative_path=file.file_path)
+        except StorageFileNotFoundError as exc:
+            raise FileNotFoundError(str(exc)) from exc
+    elif blob.ref_count <= 0:
+        db.delete(blob)
 
-    db.execute(
+    share_codes = db.scalars(
         update(ShareLink)
         .where(ShareLink.file_id == file_id)
         .values(is_active=False)
-    )
+        .returning(ShareLink.share_code)
+    ).all()
     file.is_deleted = True
     db.commit()
+    shares_service.invalidate_shares(cache=share_cache, share_codes=share_codes)
+
+    if blob is not None and blob.ref_count <= 0:
+        try:
+            storage.delete(relative_path=blob.relative_path)
+        except StorageFileNotFoundError:
+            pass
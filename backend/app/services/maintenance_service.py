@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from sqlalchemy.orm import Session
+
+from app.services import files_service, shares_service, uploads_service
+from app.storage import Storage
+
+
+@dataclass(frozen=True)
+class MaintenanceReport:
+    deactivated_shares: int
+    purged_upload_sessions: int
+    purged_download_tokens: int
+
+
+def run_maintenance(
+    *,
+    db: Session,
+    storage: Storage,
+    share_cache: shares_service.ShareCache,
+    download_token_expires_seconds: int,
+) -> MaintenanceReport:
+    deactivated_shares = files_service.deactivate_invalid_shares(db=db, share_cache=share_cache)
+    purged_upload_sessions = uploads_service.purge_expired_upload_sessions(db=db, storage=storage)
+    # A used token is only kept to reject replays; once its JWT has expired the row is dead weight.
+    purged_download_tokens = shares_service.purge_download_tokens(
+        db=db,
+        older_than_seconds=download_token_expires_seconds,
+    )
+    return MaintenanceReport(
+        deactivated_shares=deactivated_shares,
+        purged_upload_sessions=purged_upload_sessions,
+        purged_download_tokens=purged_download_tokens,
+    )
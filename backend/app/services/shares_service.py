@@ -1,20 +1,25 @@
 from __future__ import annotations
 
+import hashlib
 import secrets
 import string
+from collections.abc import Iterable
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from uuid import uuid4
 
-from sqlalchemy import and_, select, update
+from sqlalchemy import ColumnElement, and_, case, delete, or_, select, update
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
+from app.core import tracing
 from app.core.constants import DOWNLOAD_TOKEN_TYPE, SHARE_CODE_LENGTH, SHARE_CODE_MAX_RETRIES
-from app.core.security import create_token, hash_password, verify_password
+from app.core.security import PasswordHasher, create_token
+from app.core.ttl_cache import TTLCache
 from app.models import File, ShareDownloadToken, ShareLink
 from app.services.errors import (
     FileNotFoundError,
+    ServiceError,
     ShareDownloadLimitReachedError,
     ShareLinkExpiredError,
     ShareLinkInactiveError,
@@ -26,6 +31,33 @@ from app.services.errors import (
 SHARE_CODE_ALPHABET = string.ascii_letters + string.digits
 
 
+@dataclass(frozen=True)
+class ResolvedShare:
+    share_id: str
+    share_code: str
+    file_id: str
+    file_path: str
+    filename: str
+    file_size: int
+    mime_type: str
+    password_hash: str | None
+    expire_at: datetime | None
+    max_downloads: int | None
+    download_count: int
+    is_active: bool
+    file_deleted: bool
+
+
+ShareCache = TTLCache[str, ResolvedShare]
+VerifiedPasswordCache = TTLCache[tuple[str, str], bool]
+
+
+@dataclass(frozen=True)
+class ShareDownload:
+    link: ShareLink
+    file: File
+
+
 @dataclass(frozen=True)
 class ShareCreateParams:
     password: str | None
@@ -55,20 +87,34 @@ def _require_file(*, db: Session, file_id: str) -> File:
     return file
 
 
-def _deactivate_file_shares(*, db: Session, file_id: str) -> None:
+def _deactivate_file_shares(*, db: Session, file_id: str) -> list[str]:
     stmt = (
         update(ShareLink)
         .where(and_(ShareLink.file_id == file_id, ShareLink.is_active.is_(True)))
         .values(is_active=False)
+        .returning(ShareLink.share_code)
     )
-    db.execute(stmt)
+    return list(db.scalars(stmt))
+
 
+def invalidate_shares(*, cache: ShareCache, share_codes: Iterable[str]) -> None:
+    for share_code in share_codes:
+        cache.pop(share_code)
 
-def create_share_link(*, db: Session, file_id: str, params: ShareCreateParams) -> ShareLink:
+
+def create_share_link(
+    *,
+    db: Session,
+    cache: ShareCache,
+    hasher: PasswordHasher,
+    file_id: str,
+    params: ShareCreateParams,
+) -> ShareLink:
     _require_file(db=db, file_id=file_id)
-    _deactivate_file_shares(db=db, file_id=file_id)
+    # Hash before the first write so the writer connection is not held during bcrypt.
+    password_hash = hasher.hash(password=params.password) if params.password else None
+    deactivated = _deactivate_file_shares(db=db, file_id=file_id)
 
-    password_hash = hash_password(password=params.password) if params.password else None
     expire_at = (
         _utc_now() + timedelta(hours=params.expire_hours) if params.expire_hours else None
     )
@@ -95,43 +141,96 @@ def create_share_link(*, db: Session, file_id: str, params: ShareCreateParams) -
     )
     db.add(link)
     db.commit()
+    invalidate_shares(cache=cache, share_codes=deactivated)
     db.refresh(link)
     return link
 
 
-def get_share_link(*, db: Session, share_code: str) -> ShareLink:
-    link = db.scalar(select(ShareLink).where(ShareLink.share_code == share_code))
-    if link is None:
+def _to_resolved_share(*, link: ShareLink, file: File) -> ResolvedShare:
+    return ResolvedShare(
+        share_id=link.id,
+        share_code=link.share_code,
+        file_id=file.id,
+        file_path=file.file_path,
+        filename=file.original_name,
+        file_size=file.file_size,
+        mime_type=file.mime_type,
+        password_hash=link.password_hash,
+        expire_at=link.expire_at,
+        max_downloads=link.max_downloads,
+        download_count=link.download_count,
+        is_active=link.is_active,
+        file_deleted=file.is_deleted,
+    )
+
+
+def _unavailable_error(*, share: ResolvedShare, now: datetime) -> ServiceError | None:
+    if not share.is_active or share.file_deleted:
+        return ShareLinkInactiveError(share.share_code)
+    if share.expire_at and _as_utc_aware(share.expire_at) <= now:
+        return ShareLinkExpiredError(share.share_code)
+    if share.max_downloads is not None and share.download_count >= share.max_downloads:
+        return ShareDownloadLimitReachedError(share.share_code)
+    return None
+
+
+@tracing.traced("shares_service.resolve_share")
+def resolve_share(*, db: Session, cache: ShareCache, share_code: str) -> ResolvedShare:
+    cached = cache.get(share_code)
+    tracing.annotate(**{"share.cache_hit": cached is not None})
+    if cached is not None:
+        return cached
+
+    row = db.execute(
+        select(ShareLink, File)
+        .join(File, File.id == ShareLink.file_id)
+        .where(ShareLink.share_code == share_code)
+    ).first()
+    if row is None:
         raise ShareLinkNotFoundError(share_code)
-    return link
+    share = _to_resolved_share(link=row[0], file=row[1])
+    cache.set(share_code, share)
+    return share
 
 
-def require_active_share_link(*, db: Session, share_code: str) -> ShareLink:
-    link = get_share_link(db=db, share_code=share_code)
-    if not link.is_active:
-        raise ShareLinkInactiveError(share_code)
+@tracing.traced("shares_service.require_active_share")
+def require_active_share(*, db: Session, cache: ShareCache, share_code: str) -> ResolvedShare:
+    share = resolve_share(db=db, cache=cache, share_code=share_code)
+    # Read-only: stale rows are deactivated by the maintenance task.
+    error = _unavailable_error(share=share, now=_utc_now())
+    if error is not None:
+        raise error
+    return share
 
-    now = _utc_now()
-    if link.expire_at and _as_utc_aware(link.expire_at) <= now:
-        db.execute(update(ShareLink).where(ShareLink.id == link.id).values(is_active=False))
-        db.commit()
-        raise ShareLinkExpiredError(share_code)
 
-    if link.max_downloads is not None and link.download_count >= link.max_downloads:
-        db.execute(update(ShareLink).where(ShareLink.id == link.id).values(is_active=False))
-        db.commit()
-        raise ShareDownloadLimitReachedError(share_code)
+def _password_digest(*, password_hash: str, password: str) -> str:
+    # Salted by the stored bcrypt hash, so a changed password never matches an old entry.
+    material = f"{password_hash}\0{password}".encode("utf-8")
+    return hashlib.sha256(material).hexdigest()
 
-    return link
 
+@tracing.traced("shares_service.verify_share_password_or_raise")
+async def verify_share_password_or_raise(
+    *,
+    share: ResolvedShare,
+    password: str | None,
+    hasher: PasswordHasher,
+    verified: VerifiedPasswordCache,
+) -> None:
+    if share.password_hash is None:
+        return
+    if not password:
+        raise SharePasswordInvalidError()
 
-def verify_share_password_or_raise(*, link: ShareLink, password: str | None) -> None:
-    if link.password_hash is None:
+    key = (share.share_code, _password_digest(password_hash=share.password_hash, password=password))
+    if verified.get(key):
         return
-    if not password or not verify_password(password=password, password_hash=link.password_hash):
+    if not await hasher.verify(password=password, password_hash=share.password_hash):
         raise SharePasswordInvalidError()
+    verified.set(key, True)
 
 
+@tracing.traced("shares_service.create_download_token")
 def create_download_token(
     *,
     jwt_secret: str,
@@ -148,13 +247,11 @@ def create_download_token(
     )
 
 
-def is_download_token_used(*, db: Session, share_id: str, token_jti: str) -> bool:
-    stmt = (
-        select(ShareDownloadToken.jti)
-        .where(ShareDownloadToken.jti == token_jti)
-        .where(ShareDownloadToken.share_id == share_id)
-    )
-    return db.scalar(stmt) is not None
+def purge_download_tokens(*, db: Session, older_than_seconds: int) -> int:
+    cutoff = _utc_now() - timedelta(seconds=older_than_seconds)
+    result = db.execute(delete(ShareDownloadToken).where(ShareDownloadToken.created_at <= cutoff))
+    db.commit()
+    return result.rowcount
 
 
 def _try_register_download_token(*, db: Session, share_id: str, token_jti: str) -> bool:
@@ -168,23 +265,71 @@ def _try_register_download_token(*, db: Session, share_id: str, token_jti: str)
     return bool(result.rowcount)
 
 
-def increase_download_count(*, db: Session, share_id: str, token_jti: str) -> None:
-    if not _try_register_download_token(db=db, share_id=share_id, token_jti=token_jti):
-        return
+def share_is_valid(*, now: datetime) -> ColumnElement[bool]:
+    return and_(
+        ShareLink.is_active.is_(True),
+        or_(ShareLink.expire_at.is_(None), ShareLink.expire_at > now),
+        or_(
+            ShareLink.max_downloads.is_(None),
+            ShareLink.download_count < ShareLink.max_downloads,
+        ),
+    )
 
-    link = db.get(ShareLink, share_id)
-    if link is None:
-        raise ShareLinkNotFoundError(share_id)
 
-    if link.max_downloads is not None and link.download_count >= link.max_downloads:
-        db.execute(update(ShareLink).where(ShareLink.id == link.id).values(is_active=False))
+@tracing.traced("shares_service.get_share_download")
+def get_share_download(*, db: Session, share_code: str) -> ShareDownload:
+    row = db.execute(
+        select(ShareLink, File)
+        .join(File, File.id == ShareLink.file_id)
+        .where(ShareLink.share_code == share_code)
+    ).first()
+    if row is None:
+        raise ShareLinkNotFoundError(share_code)
+    link, file = row
+    if file.is_deleted:
+        raise ShareLinkInactiveError(share_code)
+    return ShareDownload(link=link, file=file)
+
+
+@tracing.traced("shares_service.register_share_download")
+def register_share_download(
+    *,
+    db: Session,
+    cache: ShareCache,
+    download: ShareDownload,
+    token_jti: str,
+) -> None:
+    link = download.link
+    # A token counts once; replaying it (e.g. resuming a download) stays allowed afterwards.
+    if not _try_register_download_token(db=db, share_id=link.id, token_jti=token_jti):
         db.commit()
-        raise ShareDownloadLimitReachedError(link.share_code)
+        return
 
-    new_count = link.download_count + 1
-    values: dict[str, object] = {"download_count": new_count}
-    if link.max_downloads is not None and new_count >= link.max_downloads:
-        values["is_active"] = False
+    now = _utc_now()
+    next_count = ShareLink.download_count + 1
+    download_count = db.scalar(
+        update(ShareLink)
+        .where(ShareLink.id == link.id)
+        .where(share_is_valid(now=now))
+        .values(
+            download_count=next_count,
+            is_active=case(
+                (
+                    and_(ShareLink.max_downloads.is_not(None), next_count >= ShareLink.max_downloads),
+                    False,
+                ),
+                else_=ShareLink.is_active,
+            ),
+        )
+        .returning(ShareLink.download_count)
+        .execution_options(synchronize_session=False)
+    )
+    if download_count is None:
+        share = _to_resolved_share(link=link, file=download.file)
+        error = _unavailable_error(share=share, now=now) or ShareLinkInactiveError(link.share_code)
+        db.rollback()
+        cache.pop(link.share_code)
+        raise error
 
-    db.execute(update(ShareLink).where(ShareLink.id == link.id).values(**values))
     db.commit()
+    cache.pop(link.share_code)
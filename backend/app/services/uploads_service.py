@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import File, UploadSession
+from app.services.errors import UploadChunkInvalidError, UploadSessionNotFoundError
+from app.services.files_service import create_file_record, safe_filename
+from app.storage import FileTooLargeError, Storage, StorageFileNotFoundError
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc_aware(value: datetime) -> datetime:
+    tzinfo = value.tzinfo
+    if tzinfo is None or tzinfo.utcoffset(value) is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def create_upload_session(
+    *,
+    db: Session,
+    storage: Storage,
+    original_filename: str,
+    total_size: int,
+    mime_type: str,
+    remark: str | None,
+    chunk_size: int,
+    max_upload_bytes: int,
+    expires_in_seconds: int,
+) -> UploadSession:
+    if total_size > max_upload_bytes:
+        raise FileTooLargeError(f"File exceeds max bytes: {max_upload_bytes}")
+
+    upload = UploadSession(
+        id=str(uuid4()),
+        original_name=safe_filename(original_filename),
+        mime_type=mime_type,
+        remark=remark,
+        total_size=total_size,
+        chunk_size=chunk_size,
+        expire_at=_utc_now() + timedelta(seconds=expires_in_seconds),
+    )
+    storage.create_upload(upload_id=upload.id, total_size=total_size, chunk_size=chunk_size)
+    db.add(upload)
+    db.commit()
+    db.refresh(upload)
+    return upload
+
+
+def require_upload_session(*, db: Session, upload_id: str) -> UploadSession:
+    upload = db.get(UploadSession, upload_id)
+    if upload is None or _as_utc_aware(upload.expire_at) <= _utc_now():
+        raise UploadSessionNotFoundError(upload_id)
+    return upload
+
+
+def list_received_offsets(*, storage: Storage, upload: UploadSession) -> list[int]:
+    try:
+        chunks = storage.list_upload_chunks(upload_id=upload.id)
+    except StorageFileNotFoundError as exc:
+        raise UploadSessionNotFoundError(upload.id) from exc
+    return [index * upload.chunk_size for index in chunks]
+
+
+def write_upload_chunk(
+    *,
+    db: Session,
+    storage: Storage,
+    upload_id: str,
+    index: int,
+    data: bytes,
+) -> int:
+    upload = require_upload_session(db=db, upload_id=upload_id)
+
+    offset = index * upload.chunk_size
+    if index < 0 or offset >= upload.total_size:
+        raise UploadChunkInvalidError(f"Chunk index out of range: {index}")
+
+    expected_size = min(upload.chunk_size, upload.total_size - offset)
+    if len(data) != expected_size:
+        raise UploadChunkInvalidError(f"Chunk {index} must be {expected_size} bytes")
+
+    try:
+        storage.write_upload_chunk(upload_id=upload.id, index=index, offset=offset, data=data)
+    except StorageFileNotFoundError as exc:
+        raise UploadSessionNotFoundError(upload.id) from exc
+    return offset
+
+
+def complete_upload_session(*, db: Session, storage: Storage, upload_id: str) -> File:
+    upload = require_upload_session(db=db, upload_id=upload_id)
+
+    try:
+        stored = storage.complete_upload(
+            upload_id=upload.id,
+            original_filename=upload.original_name,
+            total_size=upload.total_size,
+        )
+    except StorageFileNotFoundError as exc:
+        raise UploadSessionNotFoundError(upload.id) from exc
+
+    db.delete(upload)
+    return create_file_record(
+        db=db,
+        storage=storage,
+        stored=stored,
+        original_name=upload.original_name,
+        mime_type=upload.mime_type,
+        remark=upload.remark,
+    )
+
+
+def abort_upload_session(*, db: Session, storage: Storage, upload_id: str) -> None:
+    upload = require_upload_session(db=db, upload_id=upload_id)
+    storage.abort_upload(upload_id=upload.id)
+    db.delete(upload)
+    db.commit()
+
+
+def purge_expired_upload_sessions(*, db: Session, storage: Storage) -> int:
+    expired = db.scalars(
+        select(UploadSession).where(UploadSession.expire_at <= _utc_now())
+    ).all()
+    for upload in expired:
+        storage.abort_upload(upload_id=upload.id)
+        db.delete(upload)
+    if expired:
+        db.commit()
+    return len(expired)
@@ -1,11 +1,23 @@
-from app.storage.base import StoredFile, Storage
-from app.storage.errors import FileTooLargeError, StorageFileNotFoundError
+from app.storage.base import StoredFile, StoredObject, Storage, StorageWriter
+from app.storage.cache import CacheStats, CachingStorage
+from app.storage.errors import (
+    FileTooLargeError,
+    StorageFileNotFoundError,
+    UploadIncompleteError,
+)
 from app.storage.local import LocalStorage
+from app.storage.s3 import S3Storage
 
 __all__ = [
+    "CacheStats",
+    "CachingStorage",
     "FileTooLargeError",
     "LocalStorage",
+    "S3Storage",
     "StoredFile",
+    "StoredObject",
     "Storage",
+    "StorageWriter",
     "StorageFileNotFoundError",
+    "UploadIncompleteError",
 ]
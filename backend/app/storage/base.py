@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from collections.abc import Iterator
 from dataclasses import dataclass
 from typing import BinaryIO, Protocol
 
@@ -9,6 +10,23 @@ class StoredFile:
     stored_name: str
     relative_path: str
     size_bytes: int
+    sha256: str | None = None
+    content_addressed: bool = False
+
+
+@dataclass(frozen=True)
+class StoredObject:
+    relative_path: str
+    size_bytes: int
+    local_path: str | None = None
+
+
+class StorageWriter(Protocol):
+    def write(self, data: bytes) -> None: ...
+
+    def commit(self) -> StoredFile: ...
+
+    def abort(self) -> None: ...
 
 
 class Storage(Protocol):
@@ -20,6 +38,41 @@ class Storage(Protocol):
         max_bytes: int,
     ) -> StoredFile: ...
 
+    def open_writer(self, *, original_filename: str, max_bytes: int) -> StorageWriter: ...
+
     def delete(self, *, relative_path: str) -> None: ...
 
-    def resolve_path(self, *, relative_path: str) -> str: ...
+    def stat(self, *, relative_path: str) -> StoredObject: ...
+
+    def open_range(self, *, relative_path: str, start: int, end: int) -> Iterator[bytes]: ...
+
+    def presigned_url(
+        self,
+        *,
+        relative_path: str,
+        content_disposition: str,
+        mime_type: str,
+    ) -> str | None: ...
+
+    def create_upload(self, *, upload_id: str, total_size: int, chunk_size: int) -> None: ...
+
+    def write_upload_chunk(
+        self,
+        *,
+        upload_id: str,
+        index: int,
+        offset: int,
+        data: bytes,
+    ) -> None: ...
+
+    def list_upload_chunks(self, *, upload_id: str) -> list[int]: ...
+
+    def complete_upload(
+        self,
+        *,
+        upload_id: str,
+        original_filename: str,
+        total_size: int,
+    ) -> StoredFile: ...
+
+    def abort_upload(self, *, upload_id: str) -> None: ...
@@ -0,0 +1,364 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO
+from uuid import uuid4
+
+from app.core.constants import (
+    FILE_IO_CHUNK_BYTES,
+    STORAGE_CACHE_MAX_FILLS,
+    STORAGE_CACHE_MAX_PENDING_SIZES,
+)
+from app.core.metrics import process_alive
+from app.storage.base import StoredFile, StoredObject, Storage, StorageWriter
+from app.storage.errors import StorageError
+
+
+CACHE_TMP_DIR_NAME = ".fill"
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    fills: int
+    fill_errors: int
+    evictions: int
+    entries: int
+    size_bytes: int
+    max_bytes: int
+
+
+class _Fill:
+    def __init__(self, *, tmp_path: Path, size_bytes: int) -> None:
+        self.tmp_path = tmp_path
+        self.size_bytes = size_bytes
+        self.written = 0
+        self.done = False
+        self.error: BaseException | None = None
+        self.cond = threading.Condition()
+
+    def wait_for(self, *, pos: int) -> int:
+        with self.cond:
+            while self.written <= pos and not self.done:
+                self.cond.wait()
+            if self.written > pos:
+                return self.written
+            if self.error is not None:
+                raise StorageError(f"Cache fill failed: {self.tmp_path.name}") from self.error
+            raise StorageError(f"Cache fill ended early: {self.tmp_path.name}")
+
+
+def _iter_cached_range(*, src: BinaryIO, start: int, end: int) -> Iterator[bytes]:
+    with src:
+        pos = start
+        while pos < end:
+            chunk = os.pread(src.fileno(), min(FILE_IO_CHUNK_BYTES, end - pos), pos)
+            if not chunk:
+                break
+            pos += len(chunk)
+            yield chunk
+
+
+def _iter_filling_range(*, fill: _Fill, src: BinaryIO, start: int, end: int) -> Iterator[bytes]:
+    with src:
+        pos = start
+        while pos < end:
+            available = fill.wait_for(pos=pos)
+            chunk = os.pread(src.fileno(), min(FILE_IO_CHUNK_BYTES, end - pos, available - pos), pos)
+            if not chunk:
+                break
+            pos += len(chunk)
+            yield chunk
+
+
+@dataclass(frozen=True)
+class CachingStorage(Storage):
+    backend: Storage
+    cache_dir: str
+    max_bytes: int
+    max_fills: int = STORAGE_CACHE_MAX_FILLS
+    _root: Path = field(init=False, repr=False, compare=False)
+    _lock: threading.Lock = field(init=False, repr=False, compare=False)
+    _entries: OrderedDict[str, int] = field(init=False, repr=False, compare=False)
+    _fills: dict[str, _Fill] = field(init=False, repr=False, compare=False)
+    _executor: ThreadPoolExecutor = field(init=False, repr=False, compare=False)
+    _closing: threading.Event = field(init=False, repr=False, compare=False)
+    _pending_sizes: OrderedDict[str, int] = field(init=False, repr=False, compare=False)
+    _counters: dict[str, int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        root = Path(self.cache_dir).expanduser().resolve()
+        (root / CACHE_TMP_DIR_NAME).mkdir(parents=True, exist_ok=True)
+        object.__setattr__(self, "_root", root)
+        object.__setattr__(self, "_lock", threading.Lock())
+        object.__setattr__(self, "_entries", OrderedDict())
+        object.__setattr__(self, "_fills", {})
+        object.__setattr__(
+            self,
+            "_executor",
+            ThreadPoolExecutor(max_workers=self.max_fills, thread_name_prefix="storage-cache-fill"),
+        )
+        object.__setattr__(self, "_closing", threading.Event())
+        object.__setattr__(self, "_pending_sizes", OrderedDict())
+        object.__setattr__(
+            self,
+            "_counters",
+            dict.fromkeys(("hits", "misses", "fills", "fill_errors", "evictions", "size_bytes"), 0),
+        )
+        self._load_entries()
+
+    def _load_entries(self) -> None:
+        # Workers share the directory; only fills whose worker has exited are abandoned. Our own
+        # pid can only be a leftover from an earlier process, as no fill has started yet.
+        for leftover in (self._root / CACHE_TMP_DIR_NAME).iterdir():
+            pid, _, _ = leftover.name.partition(".")
+            if not pid.isdigit() or int(pid) == os.getpid() or not process_alive(int(pid)):
+                leftover.unlink(missing_ok=True)
+
+        found: list[tuple[float, str, int]] = []
+        for dirpath, dirnames, filenames in os.walk(self._root):
+            dirnames[:] = [name for name in dirnames if name != CACHE_TMP_DIR_NAME]
+            for name in filenames:
+                abs_path = Path(dirpath) / name
+                stat_result = abs_path.stat()
+                relative_path = abs_path.relative_to(self._root).as_posix()
+                found.append((stat_result.st_mtime, relative_path, stat_result.st_size))
+
+        # mtime is refreshed on every hit, so it restores the LRU order across restarts.
+        for _, relative_path, size_bytes in sorted(found):
+            self._entries[relative_path] = size_bytes
+            self._counters["size_bytes"] += size_bytes
+        with self._lock:
+            self._evict_locked(reserve=0)
+
+    def _cache_path(self, *, relative_path: str) -> Path:
+        return self._root / relative_path
+
+    def _evict_locked(self, *, reserve: int) -> None:
+        while self._entries and self._counters["size_bytes"] + reserve > self.max_bytes:
+            relative_path, size_bytes = self._entries.popitem(last=False)
+            self._counters["size_bytes"] -= size_bytes
+            self._counters["evictions"] += 1
+            self._cache_path(relative_path=relative_path).unlink(missing_ok=True)
+
+    def _drop(self, *, relative_path: str) -> None:
+        with self._lock:
+            size_bytes = self._entries.pop(relative_path, None)
+            if size_bytes is not None:
+                self._counters["size_bytes"] -= size_bytes
+        self._cache_path(relative_path=relative_path).unlink(missing_ok=True)
+
+    def _lookup(self, *, relative_path: str) -> StoredObject | None:
+        with self._lock:
+            size_bytes = self._entries.get(relative_path)
+            if size_bytes is None:
+                return None
+            self._entries.move_to_end(relative_path)
+
+        cache_path = self._cache_path(relative_path=relative_path)
+        try:
+            os.utime(cache_path)
+        except FileNotFoundError:
+            # Another worker sharing the directory evicted it.
+            self._drop(relative_path=relative_path)
+            return None
+
+        with self._lock:
+            self._counters["hits"] += 1
+        return StoredObject(
+            relative_path=relative_path,
+            size_bytes=size_bytes,
+            local_path=str(cache_path),
+        )
+
+    def _run_fill(self, *, relative_path: str, fill: _Fill) -> None:
+        try:
+            with fill.tmp_path.open("wb") as out:
+                chunks = self.backend.open_range(
+                    relative_path=relative_path,
+                    start=0,
+                    end=fill.size_bytes,
+                )
+                try:
+                    for chunk in chunks:
+                        if self._closing.is_set():
+                            raise StorageError(f"Cache is shutting down: {relative_path}")
+                        out.write(chunk)
+                        out.flush()
+                        with fill.cond:
+                            fill.written += len(chunk)
+                            fill.cond.notify_all()
+                finally:
+                    close = getattr(chunks, "close", None)
+                    if close is not None:
+                        close()
+            if fill.written != fill.size_bytes:
+                raise StorageError(f"Short read while caching: {relative_path}")
+
+            cache_path = self._cache_path(relative_path=relative_path)
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                self._evict_locked(reserve=fill.size_bytes)
+                os.replace(fill.tmp_path, cache_path)
+                self._fills.pop(relative_path, None)
+                self._entries[relative_path] = fill.size_bytes
+                self._counters["size_bytes"] += fill.size_bytes
+                self._counters["fills"] += 1
+        except BaseException as exc:
+            with self._lock:
+                fill.tmp_path.unlink(missing_ok=True)
+                self._fills.pop(relative_path, None)
+                self._counters["fill_errors"] += 1
+            with fill.cond:
+                fill.error = exc
+        finally:
+            with fill.cond:
+                fill.done = True
+                fill.cond.notify_all()
+
+    def _join_fill(self, *, relative_path: str, size_bytes: int) -> tuple[_Fill, BinaryIO] | None:
+        with self._lock:
+            fill = self._fills.get(relative_path)
+            if fill is None:
+                # Every fill slot is busy: serve this one straight from the backend rather
+                # than queue behind other objects or start yet another thread.
+                if len(self._fills) >= self.max_fills:
+                    return None
+                fill = _Fill(
+                    tmp_path=self._root / CACHE_TMP_DIR_NAME / f"{os.getpid()}.{uuid4().hex}",
+                    size_bytes=size_bytes,
+                )
+                fill.tmp_path.touch()
+                self._fills[relative_path] = fill
+                self._executor.submit(self._run_fill, relative_path=relative_path, fill=fill)
+            # Opened under the lock so the fill cannot rename or unlink it first.
+            return fill, fill.tmp_path.open("rb")
+
+    def _remember_size(self, *, relative_path: str, size_bytes: int) -> None:
+        with self._lock:
+            self._pending_sizes[relative_path] = size_bytes
+            self._pending_sizes.move_to_end(relative_path)
+            while len(self._pending_sizes) > STORAGE_CACHE_MAX_PENDING_SIZES:
+                self._pending_sizes.popitem(last=False)
+
+    def _backend_size(self, *, relative_path: str) -> int:
+        # A download calls stat() then open_range(); the size from the first is reused once.
+        with self._lock:
+            size_bytes = self._pending_sizes.pop(relative_path, None)
+        if size_bytes is None:
+            size_bytes = self.backend.stat(relative_path=relative_path).size_bytes
+        return size_bytes
+
+    def shutdown(self) -> None:
+        self._closing.set()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._counters["hits"],
+                misses=self._counters["misses"],
+                fills=self._counters["fills"],
+                fill_errors=self._counters["fill_errors"],
+                evictions=self._counters["evictions"],
+                entries=len(self._entries),
+                size_bytes=self._counters["size_bytes"],
+                max_bytes=self.max_bytes,
+            )
+
+    def save(
+        self,
+        *,
+        source: BinaryIO,
+        original_filename: str,
+        max_bytes: int,
+    ) -> StoredFile:
+        return self.backend.save(
+            source=source,
+            original_filename=original_filename,
+            max_bytes=max_bytes,
+        )
+
+    def open_writer(self, *, original_filename: str, max_bytes: int) -> StorageWriter:
+        return self.backend.open_writer(original_filename=original_filename, max_bytes=max_bytes)
+
+    def delete(self, *, relative_path: str) -> None:
+        with self._lock:
+            self._pending_sizes.pop(relative_path, None)
+        self._drop(relative_path=relative_path)
+        self.backend.delete(relative_path=relative_path)
+
+    def stat(self, *, relative_path: str) -> StoredObject:
+        cached = self._lookup(relative_path=relative_path)
+        if cached is not None:
+            return cached
+
+        stored = self.backend.stat(relative_path=relative_path)
+        self._remember_size(relative_path=relative_path, size_bytes=stored.size_bytes)
+        # Hide the backend's own path so the download is routed through open_range and cached.
+        return StoredObject(relative_path=relative_path, size_bytes=stored.size_bytes)
+
+    def open_range(self, *, relative_path: str, start: int, end: int) -> Iterator[bytes]:
+        cached = self._lookup(relative_path=relative_path)
+        if cached is not None:
+            return _iter_cached_range(src=open(cached.local_path, "rb"), start=start, end=end)
+
+        with self._lock:
+            self._counters["misses"] += 1
+        size_bytes = self._backend_size(relative_path=relative_path)
+        joined = None
+        if size_bytes <= self.max_bytes:
+            joined = self._join_fill(relative_path=relative_path, size_bytes=size_bytes)
+        if joined is None:
+            return self.backend.open_range(relative_path=relative_path, start=start, end=end)
+
+        fill, src = joined
+        return _iter_filling_range(fill=fill, src=src, start=start, end=end)
+
+    def presigned_url(
+        self,
+        *,
+        relative_path: str,
+        content_disposition: str,
+        mime_type: str,
+    ) -> str | None:
+        return None
+
+    def create_upload(self, *, upload_id: str, total_size: int, chunk_size: int) -> None:
+        self.backend.create_upload(upload_id=upload_id, total_size=total_size, chunk_size=chunk_size)
+
+    def write_upload_chunk(
+        self,
+        *,
+        upload_id: str,
+        index: int,
+        offset: int,
+        data: bytes,
+    ) -> None:
+        self.backend.write_upload_chunk(upload_id=upload_id, index=index, offset=offset, data=data)
+
+    def list_upload_chunks(self, *, upload_id: str) -> list[int]:
+        return self.backend.list_upload_chunks(upload_id=upload_id)
+
+    def complete_upload(
+        self,
+        *,
+        upload_id: str,
+        original_filename: str,
+        total_size: int,
+    ) -> StoredFile:
+        return self.backend.complete_upload(
+            upload_id=upload_id,
+            original_filename=original_filename,
+            total_size=total_size,
+        )
+
+    def abort_upload(self, *, upload_id: str) -> None:
+        self.backend.abort_upload(upload_id=upload_id)
@@ -8,3 +8,7 @@ class FileTooLargeError(StorageError):
 
 class StorageFileNotFoundError(StorageError):
     pass
+
+
+class UploadIncompleteError(StorageError):
+    pass
@@ -1,21 +1,232 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import hashlib
+import os
+import struct
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import BinaryIO
 from uuid import uuid4
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+
 from app.core.constants import FILE_IO_CHUNK_BYTES
-from app.storage.base import StoredFile, Storage
-from app.storage.errors import FileTooLargeError, StorageFileNotFoundError
+from app.core.metrics import UPLOAD_BYTES
+from app.storage.base import StoredFile, StoredObject, Storage, StorageWriter
+from app.storage.errors import (
+    FileTooLargeError,
+    StorageFileNotFoundError,
+    UploadIncompleteError,
+)
+
+
+SHARD_WIDTH = 2
+BLOBS_DIR_NAME = "blobs"
+TMP_DIR_NAME = ".tmp"
+UPLOADS_DIR_NAME = ".uploads"
+UPLOAD_DATA_SUFFIX = ".data"
+UPLOAD_BITMAP_SUFFIX = ".bitmap"
+
+# total_size, chunk_size, received chunk count; followed by one bit per chunk.
+_UPLOAD_HEADER = struct.Struct("<QIQ")
+_UPLOAD_RECEIVED_OFFSET = struct.calcsize("<QI")
+_UPLOAD_BITMAP_LOCK = threading.Lock()
+
+
+@contextmanager
+def _exclusive_lock(*, fd: int) -> Iterator[None]:
+    if fcntl is None:
+        with _UPLOAD_BITMAP_LOCK:
+            yield
+        return
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def _preallocate(*, fd: int, size: int) -> None:
+    if size == 0:
+        return
+    if hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            pass
+    os.ftruncate(fd, size)
+
+
+def _pwrite_all(*, fd: int, data: bytes, offset: int) -> None:
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+def _hash_file(*, path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as src:
+        while True:
+            chunk = src.read(FILE_IO_CHUNK_BYTES)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _iter_file_range(*, src: BinaryIO, start: int, end: int) -> Iterator[bytes]:
+    with src:
+        src.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = src.read(min(FILE_IO_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _read_upload_header(*, fd: int) -> tuple[int, int, int]:
+    return _UPLOAD_HEADER.unpack(os.pread(fd, _UPLOAD_HEADER.size, 0))
+
+
+def _write_upload_received(*, fd: int, received: int) -> None:
+    _pwrite_all(fd=fd, data=struct.pack("<Q", received), offset=_UPLOAD_RECEIVED_OFFSET)
+
+
+class LocalStorageWriter(StorageWriter):
+    def __init__(
+        self,
+        *,
+        abs_path: Path,
+        max_bytes: int,
+        place: Callable[[str, int], StoredFile],
+    ) -> None:
+        self._abs_path = abs_path
+        self._max_bytes = max_bytes
+        self._place = place
+        self._size_bytes = 0
+        self._digest = hashlib.sha256()
+        self._out = abs_path.open("wb")
+
+    def write(self, data: bytes) -> None:
+        self._size_bytes += len(data)
+        if self._size_bytes > self._max_bytes:
+            raise FileTooLargeError(f"File exceeds max bytes: {self._max_bytes}")
+        self._digest.update(data)
+        self._out.write(data)
+        UPLOAD_BYTES.inc(len(data), backend="local")
+
+    def commit(self) -> StoredFile:
+        try:
+            self._out.close()
+            return self._place(self._digest.hexdigest(), self._size_bytes)
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self) -> None:
+        self._out.close()
+        self._abs_path.unlink(missing_ok=True)
 
 
 @dataclass(frozen=True)
 class LocalStorage(Storage):
     root_dir: str
+    content_addressed: bool = False
+    shard_depth: int = 0
+    _root: Path = field(init=False, repr=False, compare=False)
 
     def __post_init__(self) -> None:
-        Path(self.root_dir).expanduser().resolve().mkdir(parents=True, exist_ok=True)
+        root = Path(self.root_dir).expanduser().resolve()
+        root.mkdir(parents=True, exist_ok=True)
+        object.__setattr__(self, "_root", root)
+
+    def _new_stored_name(self, *, original_filename: str) -> str:
+        suffix = Path(original_filename).suffix
+        return f"{uuid4()}{suffix}"
+
+    def _prepare_path(self, *, relative_path: str) -> Path:
+        abs_path = self._root / relative_path
+        abs_path.parent.mkdir(parents=True, exist_ok=True)
+        return abs_path
+
+    def layout_path(self, *, relative_path: str) -> str:
+        parent, _, name = relative_path.rpartition("/")
+        if parent and parent != BLOBS_DIR_NAME:
+            return relative_path
+
+        hex_name = name.replace("-", "")
+        if len(hex_name) <= self.shard_depth * SHARD_WIDTH:
+            return relative_path
+        shards = [hex_name[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(self.shard_depth)]
+        return "/".join([p for p in (parent, *shards) if p] + [name])
+
+    def _new_tmp_path(self) -> Path:
+        tmp_dir = Path(self.resolve_path(relative_path=TMP_DIR_NAME))
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        return tmp_dir / uuid4().hex
+
+    def _claim_path(self, *, relative_path: str) -> bool:
+        try:
+            fd = os.open(
+                self._prepare_path(relative_path=relative_path),
+                os.O_CREAT | os.O_EXCL | os.O_WRONLY,
+            )
+        except FileExistsError:
+            return False
+        os.close(fd)
+        return True
+
+    def _place_blob(self, *, tmp_path: Path, sha256: str, size_bytes: int) -> StoredFile:
+        relative_path = f"{BLOBS_DIR_NAME}/{sha256}"
+        if not (self._root / relative_path).exists():
+            relative_path = self.layout_path(relative_path=relative_path)
+        # Never replace an existing blob: its row may already be gone with the unlink still
+        # pending, which would take this upload's content with it. A unique path is used
+        # instead, and create_file_record drops it again if the blob turns out to be live.
+        if not self._claim_path(relative_path=relative_path):
+            relative_path = self.layout_path(
+                relative_path=f"{BLOBS_DIR_NAME}/{sha256}.{uuid4().hex}"
+            )
+        os.replace(tmp_path, self._prepare_path(relative_path=relative_path))
+        return StoredFile(
+            stored_name=sha256,
+            relative_path=relative_path,
+            size_bytes=size_bytes,
+            sha256=sha256,
+            content_addressed=True,
+        )
+
+    def _uploads_dir(self) -> Path:
+        return Path(self.resolve_path(relative_path=UPLOADS_DIR_NAME))
+
+    def _upload_data_path(self, *, upload_id: str) -> Path:
+        return self._uploads_dir() / f"{upload_id}{UPLOAD_DATA_SUFFIX}"
+
+    def _upload_bitmap_path(self, *, upload_id: str) -> Path:
+        return self._uploads_dir() / f"{upload_id}{UPLOAD_BITMAP_SUFFIX}"
+
+    @contextmanager
+    def _open_upload_bitmap(self, *, upload_id: str) -> Iterator[int]:
+        try:
+            fd = os.open(self._upload_bitmap_path(upload_id=upload_id), os.O_RDWR)
+        except FileNotFoundError as exc:
+            raise StorageFileNotFoundError(upload_id) from exc
+        try:
+            with _exclusive_lock(fd=fd):
+                yield fd
+        finally:
+            os.close(fd)
 
     def save(
         self,
@@ -24,30 +235,42 @@ class LocalStorage(Storage):
         original_filename: str,
         max_bytes: int,
     ) -> StoredFile:
-        suffix = Path(original_filename).suffix
-        stored_name = f"{uuid4()}{suffix}"
-        relative_path = stored_name
-        abs_path = Path(self.resolve_path(relative_path=relative_path))
-
-        size_bytes = 0
-        try:
-            with abs_path.open("wb") as out:
-                while True:
-                    chunk = source.read(FILE_IO_CHUNK_BYTES)
-                    if not chunk:
-                        break
-                    size_bytes += len(chunk)
-                    if size_bytes > max_bytes:
-                        raise FileTooLargeError(f"File exceeds max bytes: {max_bytes}")
-                    out.write(chunk)
-        except Exception:
-            abs_path.unlink(missing_ok=True)
+        writer = self.open_writer(original_filename=original_filename, max_bytes=max_bytes)
+        try:
+            while True:
+                chunk = source.read(FILE_IO_CHUNK_BYTES)
+                if not chunk:
+                    break
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
             raise
+        return writer.commit()
 
-        return StoredFile(
-            stored_name=stored_name,
-            relative_path=relative_path,
-            size_bytes=size_bytes,
+    def open_writer(self, *, original_filename: str, max_bytes: int) -> LocalStorageWriter:
+        if self.content_addressed:
+            tmp_path = self._new_tmp_path()
+            return LocalStorageWriter(
+                abs_path=tmp_path,
+                max_bytes=max_bytes,
+                place=lambda sha256, size_bytes: self._place_blob(
+                    tmp_path=tmp_path,
+                    sha256=sha256,
+                    size_bytes=size_bytes,
+                ),
+            )
+
+        stored_name = self._new_stored_name(original_filename=original_filename)
+        relative_path = self.layout_path(relative_path=stored_name)
+        return LocalStorageWriter(
+            abs_path=self._prepare_path(relative_path=relative_path),
+            max_bytes=max_bytes,
+            place=lambda sha256, size_bytes: StoredFile(
+                stored_name=stored_name,
+                relative_path=relative_path,
+                size_bytes=size_bytes,
+                sha256=sha256,
+            ),
         )
 
     def delete(self, *, relative_path: str) -> None:
@@ -57,4 +280,132 @@ class LocalStorage(Storage):
         abs_path.unlink()
 
     def resolve_path(self, *, relative_path: str) -> str:
-        return str(Path(self.root_dir).expanduser().resolve() / relative_path)
+        return str(self._root / relative_path)
+
+    def stat(self, *, relative_path: str) -> StoredObject:
+        abs_path = self.resolve_path(relative_path=relative_path)
+        try:
+            stat_result = os.stat(abs_path)
+        except FileNotFoundError as exc:
+            raise StorageFileNotFoundError(relative_path) from exc
+        return StoredObject(
+            relative_path=relative_path,
+            size_bytes=stat_result.st_size,
+            local_path=abs_path,
+        )
+
+    def open_range(self, *, relative_path: str, start: int, end: int) -> Iterator[bytes]:
+        try:
+            src = open(self.resolve_path(relative_path=relative_path), "rb")
+        except FileNotFoundError as exc:
+            raise StorageFileNotFoundError(relative_path) from exc
+        return _iter_file_range(src=src, start=start, end=end)
+
+    def presigned_url(
+        self,
+        *,
+        relative_path: str,
+        content_disposition: str,
+        mime_type: str,
+    ) -> str | None:
+        return None
+
+    def create_upload(self, *, upload_id: str, total_size: int, chunk_size: int) -> None:
+        data_path = self._upload_data_path(upload_id=upload_id)
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+
+        chunk_count = -(-total_size // chunk_size)
+        header = _UPLOAD_HEADER.pack(total_size, chunk_size, 0)
+        bitmap = bytes(-(-chunk_count // 8))
+        try:
+            fd = os.open(data_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            try:
+                _preallocate(fd=fd, size=total_size)
+            finally:
+                os.close(fd)
+            with self._upload_bitmap_path(upload_id=upload_id).open("xb") as out:
+                out.write(header + bitmap)
+        except Exception:
+            self.abort_upload(upload_id=upload_id)
+            raise
+
+    def write_upload_chunk(
+        self,
+        *,
+        upload_id: str,
+        index: int,
+        offset: int,
+        data: bytes,
+    ) -> None:
+        try:
+            data_fd = os.open(self._upload_data_path(upload_id=upload_id), os.O_WRONLY)
+        except FileNotFoundError as exc:
+            raise StorageFileNotFoundError(upload_id) from exc
+        try:
+            _pwrite_all(fd=data_fd, data=data, offset=offset)
+        finally:
+            os.close(data_fd)
+        UPLOAD_BYTES.inc(len(data), backend="local")
+
+        with self._open_upload_bitmap(upload_id=upload_id) as bitmap_fd:
+            _, _, received = _read_upload_header(fd=bitmap_fd)
+            pos = _UPLOAD_HEADER.size + index // 8
+            mask = 1 << (index % 8)
+            current = os.pread(bitmap_fd, 1, pos)[0]
+            if current & mask:
+                return
+            _pwrite_all(fd=bitmap_fd, data=bytes([current | mask]), offset=pos)
+            _write_upload_received(fd=bitmap_fd, received=received + 1)
+
+    def list_upload_chunks(self, *, upload_id: str) -> list[int]:
+        with self._open_upload_bitmap(upload_id=upload_id) as bitmap_fd:
+            total_size, chunk_size, _ = _read_upload_header(fd=bitmap_fd)
+            chunk_count = -(-total_size // chunk_size)
+            bitmap = os.pread(bitmap_fd, -(-chunk_count // 8), _UPLOAD_HEADER.size)
+        return [index for index in range(chunk_count) if bitmap[index // 8] & (1 << (index % 8))]
+
+    def complete_upload(
+        self,
+        *,
+        upload_id: str,
+        original_filename: str,
+        total_size: int,
+    ) -> StoredFile:
+        with self._open_upload_bitmap(upload_id=upload_id) as bitmap_fd:
+            stored_size, chunk_size, received = _read_upload_header(fd=bitmap_fd)
+            chunk_count = -(-stored_size // chunk_size)
+            if stored_size != total_size or received != chunk_count:
+                raise UploadIncompleteError(
+                    f"Received {received} of {chunk_count} chunks for upload: {upload_id}"
+                )
+
+            stored_name = self._new_stored_name(original_filename=original_filename)
+            relative_path = self.layout_path(relative_path=stored_name)
+            target_path = (
+                self._new_tmp_path()
+                if self.content_addressed
+                else self._prepare_path(relative_path=relative_path)
+            )
+            try:
+                os.rename(self._upload_data_path(upload_id=upload_id), target_path)
+            except FileNotFoundError as exc:
+                raise StorageFileNotFoundError(upload_id) from exc
+
+        self.abort_upload(upload_id=upload_id)
+        if not self.content_addressed:
+            return StoredFile(
+                stored_name=stored_name,
+                relative_path=relative_path,
+                size_bytes=total_size,
+            )
+
+        try:
+            sha256 = _hash_file(path=target_path)
+            return self._place_blob(tmp_path=target_path, sha256=sha256, size_bytes=total_size)
+        except BaseException:
+            target_path.unlink(missing_ok=True)
+            raise
+
+    def abort_upload(self, *, upload_id: str) -> None:
+        self._upload_data_path(upload_id=upload_id).unlink(missing_ok=True)
+        self._upload_bitmap_path(upload_id=upload_id).unlink(missing_ok=True)
@@ -0,0 +1,415 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, BinaryIO
+from uuid import uuid4
+
+from app.core.constants import (
+    DEFAULT_S3_MAX_CONCURRENCY,
+    DEFAULT_S3_PART_SIZE_BYTES,
+    FILE_IO_CHUNK_BYTES,
+    S3_MAX_PARTS,
+)
+from app.core.metrics import UPLOAD_BYTES
+from app.storage.base import StoredFile, StoredObject, Storage, StorageWriter
+from app.storage.errors import (
+    FileTooLargeError,
+    StorageFileNotFoundError,
+    UploadIncompleteError,
+)
+
+
+_NOT_FOUND_CODES = frozenset({"404", "NoSuchKey", "NoSuchUpload", "NotFound"})
+
+
+def _is_not_found(exc: Exception) -> bool:
+    response = getattr(exc, "response", None)
+    if not isinstance(response, dict):
+        return False
+    return str(response.get("Error", {}).get("Code")) in _NOT_FOUND_CODES
+
+
+def create_s3_client(
+    *,
+    endpoint_url: str,
+    region: str,
+    access_key_id: str,
+    secret_access_key: str,
+) -> Any:
+    try:
+        import boto3
+    except ImportError as exc:
+        raise RuntimeError("S3 storage requires boto3: pip install boto3") from exc
+
+    return boto3.client(
+        "s3",
+        endpoint_url=endpoint_url or None,
+        region_name=region or None,
+        aws_access_key_id=access_key_id or None,
+        aws_secret_access_key=secret_access_key or None,
+    )
+
+
+class S3StorageWriter(StorageWriter):
+    def __init__(
+        self,
+        *,
+        storage: S3Storage,
+        stored_name: str,
+        max_bytes: int,
+    ) -> None:
+        self._storage = storage
+        self._stored_name = stored_name
+        self._key = storage.object_key(relative_path=stored_name)
+        self._max_bytes = max_bytes
+        self._size_bytes = 0
+        self._digest = hashlib.sha256()
+        self._buffer = bytearray()
+        self._upload_id: str | None = None
+        self._parts: list[Future[dict[str, Any]]] = []
+
+    def write(self, data: bytes) -> None:
+        self._size_bytes += len(data)
+        if self._size_bytes > self._max_bytes:
+            raise FileTooLargeError(f"File exceeds max bytes: {self._max_bytes}")
+        self._digest.update(data)
+        self._buffer += data
+        UPLOAD_BYTES.inc(len(data), backend="s3")
+
+        part_size = self._storage.part_size
+        while len(self._buffer) >= part_size:
+            self._submit_part(body=bytes(self._buffer[:part_size]))
+            del self._buffer[:part_size]
+
+    def _submit_part(self, *, body: bytes) -> None:
+        storage = self._storage
+        if self._upload_id is None:
+            response = storage.client.create_multipart_upload(Bucket=storage.bucket, Key=self._key)
+            self._upload_id = response["UploadId"]
+
+        # Bound the parts held in memory; surfaces a failed part before reading more input.
+        in_flight = [part for part in self._parts if not part.done()]
+        if len(in_flight) >= storage.max_concurrency:
+            wait(in_flight[: len(in_flight) - storage.max_concurrency + 1])
+        for part in self._parts:
+            if part.done():
+                part.result()
+
+        part_number = len(self._parts) + 1
+        self._parts.append(
+            storage.executor.submit(
+                storage.upload_part,
+                key=self._key,
+                upload_id=self._upload_id,
+                part_number=part_number,
+                body=body,
+            )
+        )
+
+    def commit(self) -> StoredFile:
+        storage = self._storage
+        try:
+            if self._upload_id is None:
+                storage.client.put_object(
+                    Bucket=storage.bucket,
+                    Key=self._key,
+                    Body=bytes(self._buffer),
+                )
+            else:
+                if self._buffer:
+                    self._submit_part(body=bytes(self._buffer))
+                parts = [part.result() for part in self._parts]
+                storage.client.complete_multipart_upload(
+                    Bucket=storage.bucket,
+                    Key=self._key,
+                    UploadId=self._upload_id,
+                    MultipartUpload={"Parts": parts},
+                )
+        except BaseException:
+            self.abort()
+            raise
+
+        self._buffer.clear()
+        return StoredFile(
+            stored_name=self._stored_name,
+            relative_path=self._stored_name,
+            size_bytes=self._size_bytes,
+            sha256=self._digest.hexdigest(),
+        )
+
+    def abort(self) -> None:
+        self._buffer.clear()
+        if self._upload_id is None:
+            return
+        wait(self._parts)
+        storage = self._storage
+        try:
+            storage.client.abort_multipart_upload(
+                Bucket=storage.bucket,
+                Key=self._key,
+                UploadId=self._upload_id,
+            )
+        except Exception as exc:
+            if not _is_not_found(exc):
+                raise
+        self._upload_id = None
+
+
+@dataclass(frozen=True)
+class S3Storage(Storage):
+    client: Any = field(repr=False, compare=False)
+    bucket: str
+    prefix: str = ""
+    part_size: int = DEFAULT_S3_PART_SIZE_BYTES
+    max_concurrency: int = DEFAULT_S3_MAX_CONCURRENCY
+    presign_expires_seconds: int | None = None
+    executor: ThreadPoolExecutor = field(init=False, repr=False, compare=False)
+    _upload_ids: dict[str, str] = field(init=False, repr=False, compare=False)
+    _upload_ids_lock: threading.Lock = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(
+            self,
+            "executor",
+            ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="s3-part"),
+        )
+        object.__setattr__(self, "_upload_ids", {})
+        object.__setattr__(self, "_upload_ids_lock", threading.Lock())
+
+    def object_key(self, *, relative_path: str) -> str:
+        prefix = self.prefix.strip("/")
+        return f"{prefix}/{relative_path}" if prefix else relative_path
+
+    def upload_part(
+        self,
+        *,
+        key: str,
+        upload_id: str,
+        part_number: int,
+        body: bytes,
+    ) -> dict[str, Any]:
+        response = self.client.upload_part(
+            Bucket=self.bucket,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    def _head(self, *, relative_path: str) -> dict[str, Any]:
+        try:
+            return self.client.head_object(
+                Bucket=self.bucket,
+                Key=self.object_key(relative_path=relative_path),
+            )
+        except Exception as exc:
+            if _is_not_found(exc):
+                raise StorageFileNotFoundError(relative_path) from exc
+            raise
+
+    def save(
+        self,
+        *,
+        source: BinaryIO,
+        original_filename: str,
+        max_bytes: int,
+    ) -> StoredFile:
+        writer = self.open_writer(original_filename=original_filename, max_bytes=max_bytes)
+        try:
+            while True:
+                chunk = source.read(FILE_IO_CHUNK_BYTES)
+                if not chunk:
+                    break
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.commit()
+
+    def open_writer(self, *, original_filename: str, max_bytes: int) -> S3StorageWriter:
+        suffix = Path(original_filename).suffix
+        return S3StorageWriter(
+            storage=self,
+            stored_name=f"{uuid4()}{suffix}",
+            max_bytes=max_bytes,
+        )
+
+    def delete(self, *, relative_path: str) -> None:
+        self._head(relative_path=relative_path)
+        self.client.delete_object(
+            Bucket=self.bucket,
+            Key=self.object_key(relative_path=relative_path),
+        )
+
+    def stat(self, *, relative_path: str) -> StoredObject:
+        head = self._head(relative_path=relative_path)
+        return StoredObject(relative_path=relative_path, size_bytes=int(head["ContentLength"]))
+
+    def open_range(self, *, relative_path: str, start: int, end: int) -> Iterator[bytes]:
+        try:
+            response = self.client.get_object(
+                Bucket=self.bucket,
+                Key=self.object_key(relative_path=relative_path),
+                Range=f"bytes={start}-{end - 1}",
+            )
+        except Exception as exc:
+            if _is_not_found(exc):
+                raise StorageFileNotFoundError(relative_path) from exc
+            raise
+        return self._iter_body(body=response["Body"])
+
+    def _iter_body(self, *, body: Any) -> Iterator[bytes]:
+        try:
+            while True:
+                chunk = body.read(FILE_IO_CHUNK_BYTES)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
+    def presigned_url(
+        self,
+        *,
+        relative_path: str,
+        content_disposition: str,
+        mime_type: str,
+    ) -> str | None:
+        if self.presign_expires_seconds is None:
+            return None
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self.object_key(relative_path=relative_path),
+                "ResponseContentDisposition": content_disposition,
+                "ResponseContentType": mime_type,
+            },
+            ExpiresIn=self.presign_expires_seconds,
+        )
+
+    def _find_upload_id(self, *, upload_id: str) -> str:
+        with self._upload_ids_lock:
+            cached = self._upload_ids.get(upload_id)
+        if cached is not None:
+            return cached
+
+        # Another worker may have started the session; S3 is the source of truth.
+        key = self.object_key(relative_path=upload_id)
+        response = self.client.list_multipart_uploads(Bucket=self.bucket, Prefix=key)
+        for upload in response.get("Uploads", []):
+            if upload["Key"] == key:
+                with self._upload_ids_lock:
+                    self._upload_ids[upload_id] = upload["UploadId"]
+                return upload["UploadId"]
+        raise StorageFileNotFoundError(upload_id)
+
+    def _list_parts(self, *, upload_id: str) -> list[dict[str, Any]]:
+        kwargs = {
+            "Bucket": self.bucket,
+            "Key": self.object_key(relative_path=upload_id),
+            "UploadId": self._find_upload_id(upload_id=upload_id),
+        }
+        parts: list[dict[str, Any]] = []
+        while True:
+            try:
+                response = self.client.list_parts(**kwargs)
+            except Exception as exc:
+                if _is_not_found(exc):
+                    raise StorageFileNotFoundError(upload_id) from exc
+                raise
+            parts.extend(response.get("Parts", []))
+            if not response.get("IsTruncated"):
+                return parts
+            kwargs["PartNumberMarker"] = response["NextPartNumberMarker"]
+
+    def create_upload(self, *, upload_id: str, total_size: int, chunk_size: int) -> None:
+        if -(-total_size // chunk_size) > S3_MAX_PARTS:
+            raise FileTooLargeError(f"Upload exceeds {S3_MAX_PARTS} parts: {upload_id}")
+        response = self.client.create_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.object_key(relative_path=upload_id),
+        )
+        with self._upload_ids_lock:
+            self._upload_ids[upload_id] = response["UploadId"]
+
+    def write_upload_chunk(
+        self,
+        *,
+        upload_id: str,
+        index: int,
+        offset: int,
+        data: bytes,
+    ) -> None:
+        try:
+            self.upload_part(
+                key=self.object_key(relative_path=upload_id),
+                upload_id=self._find_upload_id(upload_id=upload_id),
+                part_number=index + 1,
+                body=data,
+            )
+        except Exception as exc:
+            if _is_not_found(exc):
+                raise StorageFileNotFoundError(upload_id) from exc
+            raise
+        UPLOAD_BYTES.inc(len(data), backend="s3")
+
+    def list_upload_chunks(self, *, upload_id: str) -> list[int]:
+        return sorted(part["PartNumber"] - 1 for part in self._list_parts(upload_id=upload_id))
+
+    def complete_upload(
+        self,
+        *,
+        upload_id: str,
+        original_filename: str,
+        total_size: int,
+    ) -> StoredFile:
+        key = self.object_key(relative_path=upload_id)
+        parts = sorted(self._list_parts(upload_id=upload_id), key=lambda part: part["PartNumber"])
+        numbers = [part["PartNumber"] for part in parts]
+        received = sum(int(part["Size"]) for part in parts)
+        if numbers != list(range(1, len(parts) + 1)) or received != total_size:
+            raise UploadIncompleteError(
+                f"Received {received} of {total_size} bytes for upload: {upload_id}"
+            )
+
+        if parts:
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=self._find_upload_id(upload_id=upload_id),
+                MultipartUpload={
+                    "Parts": [
+                        {"PartNumber": part["PartNumber"], "ETag": part["ETag"]} for part in parts
+                    ]
+                },
+            )
+        else:
+            # S3 cannot complete a multipart upload without parts.
+            self.abort_upload(upload_id=upload_id)
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=b"")
+
+        with self._upload_ids_lock:
+            self._upload_ids.pop(upload_id, None)
+        return StoredFile(stored_name=upload_id, relative_path=upload_id, size_bytes=total_size)
+
+    def abort_upload(self, *, upload_id: str) -> None:
+        try:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.object_key(relative_path=upload_id),
+                UploadId=self._find_upload_id(upload_id=upload_id),
+            )
+        except StorageFileNotFoundError:
+            pass
+        except Exception as exc:
+            if not _is_not_found(exc):
+                raise
+        with self._upload_ids_lock:
+            self._upload_ids.pop(upload_id, None)
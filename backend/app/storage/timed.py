@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO
+
+from app.core import tracing
+from app.core import profiling
+from app.core.profiling import timed
+from app.storage.base import StoredFile, StoredObject, Storage, StorageWriter
+
+
+_CATEGORY = "storage"
+
+
+def _iter_timed(chunks: Iterator[bytes], span: tracing.Span | None) -> Iterator[bytes]:
+    iterator = iter(chunks)
+    sent = 0
+    try:
+        while True:
+            with timed(_CATEGORY):
+                chunk = next(iterator, None)
+            if chunk is None:
+                return
+            sent += len(chunk)
+            yield chunk
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+        if span is not None:
+            span.set(**{"storage.bytes": sent})
+            span.end()
+
+
+@dataclass
+class TimedStorageWriter(StorageWriter):
+    writer: StorageWriter
+    # One span for the whole upload rather than one per chunk.
+    span: tracing.Span | None
+    written: int = field(default=0)
+
+    def _end(self) -> None:
+        if self.span is not None:
+            self.span.set(**{"storage.bytes": self.written})
+            self.span.end()
+
+    def write(self, data: bytes) -> None:
+        with timed(_CATEGORY):
+            self.writer.write(data)
+        self.written += len(data)
+
+    def commit(self) -> StoredFile:
+        try:
+            with timed(_CATEGORY):
+                return self.writer.commit()
+        finally:
+            self._end()
+
+    def abort(self) -> None:
+        try:
+            with timed(_CATEGORY):
+                self.writer.abort()
+        finally:
+            self._end()
+
+
+@dataclass(frozen=True)
+class TimedStorage(Storage):
+    backend: Storage
+
+    def _attributes(self, **attributes: Any) -> dict[str, Any]:
+        return {"storage.backend": type(self.backend).__name__, **attributes}
+
+    @contextmanager
+    def _timed(self, operation: str, **attributes: Any) -> Iterator[None]:
+        with timed(_CATEGORY), tracing.span(f"storage.{operation}", **self._attributes(**attributes)):
+            yield
+
+    def save(
+        self,
+        *,
+        source: BinaryIO,
+        original_filename: str,
+        max_bytes: int,
+    ) -> StoredFile:
+        with self._timed("save", **{"storage.filename": original_filename}):
+            return self.backend.save(
+                source=source,
+                original_filename=original_filename,
+                max_bytes=max_bytes,
+            )
+
+    def open_writer(self, *, original_filename: str, max_bytes: int) -> StorageWriter:
+        span = tracing.start_span(
+            "storage.write",
+            **self._attributes(**{"storage.filename": original_filename}),
+        )
+        with timed(_CATEGORY):
+            writer = self.backend.open_writer(original_filename=original_filename, max_bytes=max_bytes)
+        if span is None and not profiling.active():
+            return writer
+        return TimedStorageWriter(writer=writer, span=span)
+
+    def delete(self, *, relative_path: str) -> None:
+        with self._timed("delete", **{"storage.path": relative_path}):
+            self.backend.delete(relative_path=relative_path)
+
+    def stat(self, *, relative_path: str) -> StoredObject:
+        with self._timed("stat", **{"storage.path": relative_path}):
+            return self.backend.stat(relative_path=relative_path)
+
+    def open_range(self, *, relative_path: str, start: int, end: int) -> Iterator[bytes]:
+        span = tracing.start_span(
+            "storage.read",
+            **self._attributes(**{"storage.path": relative_path, "storage.offset": start}),
+        )
+        with timed(_CATEGORY):
+            chunks = self.backend.open_range(relative_path=relative_path, start=start, end=end)
+        # Neither profiling nor tracing this request: skip the per-chunk wrapper.
+        if span is None and not profiling.active():
+            return chunks
+        return _iter_timed(chunks, span)
+
+    def presigned_url(
+        self,
+        *,
+        relative_path: str,
+        content_disposition: str,
+        mime_type: str,
+    ) -> str | None:
+        with self._timed("presigned_url", **{"storage.path": relative_path}):
+            return self.backend.presigned_url(
+                relative_path=relative_path,
+                content_disposition=content_disposition,
+                mime_type=mime_type,
+            )
+
+    def create_upload(self, *, upload_id: str, total_size: int, chunk_size: int) -> None:
+        with self._timed("create_upload", **{"storage.upload_id": upload_id}):
+            self.backend.create_upload(
+                upload_id=upload_id,
+                total_size=total_size,
+                chunk_size=chunk_size,
+            )
+
+    def write_upload_chunk(
+        self,
+        *,
+        upload_id: str,
+        index: int,
+        offset: int,
+        data: bytes,
+    ) -> None:
+        attributes = {"storage.upload_id": upload_id, "storage.bytes": len(data)}
+        with self._timed("write_upload_chunk", **attributes):
+            self.backend.write_upload_chunk(
+                upload_id=upload_id,
+                index=index,
+                offset=offset,
+                data=data,
+            )
+
+    def list_upload_chunks(self, *, upload_id: str) -> list[int]:
+        with self._timed("list_upload_chunks", **{"storage.upload_id": upload_id}):
+            return self.backend.list_upload_chunks(upload_id=upload_id)
+
+    def complete_upload(
+        self,
+        *,
+        upload_id: str,
+        original_filename: str,
+        total_size: int,
+    ) -> StoredFile:
+        with self._timed("complete_upload", **{"storage.upload_id": upload_id}):
+            return self.backend.complete_upload(
+                upload_id=upload_id,
+                original_filename=original_filename,
+                total_size=total_size,
+            )
+
+    def abort_upload(self, *, upload_id: str) -> None:
+        with self._timed("abort_upload", **{"storage.upload_id": upload_id}):
+            self.backend.abort_upload(upload_id=upload_id)
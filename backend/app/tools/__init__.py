@@ -0,0 +1 @@
+__all__ = ["migrate_storage_layout", "rebuild_search_index"]
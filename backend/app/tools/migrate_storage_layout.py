@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.settings import get_settings
+from app.db.session import create_sqlite_database
+from app.models import Blob, File
+from app.storage import LocalStorage
+
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_GRACE_SECONDS = 2.0
+
+
+@dataclass(frozen=True)
+class BatchResult:
+    scanned: int
+    moved: int
+    missing: int
+    last_path: str | None
+
+
+def _link_or_copy(*, src: str, dst: str) -> None:
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        pass
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def migrate_batch(
+    *,
+    db: Session,
+    storage: LocalStorage,
+    after: str,
+    batch_size: int,
+    grace_seconds: float,
+) -> BatchResult:
+    paths = db.scalars(
+        select(File.file_path)
+        .where(File.is_deleted.is_(False))
+        .where(File.file_path > after)
+        .group_by(File.file_path)
+        .order_by(File.file_path)
+        .limit(batch_size)
+    ).all()
+
+    moves: list[tuple[str, str]] = []
+    missing = 0
+    for old_path in paths:
+        new_path = storage.layout_path(relative_path=old_path)
+        if new_path == old_path:
+            continue
+        # Hard-link first so readers that still hold the old path keep working until commit.
+        try:
+            _link_or_copy(
+                src=storage.resolve_path(relative_path=old_path),
+                dst=storage.resolve_path(relative_path=new_path),
+            )
+        except FileNotFoundError:
+            missing += 1
+            continue
+        moves.append((old_path, new_path))
+
+    for old_path, new_path in moves:
+        db.execute(
+            update(File)
+            .where(File.file_path == old_path)
+            .values(file_path=new_path, updated_at=File.updated_at)
+        )
+        db.execute(update(Blob).where(Blob.relative_path == old_path).values(relative_path=new_path))
+    db.commit()
+
+    if moves and grace_seconds > 0:
+        time.sleep(grace_seconds)
+    for old_path, _ in moves:
+        # delete_file may have removed it already while this batch was running.
+        try:
+            os.unlink(storage.resolve_path(relative_path=old_path))
+        except FileNotFoundError:
+            pass
+
+    # A file deleted concurrently leaves the new link behind with nothing pointing at it.
+    new_paths = [new_path for _, new_path in moves]
+    live = set(
+        db.scalars(
+            select(File.file_path)
+            .where(File.is_deleted.is_(False))
+            .where(File.file_path.in_(new_paths))
+        ).all()
+    )
+    live.update(db.scalars(select(Blob.relative_path).where(Blob.relative_path.in_(new_paths))))
+    db.commit()
+    orphaned = [new_path for new_path in new_paths if new_path not in live]
+    for new_path in orphaned:
+        try:
+            os.unlink(storage.resolve_path(relative_path=new_path))
+        except FileNotFoundError:
+            pass
+
+    return BatchResult(
+        scanned=len(paths),
+        moved=len(moves) - len(orphaned),
+        missing=missing + len(orphaned),
+        last_path=paths[-1] if paths else None,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Move flat stored files into the sharded layout and rewrite File.file_path.",
+    )
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--grace-seconds", type=float, default=DEFAULT_GRACE_SECONDS)
+    args = parser.parse_args()
+
+    settings = get_settings()
+    if settings.storage_shard_depth == 0:
+        raise SystemExit("APP_STORAGE_SHARD_DEPTH is 0, nothing to migrate")
+
+    database = create_sqlite_database(db_path=settings.db_path)
+    storage = LocalStorage(
+        root_dir=settings.storage_dir,
+        content_addressed=settings.storage_dedup,
+        shard_depth=settings.storage_shard_depth,
+    )
+
+    after = ""
+    moved = missing = 0
+    while True:
+        with database.sessionmaker() as db:
+            result = migrate_batch(
+                db=db,
+                storage=storage,
+                after=after,
+                batch_size=args.batch_size,
+                grace_seconds=args.grace_seconds,
+            )
+        moved += result.moved
+        missing += result.missing
+        if result.last_path is None:
+            break
+        after = result.last_path
+        print(f"moved={moved} missing={missing} last={after}")
+
+    print(f"done: moved={moved} missing={missing}")
+
+
+if __name__ == "__main__":
+    main()
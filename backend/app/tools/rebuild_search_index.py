@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import argparse
+
+from app.core.settings import get_settings
+from app.db.schema import rebuild_search_index, supports_search_index, upgrade_schema
+from app.db.session import create_sqlite_database
+
+
+def main() -> None:
+    argparse.ArgumentParser(
+        description="Repopulate the FTS5 keyword search index from all undeleted files.",
+    ).parse_args()
+
+    settings = get_settings()
+    database = create_sqlite_database(db_path=settings.db_path)
+    upgrade_schema(engine=database.engine)
+
+    with database.engine.begin() as conn:
+        if not supports_search_index(conn=conn):
+            raise SystemExit("This SQLite build lacks FTS5 trigram support; search uses LIKE")
+        indexed = rebuild_search_index(conn=conn)
+
+    print(f"done: indexed={indexed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+__all__ = ["dataset", "metadata", "report", "transfer"]
@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import argparse
+import random
+import string
+import time
+import uuid
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import insert, text
+from sqlalchemy.engine import Connection
+
+from app.core.constants import FILES_ACTIVE_COUNTER, SHARE_CODE_LENGTH
+from app.db.schema import has_search_index, rebuild_search_index, upgrade_schema
+from app.db.session import create_sqlite_database
+from app.models import File, ShareDownloadToken, ShareLink
+
+
+DEFAULT_BATCH_SIZE = 10_000
+DEFAULT_SEED = 20240601
+HISTORY_DAYS = 365
+DELETED_RATIO = 0.05
+REMARK_RATIO = 0.3
+
+# Share states in proportion; expired and exhausted shares stay active until maintenance runs.
+SHARE_STATES = (("active", 60), ("expired", 15), ("exhausted", 10), ("inactive", 15))
+
+_WORDS = (
+    "report", "invoice", "contract", "photo", "backup", "design", "meeting", "budget",
+    "release", "archive", "draft", "scan", "presentation", "notes", "export", "video",
+    "项目", "合同", "照片", "周报", "发票", "设计稿", "会议纪要", "备份",
+)
+_TYPES = (
+    ("pdf", "application/pdf"),
+    ("docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    ("jpg", "image/jpeg"),
+    ("png", "image/png"),
+    ("zip", "application/zip"),
+    ("mp4", "video/mp4"),
+    ("txt", "text/plain"),
+)
+_CODE_ALPHABET = string.ascii_letters + string.digits
+
+
+@dataclass(frozen=True)
+class DatasetSummary:
+    files: int
+    shares: int
+    tokens: int
+    seconds: float
+
+
+def _batches(rows: Iterator[dict[str, Any]], size: int) -> Iterator[list[dict[str, Any]]]:
+    batch: list[dict[str, Any]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _Generator:
+    def __init__(self, *, seed: int, now: datetime) -> None:
+        self._rng = random.Random(seed)
+        self._now = now
+        self._codes: set[str] = set()
+
+    def _uuid(self) -> str:
+        return str(uuid.UUID(int=self._rng.getrandbits(128), version=4))
+
+    def _past(self, *, days: float) -> datetime:
+        return self._now - timedelta(seconds=self._rng.uniform(0, days * 86400))
+
+    def _remark(self) -> str | None:
+        if self._rng.random() >= REMARK_RATIO:
+            return None
+        return " ".join(self._rng.sample(_WORDS, k=3))
+
+    def file_rows(self, count: int, ids: list[str]) -> Iterator[dict[str, Any]]:
+        rng = self._rng
+        for index in range(count):
+            file_id = self._uuid()
+            ids.append(file_id)
+            extension, mime_type = rng.choice(_TYPES)
+            words = rng.sample(_WORDS, k=rng.randint(1, 3))
+            name = f"{'_'.join(words)}_{index}.{extension}"
+            created_at = self._past(days=HISTORY_DAYS)
+            stored_name = f"{file_id}.{extension}"
+            yield {
+                "id": file_id,
+                "original_name": name,
+                "stored_name": stored_name,
+                "file_path": f"{file_id[:2]}/{file_id[2:4]}/{stored_name}",
+                # Log-uniform between 1 KiB and 4 GiB, like a mix of documents and media.
+                "file_size": int(2 ** rng.uniform(10, 32)),
+                "mime_type": mime_type,
+                "sha256": None,
+                "remark": self._remark(),
+                "is_deleted": rng.random() < DELETED_RATIO,
+                "created_at": created_at,
+                "updated_at": created_at,
+            }
+
+    def _share_code(self) -> str:
+        while True:
+            code = "".join(self._rng.choices(_CODE_ALPHABET, k=SHARE_CODE_LENGTH))
+            if code not in self._codes:
+                self._codes.add(code)
+                return code
+
+    def share_rows(
+        self,
+        count: int,
+        file_ids: list[str],
+        ids: list[str],
+    ) -> Iterator[dict[str, Any]]:
+        rng = self._rng
+        states = [state for state, _ in SHARE_STATES]
+        weights = [weight for _, weight in SHARE_STATES]
+        for _ in range(count):
+            share_id = self._uuid()
+            ids.append(share_id)
+            state = rng.choices(states, weights=weights)[0]
+            created_at = self._past(days=HISTORY_DAYS)
+            expire_at = None
+            max_downloads = None
+            download_count = rng.randint(0, 20)
+            if state == "expired":
+                expire_at = self._past(days=30)
+            elif rng.random() < 0.5:
+                expire_at = self._now + timedelta(hours=rng.randint(1, 24 * 30))
+            if state == "exhausted":
+                max_downloads = download_count = rng.randint(1, 20)
+            elif rng.random() < 0.3:
+                max_downloads = download_count + rng.randint(1, 20)
+            yield {
+                "id": share_id,
+                "file_id": rng.choice(file_ids),
+                "share_code": self._share_code(),
+                "password_hash": None,
+                "expire_at": expire_at,
+                "max_downloads": max_downloads,
+                "download_count": download_count,
+                "is_active": state != "inactive",
+                "created_at": created_at,
+            }
+
+    def token_rows(self, count: int, share_ids: list[str]) -> Iterator[dict[str, Any]]:
+        for _ in range(count):
+            yield {
+                "jti": self._uuid(),
+                "share_id": self._rng.choice(share_ids),
+                "created_at": self._past(days=7),
+            }
+
+
+def _drop_file_triggers(conn: Connection) -> None:
+    # Per-row counter and FTS triggers dominate bulk load time; both are rebuilt in one pass after.
+    names = conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'files'"
+    ).scalars()
+    for name in list(names):
+        conn.exec_driver_sql(f'DROP TRIGGER "{name}"')
+
+
+def _insert(conn: Connection, table: Any, rows: Iterator[dict[str, Any]], batch_size: int) -> int:
+    inserted = 0
+    for batch in _batches(rows, batch_size):
+        conn.execute(insert(table), batch)
+        inserted += len(batch)
+    return inserted
+
+
+def generate(
+    *,
+    db_path: str,
+    files: int,
+    shares: int,
+    tokens: int,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    seed: int = DEFAULT_SEED,
+) -> DatasetSummary:
+    if shares and not files:
+        raise ValueError("shares need at least one file")
+    if tokens and not shares:
+        raise ValueError("download tokens need at least one share")
+
+    started_at = time.perf_counter()
+    database = create_sqlite_database(db_path=db_path)
+    upgrade_schema(engine=database.engine)
+    generator = _Generator(seed=seed, now=datetime.now(timezone.utc))
+    file_ids: list[str] = []
+    share_ids: list[str] = []
+
+    with database.engine.begin() as conn:
+        if conn.exec_driver_sql("SELECT 1 FROM files LIMIT 1").first() is not None:
+            raise ValueError(f"{db_path} already contains files; generate into a new database")
+        _drop_file_triggers(conn)
+        _insert(conn, File.__table__, generator.file_rows(files, file_ids), batch_size)
+        _insert(
+            conn,
+            ShareLink.__table__,
+            generator.share_rows(shares, file_ids, share_ids),
+            batch_size,
+        )
+        _insert(
+            conn,
+            ShareDownloadToken.__table__,
+            generator.token_rows(tokens, share_ids),
+            batch_size,
+        )
+        conn.execute(
+            text(
+                "UPDATE counters SET value = (SELECT COUNT(*) FROM files WHERE is_deleted = 0) "
+                "WHERE name = :name"
+            ),
+            {"name": FILES_ACTIVE_COUNTER},
+        )
+        if has_search_index(conn=conn):
+            rebuild_search_index(conn=conn)
+    # Recreates the dropped triggers. No ANALYZE: the app never runs it, so plans should match.
+    upgrade_schema(engine=database.engine)
+    database.engine.dispose()
+    database.reader_engine.dispose()
+
+    return DatasetSummary(
+        files=files,
+        shares=shares,
+        tokens=tokens,
+        seconds=round(time.perf_counter() - started_at, 3),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Fill a SQLite database with synthetic files, share links and download tokens.",
+    )
+    parser.add_argument("--db-path", required=True, help="database file, created if missing")
+    parser.add_argument("--files", type=int, required=True)
+    parser.add_argument("--shares", type=int, help="defaults to --files")
+    parser.add_argument("--tokens", type=int, help="defaults to --shares")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args()
+
+    shares = args.files if args.shares is None else args.shares
+    try:
+        summary = generate(
+            db_path=args.db_path,
+            files=args.files,
+            shares=shares,
+            tokens=shares if args.tokens is None else args.tokens,
+            batch_size=args.batch_size,
+            seed=args.seed,
+        )
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+    print(
+        f"done: files={summary.files} shares={summary.shares} "
+        f"tokens={summary.tokens} seconds={summary.seconds}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app.db.session import Database, create_sqlite_database
+from app.models import File, ShareLink
+from app.services import files_service, shares_service
+from app.services.errors import ShareLinkInactiveError, ShareLinkNotFoundError
+from benchmarks.dataset import DEFAULT_SEED, generate
+from benchmarks.report import Latency, environment, summarize
+
+
+DEFAULT_SCALES = "10000,100000,1000000"
+DEFAULT_REPEAT = 50
+DEFAULT_CASE_BUDGET_SECONDS = 30.0
+DEFAULT_TOLERANCE = 0.20
+DEFAULT_DATA_DIR = ".benchmark-data"
+DEFAULT_OUTPUT = "metadata-benchmark.json"
+PAGE_SIZE = 20
+SAMPLE_SHARE_CODES = 1000
+RESET_BATCH_SIZE = 500
+
+_EXPLAINABLE = ("select", "with", "update", "delete")
+
+
+@dataclass(frozen=True)
+class Statement:
+    sql: str
+    plan: list[str]
+
+
+@dataclass(frozen=True)
+class CaseResult:
+    name: str
+    repeat: int
+    latency: Latency
+    statements: list[Statement]
+
+
+@dataclass
+class Fixture:
+    share_codes: list[str]
+    middle_page: int
+    middle_cursor: str
+    rare_keyword: str
+    rng: random.Random
+    deactivated: list[str] = field(default_factory=list)
+
+
+# A case times one service call; prepare and reset run untimed around it, so cases that write
+# (deactivate_invalid_shares) see the same data on every repetition.
+@dataclass(frozen=True)
+class Case:
+    name: str
+    run: Callable[[Session, Fixture], Any]
+    prepare: Callable[[Database, Fixture], None] | None = None
+    reset: Callable[[Database, Fixture], None] | None = None
+
+
+def _list_files(**kwargs: Any) -> Callable[[Session, Fixture], Any]:
+    def _run(db: Session, fixture: Fixture) -> Any:
+        params = {
+            "page": 1,
+            "size": PAGE_SIZE,
+            "keyword": None,
+            "cursor": None,
+            "include_total": True,
+            **kwargs,
+        }
+        for name, value in params.items():
+            if callable(value):
+                params[name] = value(fixture)
+        return files_service.list_files(db=db, **params)
+
+    return _run
+
+
+def _resolve_share(db: Session, fixture: Fixture) -> Any:
+    # A zero-sized cache, so every call measures the database lookup.
+    cache = shares_service.ShareCache(max_entries=0, ttl_seconds=1)
+    code = fixture.rng.choice(fixture.share_codes)
+    try:
+        return shares_service.resolve_share(db=db, cache=cache, share_code=code)
+    except ShareLinkNotFoundError:
+        return None
+
+
+def _get_share_download(db: Session, fixture: Fixture) -> Any:
+    code = fixture.rng.choice(fixture.share_codes)
+    try:
+        return shares_service.get_share_download(db=db, share_code=code)
+    except (ShareLinkNotFoundError, ShareLinkInactiveError):
+        return None
+
+
+def _find_invalid_shares(database: Database, fixture: Fixture) -> None:
+    with database.sessionmaker() as db:
+        codes = db.scalars(
+            select(ShareLink.share_code)
+            .where(ShareLink.is_active.is_(True))
+            .where(~shares_service.share_is_valid(now=datetime.now(timezone.utc)))
+        ).all()
+    fixture.deactivated = list(codes)
+
+
+def _deactivate_invalid_shares(db: Session, fixture: Fixture) -> Any:
+    cache = shares_service.ShareCache(max_entries=0, ttl_seconds=1)
+    return files_service.deactivate_invalid_shares(db=db, share_cache=cache)
+
+
+def _reactivate_shares(database: Database, fixture: Fixture) -> None:
+    codes = fixture.deactivated
+    with database.engine.begin() as conn:
+        for start in range(0, len(codes), RESET_BATCH_SIZE):
+            conn.execute(
+                ShareLink.__table__.update()
+                .where(ShareLink.share_code.in_(codes[start : start + RESET_BATCH_SIZE]))
+                .values(is_active=True)
+            )
+    fixture.deactivated = []
+
+
+CASES = (
+    Case(name="list_files.first_page", run=_list_files()),
+    Case(
+        name="list_files.offset_middle",
+        run=_list_files(page=lambda fixture: fixture.middle_page, include_total=False),
+    ),
+    Case(
+        name="list_files.cursor_middle",
+        run=_list_files(cursor=lambda fixture: fixture.middle_cursor, include_total=False),
+    ),
+    Case(name="list_files.keyword_common", run=_list_files(keyword="invoice")),
+    Case(
+        name="list_files.keyword_rare",
+        run=_list_files(keyword=lambda fixture: fixture.rare_keyword),
+    ),
+    Case(name="list_files.keyword_short", run=_list_files(keyword="项目")),
+    Case(name="shares_service.resolve_share", run=_resolve_share),
+    Case(name="shares_service.get_share_download", run=_get_share_download),
+    Case(
+        name="files_service.deactivate_invalid_shares",
+        run=_deactivate_invalid_shares,
+        prepare=_find_invalid_shares,
+        reset=_reactivate_shares,
+    ),
+)
+
+
+def _create_fixture(database: Database, *, seed: int) -> Fixture:
+    with database.sessionmaker() as db:
+        codes = db.scalars(
+            select(ShareLink.share_code).order_by(ShareLink.id).limit(SAMPLE_SHARE_CODES)
+        ).all()
+        count = db.scalar(select(func.count()).select_from(File).where(File.is_deleted.is_(False)))
+        middle = db.scalar(
+            select(File)
+            .where(File.is_deleted.is_(False))
+            .order_by(File.created_at.desc(), File.id.desc())
+            .offset(count // 2)
+            .limit(1)
+        )
+    if middle is None or not codes:
+        raise SystemExit("dataset is empty; generate it with benchmarks.dataset first")
+    # Generated names end in "_<index>.<ext>", so the index of one file matches about one row.
+    rare = middle.original_name.rsplit("_", 1)[-1]
+    return Fixture(
+        share_codes=list(codes),
+        middle_page=max(1, count // 2 // PAGE_SIZE),
+        middle_cursor=files_service.encode_cursor(file=middle),
+        rare_keyword=f"_{rare}",
+        rng=random.Random(seed),
+    )
+
+
+@contextmanager
+def _capture_statements(database: Database) -> Iterator[list[tuple[str, Any]]]:
+    captured: list[tuple[str, Any]] = []
+
+    def _before(conn: Any, cursor: Any, statement: str, parameters: Any, *_: Any) -> None:
+        captured.append((statement, parameters))
+
+    engines = (database.engine, database.reader_engine)
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _before)
+    try:
+        yield captured
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", _before)
+
+
+def _format_plan(rows: list[tuple[int, int, int, str]]) -> list[str]:
+    depth = {0: -1}
+    lines = []
+    for node_id, parent_id, _, detail in rows:
+        depth[node_id] = depth.get(parent_id, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+def explain(database: Database, statements: list[tuple[str, Any]]) -> list[Statement]:
+    explained = []
+    with database.engine.connect() as conn:
+        for sql, parameters in statements:
+            if not sql.lstrip().lower().startswith(_EXPLAINABLE):
+                continue
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parameters).all()
+            explained.append(Statement(sql=sql, plan=_format_plan([tuple(row) for row in rows])))
+        conn.rollback()
+    return explained
+
+
+def run_case(
+    database: Database,
+    case: Case,
+    fixture: Fixture,
+    *,
+    repeat: int,
+    budget_seconds: float,
+) -> CaseResult:
+    # The first call warms caches and records the statements issued; it is not timed.
+    if case.prepare is not None:
+        case.prepare(database, fixture)
+    with _capture_statements(database) as captured, database.sessionmaker() as db:
+        case.run(db, fixture)
+    if case.reset is not None:
+        case.reset(database, fixture)
+    statements = explain(database, captured)
+
+    # Stops early once the budget is spent, so a pathological query cannot stall the whole run.
+    timings: list[float] = []
+    deadline = time.monotonic() + budget_seconds
+    while len(timings) < repeat and (not timings or time.monotonic() < deadline):
+        if case.prepare is not None:
+            case.prepare(database, fixture)
+        with database.sessionmaker() as db:
+            started_at = time.perf_counter()
+            case.run(db, fixture)
+            timings.append(time.perf_counter() - started_at)
+        if case.reset is not None:
+            case.reset(database, fixture)
+    return CaseResult(
+        name=case.name,
+        repeat=len(timings),
+        latency=summarize(timings),
+        statements=statements,
+    )
+
+
+def _dataset_path(data_dir: Path, scale: int, seed: int) -> Path:
+    return data_dir / f"metadata-{scale}-{seed}.db"
+
+
+def _prepare_dataset(data_dir: Path, scale: int, seed: int) -> Path:
+    path = _dataset_path(data_dir, scale, seed)
+    if path.exists():
+        return path
+    data_dir.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix(".partial")
+    for leftover in data_dir.glob(f"{partial.name}*"):
+        leftover.unlink()
+    print(f"generating {scale} files, shares and tokens into {path}", flush=True)
+    summary = generate(db_path=str(partial), files=scale, shares=scale, tokens=scale, seed=seed)
+    print(f"  generated in {summary.seconds}s", flush=True)
+    partial.rename(path)
+    return path
+
+
+def compare(
+    *,
+    scale: int,
+    results: list[CaseResult],
+    baseline: dict[str, Any],
+    tolerance: float,
+) -> dict[str, list[str]]:
+    cases = baseline["scales"].get(str(scale), {}).get("cases", [])
+    previous = {item["name"]: item for item in cases}
+    findings: dict[str, list[str]] = {}
+    for result in results:
+        base = previous.get(result.name)
+        if base is None:
+            continue
+        problems = []
+        if result.latency.p50_ms > base["latency"]["p50_ms"] * (1 + tolerance):
+            problems.append(f"p50 {base['latency']['p50_ms']} -> {result.latency.p50_ms} ms")
+        old_plans = [statement["plan"] for statement in base["statements"]]
+        if old_plans != [statement.plan for statement in result.statements]:
+            problems.append("query plan changed")
+        if problems:
+            findings[f"{scale}/{result.name}"] = problems
+    return findings
+
+
+def _print_result(result: CaseResult, problems: list[str] | None, *, plans: bool) -> None:
+    line = (
+        f"  {result.name:<42} p50 {result.latency.p50_ms:>9.3f} ms"
+        f"  p99 {result.latency.p99_ms:>9.3f} ms  runs {result.repeat:>3}"
+    )
+    if problems:
+        line += "  CHANGED: " + "; ".join(problems)
+    print(line, flush=True)
+    if not plans:
+        return
+    for statement in result.statements:
+        print("    " + " ".join(statement.sql.split())[:160])
+        for row in statement.plan:
+            print("      " + row)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure metadata queries and report their plans on synthetic datasets.",
+    )
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="comma-separated file counts")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument(
+        "--case-budget",
+        type=float,
+        default=DEFAULT_CASE_BUDGET_SECONDS,
+        help="seconds per case after which repetitions stop early",
+    )
+    parser.add_argument("--cases", help="comma-separated case names, default all")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="cache for generated datasets")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--no-plans", action="store_true", help="do not print query plans")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", help="previous --output file to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    scales = [int(float(value)) for value in args.scales.split(",") if value.strip()]
+    cases = list(CASES)
+    if args.cases:
+        wanted = {value.strip() for value in args.cases.split(",") if value.strip()}
+        unknown = sorted(wanted - {case.name for case in CASES})
+        if unknown:
+            raise SystemExit(f"unknown cases: {', '.join(unknown)}")
+        cases = [case for case in CASES if case.name in wanted]
+    if args.repeat <= 0 or any(scale <= 0 for scale in scales):
+        raise SystemExit("--repeat and --scales must be positive")
+    baseline = json.loads(Path(args.baseline).read_text("utf-8")) if args.baseline else None
+
+    report: dict[str, Any] = {
+        "meta": environment(repeat=args.repeat, seed=args.seed),
+        "scales": {},
+    }
+    findings: dict[str, list[str]] = {}
+    for scale in scales:
+        path = _prepare_dataset(Path(args.data_dir), scale, args.seed)
+        database = create_sqlite_database(db_path=str(path))
+        try:
+            fixture = _create_fixture(database, seed=args.seed)
+            print(f"scale {scale}:", flush=True)
+            results = []
+            for case in cases:
+                result = run_case(
+                    database,
+                    case,
+                    fixture,
+                    repeat=args.repeat,
+                    budget_seconds=args.case_budget,
+                )
+                results.append(result)
+                problems = None
+                if baseline is not None:
+                    found = compare(
+                        scale=scale,
+                        results=[result],
+                        baseline=baseline,
+                        tolerance=args.tolerance,
+                    )
+                    findings.update(found)
+                    problems = found.get(f"{scale}/{result.name}")
+                _print_result(result, problems, plans=not args.no_plans)
+        finally:
+            database.engine.dispose()
+            database.reader_engine.dispose()
+        report["scales"][str(scale)] = {
+            "dataset": str(path),
+            "cases": [asdict(result) for result in results],
+        }
+
+    if baseline is not None:
+        report["changes"] = findings
+    Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), "utf-8")
+    print(f"done: scales={len(scales)} changes={len(findings)} output={args.output}")
+    # Plan changes are reported for review; only slower queries fail the run.
+    if any(
+        problem != "query plan changed" for problems in findings.values() for problem in problems
+    ):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import math
+import os
+import platform
+import subprocess
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+@dataclass(frozen=True)
+class Latency:
+    p50_ms: float
+    p99_ms: float
+    mean_ms: float
+    max_ms: float
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    # Nearest-rank, so p99 of a small sample is an observed latency rather than an interpolation.
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+def summarize(seconds: list[float]) -> Latency:
+    if not seconds:
+        seconds = [math.nan]
+    return Latency(
+        p50_ms=round(percentile(seconds, 0.50) * 1000, 3),
+        p99_ms=round(percentile(seconds, 0.99) * 1000, 3),
+        mean_ms=round(sum(seconds) / len(seconds) * 1000, 3),
+        max_ms=round(max(seconds) * 1000, 3),
+    )
+
+
+def _git_revision() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def environment(**extra: Any) -> dict[str, Any]:
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        **extra,
+    }
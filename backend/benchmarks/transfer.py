@@ -0,0 +1,509 @@
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from urllib.parse import urlencode
+
+from benchmarks.report import BACKEND_DIR, Latency, environment, summarize
+
+
+DEFAULT_SIZES = "1KB,64KB,1MB,16MB,128MB"
+DEFAULT_CONCURRENCY = "1,4,16"
+DEFAULT_SCENARIOS = "upload,download,share"
+DEFAULT_ROUNDS = 3
+DEFAULT_TOLERANCE = 0.10
+DEFAULT_OUTPUT = "transfer-benchmark.json"
+
+SERVER_START_TIMEOUT_SECONDS = 30
+HTTP_TIMEOUT_SECONDS = 600
+IO_BLOCK_BYTES = 1024 * 1024
+
+ADMIN_USERNAME = "bench"
+ADMIN_PASSWORD = "bench"
+
+_SIZE_PATTERN = re.compile(r"^\s*(\d+)\s*(B|KB|MB|GB)?\s*$", re.IGNORECASE)
+_SIZE_UNITS = {"B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3}
+
+# Random so neither storage nor any proxy in front of it can compress the payload.
+_BLOCK = memoryview(os.urandom(IO_BLOCK_BYTES))
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class CaseResult:
+    scenario: str
+    size_bytes: int
+    concurrency: int
+    requests: int
+    errors: int
+    seconds: float
+    throughput_mib_s: float
+    latency: Latency
+
+    @property
+    def key(self) -> str:
+        return f"{self.scenario}/{self.size_bytes}/{self.concurrency}"
+
+
+def parse_size(value: str) -> int:
+    match = _SIZE_PATTERN.match(value)
+    if match is None:
+        raise argparse.ArgumentTypeError(f"invalid size: {value!r}, expected e.g. 64KB or 2GB")
+    return int(match.group(1)) * _SIZE_UNITS[(match.group(2) or "B").upper()]
+
+
+def format_size(size: int) -> str:
+    for unit in ("GB", "MB", "KB"):
+        if size >= _SIZE_UNITS[unit] and size % _SIZE_UNITS[unit] == 0:
+            return f"{size // _SIZE_UNITS[unit]}{unit}"
+    return f"{size}B"
+
+
+def _payload(size: int) -> Iterator[memoryview]:
+    remaining = size
+    while remaining > 0:
+        chunk = _BLOCK[: min(remaining, IO_BLOCK_BYTES)]
+        remaining -= len(chunk)
+        yield chunk
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class BenchmarkServer:
+    def __init__(self, *, workdir: Path, max_bytes: int, workers: int, env: dict[str, str]) -> None:
+        self.port = _free_port()
+        self._workdir = workdir
+        self._workers = workers
+        # Limits that would throttle the benchmark itself are off; --env can turn them back on.
+        self._env = {
+            **os.environ,
+            "APP_JWT_SECRET": uuid.uuid4().hex,
+            "APP_ADMIN_USERNAME": ADMIN_USERNAME,
+            "APP_ADMIN_PASSWORD": ADMIN_PASSWORD,
+            "APP_DB_PATH": str(workdir / "app.db"),
+            "APP_STORAGE_DIR": str(workdir / "uploads"),
+            "APP_MAX_UPLOAD_BYTES": str(max_bytes),
+            "APP_DOWNLOAD_TOKEN_EXPIRES_SECONDS": "86400",
+            "APP_MAX_CONCURRENT_UPLOADS": "0",
+            "APP_MAX_CONCURRENT_DOWNLOADS": "0",
+            "APP_RATE_LIMIT_SHARE_INFO_PER_CLIENT": "",
+            "APP_RATE_LIMIT_SHARE_INFO_PER_SHARE": "",
+            "APP_RATE_LIMIT_SHARE_VERIFY_PER_CLIENT": "",
+            "APP_RATE_LIMIT_SHARE_VERIFY_PER_SHARE": "",
+            "APP_RATE_LIMIT_SHARE_DOWNLOAD_PER_CLIENT": "",
+            "APP_RATE_LIMIT_SHARE_DOWNLOAD_PER_SHARE": "",
+            **env,
+        }
+        self._process: subprocess.Popen[bytes] | None = None
+        self.token = ""
+
+    def start(self) -> None:
+        command = [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--app-dir",
+            str(BACKEND_DIR),
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(self.port),
+            "--workers",
+            str(self._workers),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ]
+        # Run from the scratch directory so a developer's .env does not leak into the results.
+        self._process = subprocess.Popen(command, cwd=self._workdir, env=self._env)
+        deadline = time.monotonic() + SERVER_START_TIMEOUT_SECONDS
+        while True:
+            if self._process.poll() is not None:
+                raise BenchmarkError(f"server exited with code {self._process.returncode}")
+            try:
+                self.token = self._login()
+                return
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise BenchmarkError("server did not become ready in time")
+                time.sleep(0.2)
+
+    def stop(self) -> None:
+        if self._process is None:
+            return
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=SERVER_START_TIMEOUT_SECONDS)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+
+    def connect(self) -> http.client.HTTPConnection:
+        return http.client.HTTPConnection("127.0.0.1", self.port, timeout=HTTP_TIMEOUT_SECONDS)
+
+    def _login(self) -> str:
+        conn = self.connect()
+        try:
+            body = {"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD}
+            return _json(conn, "POST", "/api/auth/login", body=body)["token"]
+        finally:
+            conn.close()
+
+    @property
+    def auth(self) -> dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+def _json(
+    conn: http.client.HTTPConnection,
+    method: str,
+    path: str,
+    *,
+    body: object | None = None,
+    headers: dict[str, str] | None = None,
+) -> dict:
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    all_headers = {"Content-Type": "application/json", **(headers or {})}
+    conn.request(method, path, body=data, headers=all_headers)
+    response = conn.getresponse()
+    payload = response.read()
+    if response.status >= 300:
+        raise BenchmarkError(f"{method} {path}: {response.status} {payload[:200]!r}")
+    return json.loads(payload)
+
+
+def _drain(conn: http.client.HTTPConnection, method: str, path: str) -> int:
+    conn.request(method, path)
+    response = conn.getresponse()
+    buffer = bytearray(IO_BLOCK_BYTES)
+    received = 0
+    while True:
+        count = response.readinto(buffer)
+        if not count:
+            break
+        received += count
+    if response.status >= 300:
+        raise BenchmarkError(f"{method} {path}: {response.status}")
+    return received
+
+
+def upload(server: BenchmarkServer, conn: http.client.HTTPConnection, size: int) -> str:
+    boundary = uuid.uuid4().hex
+    head = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="bench-{size}.bin"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode("ascii")
+    tail = f"\r\n--{boundary}--\r\n".encode("ascii")
+    headers = {
+        **server.auth,
+        "Content-Type": f"multipart/form-data; boundary={boundary}",
+        "Content-Length": str(len(head) + size + len(tail)),
+    }
+    conn.request("POST", "/api/files/upload", body=_body(head, size, tail), headers=headers)
+    response = conn.getresponse()
+    payload = response.read()
+    if response.status >= 300:
+        raise BenchmarkError(f"upload: {response.status} {payload[:200]!r}")
+    return json.loads(payload)["file_id"]
+
+
+def _body(head: bytes, size: int, tail: bytes) -> Iterator[bytes | memoryview]:
+    yield head
+    yield from _payload(size)
+    yield tail
+
+
+@dataclass(frozen=True)
+class Fixture:
+    file_id: str
+    download_token: str
+    share_code: str
+
+
+def create_fixture(server: BenchmarkServer, size: int) -> Fixture:
+    conn = server.connect()
+    try:
+        file_id = upload(server, conn, size)
+        path = f"/api/files/{file_id}"
+        token = _json(conn, "POST", f"{path}/download-token", headers=server.auth)
+        share = _json(conn, "POST", f"{path}/share", body={}, headers=server.auth)
+    finally:
+        conn.close()
+    return Fixture(
+        file_id=file_id,
+        download_token=token["download_token"],
+        share_code=share["share_code"],
+    )
+
+
+# A scenario performs one measured operation and returns the payload bytes it moved.
+Scenario = Callable[[BenchmarkServer, http.client.HTTPConnection, int, Fixture], int]
+
+
+def _scenario_upload(
+    server: BenchmarkServer,
+    conn: http.client.HTTPConnection,
+    size: int,
+    fixture: Fixture,
+) -> int:
+    upload(server, conn, size)
+    return size
+
+
+def _scenario_download(
+    server: BenchmarkServer,
+    conn: http.client.HTTPConnection,
+    size: int,
+    fixture: Fixture,
+) -> int:
+    query = urlencode({"token": fixture.download_token})
+    return _drain(conn, "GET", f"/api/files/{fixture.file_id}/download?{query}")
+
+
+def _scenario_share(
+    server: BenchmarkServer,
+    conn: http.client.HTTPConnection,
+    size: int,
+    fixture: Fixture,
+) -> int:
+    path = f"/api/share/{fixture.share_code}"
+    _json(conn, "GET", path)
+    token = _json(conn, "POST", f"{path}/verify", body={"password": None})["download_token"]
+    return _drain(conn, "GET", f"{path}/download?{urlencode({'token': token})}")
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "upload": _scenario_upload,
+    "download": _scenario_download,
+    "share": _scenario_share,
+}
+
+
+def _cleanup_uploads(server: BenchmarkServer, keep: set[str]) -> None:
+    # Uploaded copies would otherwise pile up to size x concurrency x rounds on disk.
+    conn = server.connect()
+    try:
+        listing = _json(conn, "GET", "/api/files?size=100", headers=server.auth)
+        while True:
+            stale = [item["id"] for item in listing["list"] if item["id"] not in keep]
+            for file_id in stale:
+                conn.request("DELETE", f"/api/files/{file_id}", headers=server.auth)
+                conn.getresponse().read()
+            if not stale:
+                return
+            listing = _json(conn, "GET", "/api/files?size=100", headers=server.auth)
+    finally:
+        conn.close()
+
+
+def run_case(
+    *,
+    server: BenchmarkServer,
+    name: str,
+    size: int,
+    concurrency: int,
+    rounds: int,
+    fixture: Fixture,
+) -> CaseResult:
+    scenario = SCENARIOS[name]
+    latencies: list[float] = []
+    moved = 0
+    errors = 0
+    lock = threading.Lock()
+    start = threading.Barrier(concurrency)
+
+    def _worker() -> None:
+        nonlocal moved, errors
+        conn = server.connect()
+        try:
+            start.wait()
+            for _ in range(rounds):
+                started_at = time.perf_counter()
+                try:
+                    count = scenario(server, conn, size, fixture)
+                except (BenchmarkError, OSError, http.client.HTTPException) as exc:
+                    print(f"  {name}: {exc}", file=sys.stderr)
+                    conn.close()
+                    conn = server.connect()
+                    with lock:
+                        errors += 1
+                    continue
+                elapsed = time.perf_counter() - started_at
+                with lock:
+                    latencies.append(elapsed)
+                    moved += count
+        finally:
+            conn.close()
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(_worker) for _ in range(concurrency)]:
+            future.result()
+    seconds = time.perf_counter() - started_at
+
+    return CaseResult(
+        scenario=name,
+        size_bytes=size,
+        concurrency=concurrency,
+        requests=concurrency * rounds,
+        errors=errors,
+        seconds=round(seconds, 4),
+        throughput_mib_s=round(moved / seconds / (1024 * 1024), 3),
+        latency=summarize(latencies),
+    )
+
+
+def compare(
+    *,
+    results: list[CaseResult],
+    baseline: dict,
+    tolerance: float,
+) -> dict[str, list[str]]:
+    previous = {
+        f"{item['scenario']}/{item['size_bytes']}/{item['concurrency']}": item
+        for item in baseline["results"]
+    }
+    regressions: dict[str, list[str]] = {}
+    for result in results:
+        base = previous.get(result.key)
+        if base is None:
+            continue
+        problems = []
+        if result.throughput_mib_s < base["throughput_mib_s"] * (1 - tolerance):
+            problems.append(
+                f"throughput {base['throughput_mib_s']} -> {result.throughput_mib_s} MiB/s"
+            )
+        if result.latency.p99_ms > base["latency"]["p99_ms"] * (1 + tolerance):
+            problems.append(f"p99 {base['latency']['p99_ms']} -> {result.latency.p99_ms} ms")
+        if result.errors > base["errors"]:
+            problems.append(f"errors {base['errors']} -> {result.errors}")
+        if problems:
+            regressions[result.key] = problems
+    return regressions
+
+
+def _print_result(result: CaseResult, problems: list[str] | None) -> None:
+    line = (
+        f"{result.scenario:<9}{format_size(result.size_bytes):>7} x{result.concurrency:<4}"
+        f"{result.throughput_mib_s:>11.2f} MiB/s"
+        f"  p50 {result.latency.p50_ms:>10.2f} ms  p99 {result.latency.p99_ms:>10.2f} ms"
+        f"  errors {result.errors}"
+    )
+    if problems:
+        line += "  REGRESSION: " + "; ".join(problems)
+    print(line, flush=True)
+
+
+def _parse_env(values: list[str]) -> dict[str, str]:
+    env = {}
+    for value in values:
+        name, sep, setting = value.partition("=")
+        if not sep or not name:
+            raise SystemExit(f"invalid --env {value!r}, expected KEY=VALUE")
+        env[name] = setting
+    return env
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure upload, admin download and share download throughput and latency.",
+    )
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated, e.g. 1KB,1MB,2GB")
+    parser.add_argument("--concurrency", default=DEFAULT_CONCURRENCY, help="comma-separated")
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS, help="upload,download,share")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="requests per client")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--env", action="append", default=[], help="extra APP_* setting")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", help="previous --output file to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    sizes = [parse_size(value) for value in args.sizes.split(",") if value.strip()]
+    levels = [int(value) for value in args.concurrency.split(",") if value.strip()]
+    names = [value.strip() for value in args.scenarios.split(",") if value.strip()]
+    unknown = sorted(set(names) - set(SCENARIOS))
+    if unknown:
+        raise SystemExit(f"unknown scenarios: {', '.join(unknown)}")
+    if args.rounds <= 0 or any(level <= 0 for level in levels):
+        raise SystemExit("--rounds and --concurrency must be positive")
+    baseline = json.loads(Path(args.baseline).read_text("utf-8")) if args.baseline else None
+
+    results: list[CaseResult] = []
+    regressions: dict[str, list[str]] = {}
+    with tempfile.TemporaryDirectory(prefix="transfer-bench-") as workdir:
+        server = BenchmarkServer(
+            workdir=Path(workdir),
+            max_bytes=max(sizes),
+            workers=args.workers,
+            env=_parse_env(args.env),
+        )
+        server.start()
+        try:
+            for size in sizes:
+                fixture = create_fixture(server, size)
+                for name in names:
+                    for concurrency in levels:
+                        result = run_case(
+                            server=server,
+                            name=name,
+                            size=size,
+                            concurrency=concurrency,
+                            rounds=args.rounds,
+                            fixture=fixture,
+                        )
+                        if name == "upload":
+                            _cleanup_uploads(server, keep={fixture.file_id})
+                        results.append(result)
+                        if baseline is not None:
+                            found = compare(
+                                results=[result],
+                                baseline=baseline,
+                                tolerance=args.tolerance,
+                            )
+                            regressions.update(found)
+                        _print_result(result, regressions.get(result.key))
+        finally:
+            server.stop()
+
+    report = {
+        "meta": environment(
+            workers=args.workers,
+            rounds=args.rounds,
+            env=_parse_env(args.env),
+        ),
+        "results": [asdict(result) for result in results],
+    }
+    if baseline is not None:
+        report["regressions"] = regressions
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"done: cases={len(results)} regressions={len(regressions)} output={args.output}")
+    if regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()